@@ -42,7 +42,17 @@ CREATE TABLE IF NOT EXISTS `Pings` (
   `TargetID` int(11) unsigned NOT NULL,
   `Timestamp` datetime NOT NULL,
   `Status` varchar(255) NOT NULL,
+  `DNSTime` float DEFAULT NULL,
+  `PingTime` float DEFAULT NULL,
+  `ConnectTime` float DEFAULT NULL,
+  `TLSTime` float DEFAULT NULL,
+  `ResponseTime` float DEFAULT NULL,
+  `ParseTime` float DEFAULT NULL,
+  `OperationTime` float DEFAULT NULL,
+  `ServerTime` float DEFAULT NULL,
+  `Attempts` int(11) unsigned NOT NULL DEFAULT 1,
   PRIMARY KEY (`PingID`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 AUTO_INCREMENT=1 ;
 
 --
 -- Table structure for table `PreviousScans`
@@ -69,6 +79,34 @@ CREATE TABLE IF NOT EXISTS `Program` (
 ) ENGINE=MyISAM  DEFAULT CHARSET=latin1 AUTO_INCREMENT=13 ;
 
 
+--
+-- Table structure for table `SweepRuns`
+--
+
+CREATE TABLE IF NOT EXISTS `SweepRuns` (
+  `SweepID` int(11) unsigned NOT NULL AUTO_INCREMENT,
+  `Timestamp` datetime NOT NULL,
+  `NetDefs` varchar(1024) NOT NULL,
+  `Ports` varchar(255) NOT NULL,
+  `MinOctetVal` int(11) unsigned NOT NULL,
+  `MaxOctetVal` int(11) unsigned NOT NULL,
+  `ScanType` varchar(15) NOT NULL,
+  `TotalPings` int(11) unsigned NOT NULL,
+  PRIMARY KEY (`SweepID`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 AUTO_INCREMENT=1 ;
+
+--
+-- Table structure for table `SweepHosts`
+--
+
+CREATE TABLE IF NOT EXISTS `SweepHosts` (
+  `SweepID` int(11) unsigned NOT NULL,
+  `IPAddress` varchar(15) NOT NULL,
+  `Port` int(11) unsigned NOT NULL,
+  PRIMARY KEY (`SweepID`, `IPAddress`, `Port`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 ;
+
+
 --
 -- Table structure for table `Targets`
 --
@@ -0,0 +1,50 @@
+-- Upgrade an existing SMIStatus database to the tables of mysqlsmiSchema.sql.
+-- Execute once with mysql SMIStatus < mysqlsmiUpgrade.sql
+
+--
+-- Time in seconds of each phase of the test for table `Pings`
+--
+
+ALTER TABLE `Pings`
+  ADD COLUMN `DNSTime` float DEFAULT NULL,
+  ADD COLUMN `PingTime` float DEFAULT NULL,
+  ADD COLUMN `ConnectTime` float DEFAULT NULL,
+  ADD COLUMN `TLSTime` float DEFAULT NULL,
+  ADD COLUMN `ResponseTime` float DEFAULT NULL,
+  ADD COLUMN `ParseTime` float DEFAULT NULL,
+  ADD COLUMN `OperationTime` float DEFAULT NULL,
+  ADD COLUMN `ServerTime` float DEFAULT NULL;
+
+--
+-- Number of test operations executed with the retry policy for table `Pings`
+--
+
+ALTER TABLE `Pings`
+  ADD COLUMN `Attempts` int(11) unsigned NOT NULL DEFAULT 1;
+
+--
+-- Table structure for table `SweepRuns`
+--
+
+CREATE TABLE IF NOT EXISTS `SweepRuns` (
+  `SweepID` int(11) unsigned NOT NULL AUTO_INCREMENT,
+  `Timestamp` datetime NOT NULL,
+  `NetDefs` varchar(1024) NOT NULL,
+  `Ports` varchar(255) NOT NULL,
+  `MinOctetVal` int(11) unsigned NOT NULL,
+  `MaxOctetVal` int(11) unsigned NOT NULL,
+  `ScanType` varchar(15) NOT NULL,
+  `TotalPings` int(11) unsigned NOT NULL,
+  PRIMARY KEY (`SweepID`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 AUTO_INCREMENT=1 ;
+
+--
+-- Table structure for table `SweepHosts`
+--
+
+CREATE TABLE IF NOT EXISTS `SweepHosts` (
+  `SweepID` int(11) unsigned NOT NULL,
+  `IPAddress` varchar(15) NOT NULL,
+  `Port` int(11) unsigned NOT NULL,
+  PRIMARY KEY (`SweepID`, `IPAddress`, `Port`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 ;
@@ -27,6 +27,7 @@ from ._cmd_targets import *  # noqa: F401,F403
 from ._cmd_provider import *  # noqa: F401,F403
 from ._cmd_explorer import *  # noqa: F401,F403
 from ._cmd_cimping import *  # noqa: F401,F403
+from ._cmd_monitor import *  # noqa: F401,F403
 from ._cmd_sweep import *  # noqa: F401,F403
 from ._cmd_history import *  # noqa: F401,F403
 from ._cmd_programs import *  # noqa: F401,F403
@@ -56,6 +56,8 @@ class ConfigSectionSchema(object):  # pylint: disable=too-few-public-methods
         companiesfilename = Param(type=str)    # filename for the csv file
         notificationsfilename = Param(type=str)    # filename for the csv file
         usersfilename = Param(type=str)    # filename for the userscsv file
+        sweepsfilename = Param(type=str)    # filename for sweep runs file
+        sweephostsfilename = Param(type=str)    # filename for sweep hosts
 
     @matches_section("mysql")  # pylint: disable=too-few-public-methods
     class Mysql(SectionSchema):
@@ -72,6 +74,68 @@ class ConfigSectionSchema(object):  # pylint: disable=too-few-public-methods
         """
         filename = Param(type=str)    # filename for the csv file
 
+    @matches_section("ratelimit")  # pylint: disable=too-few-public-methods
+    class Ratelimit(SectionSchema):
+        """ Probe rate and per-subnet concurrency limits section schema.
+            Applies to sweep, cimping and explore
+        """
+        rate = Param(type=float)            # probes started per second
+        burst = Param(type=int)             # probes started at once
+        subnet_concurrency = Param(type=int)  # probes in progress per subnet
+        subnet_prefix_len = Param(type=int)   # bits of ip defining a subnet
+
+    @matches_section("ping")  # pylint: disable=too-few-public-methods
+    class Ping(SectionSchema):
+        """ Ping mode section schema. Defines how cimping and explore test
+            that servers are reachable
+        """
+        mode = Param(type=str)                        # icmp or tcp
+        tcp_targets = Param(type=int, multiple=True)  # TargetIDs to tcp ping
+        icmp_targets = Param(type=int, multiple=True)  # TargetIDs to icmp ping
+
+    @matches_section("probe")  # pylint: disable=too-few-public-methods
+    class Probe(SectionSchema):
+        """ Probe section schema. Defines the CIM operation with which
+            cimping tests the servers
+        """
+        strategy = Param(type=str)                          # all targets
+        target_strategies = Param(type=str, multiple=True)  # id:strategy
+
+    @matches_section("retry")  # pylint: disable=too-few-public-methods
+    class Retry(SectionSchema):
+        """ Retry section schema. Defines how cimping repeats tests that
+            fail with a timeout or connection error
+        """
+        retries = Param(type=int)           # repeats of a failed test
+        backoff = Param(type=float)         # seconds before first repeat
+        hedge_delay = Param(type=float)     # seconds before hedged request
+
+    @matches_section("monitor")  # pylint: disable=too-few-public-methods
+    class Monitor(SectionSchema):
+        """ Monitor section schema. Defaults of the options of the
+            monitor command
+        """
+        interval = Param(type=float)        # seconds between tests
+        jitter = Param(type=float)          # fraction of interval
+        target_intervals = Param(type=str, multiple=True)  # id:seconds
+        threads = Param(type=int)           # tests in progress
+
+    @matches_section("reachability")  # pylint: disable=too-few-public-methods
+    class Reachability(SectionSchema):
+        """ Reachability cache section schema. Defines how long the results
+            of pings are reused
+        """
+        ttl = Param(type=float)             # seconds to keep good results
+        negative_ttl = Param(type=float)    # seconds to keep failed results
+
+    @matches_section("connectionpool")  # pylint: disable=too-few-public-methods
+    class Connectionpool(SectionSchema):
+        """ WBEM connection pool section schema. Defines how long connections
+            to the WBEM servers are reused
+        """
+        idle_timeout = Param(type=float)    # seconds to keep unused conns
+        max_size = Param(type=int)          # maximum pooled connections
+
 #    @matches_section("log")  # pylint: disable=too-few-public-methods
 #    class Log(SectionSchema):
 #        """ Log config section schema"""
@@ -91,6 +155,13 @@ class ConfigFileProcessor(ConfigFileReader):
         ConfigSectionSchema.General,     # PRIMARY SCHEMA
         ConfigSectionSchema.Csv,
         ConfigSectionSchema.Mysql,
+        ConfigSectionSchema.Ratelimit,
+        ConfigSectionSchema.Ping,
+        ConfigSectionSchema.Probe,
+        ConfigSectionSchema.Retry,
+        ConfigSectionSchema.Monitor,
+        ConfigSectionSchema.Reachability,
+        ConfigSectionSchema.Connectionpool,
         # ConfigSectionSchema.Log
     ]
 
@@ -31,7 +31,7 @@ from smipyping.config import DEFAULT_NAMESPACE, DEFAULT_OPERATION_TIMEOUT, \
 from smipyping._logging import AUDIT_LOGGER_NAME, get_logger
 
 from .smicli import cli, CMD_OPTS_TXT
-from ._common_options import add_options
+from ._common_options import add_options, ping_mode_option, probe_option
 from ._click_common import print_table, get_target_id, \
     get_multiple_target_ids, validate_target_ids
 
@@ -117,6 +117,8 @@ def cimping_group():
               help='Disable network ping ofthe wbem server before executing '
                    'the cim request.'
                    ' ' + '(Default: %s).' % True)
+@add_options(ping_mode_option)
+@add_options(probe_option)
 @click.option('-d' '--debug', default=False, type=bool, required=False,
               help='Set the debug parameter for the pywbem call. Displays '
                    'detailed information on the call and response.'
@@ -168,6 +170,8 @@ def cimping_host(context, host, **options):
                 nargs=-1)
 @add_options(timeout_option)
 @add_options(no_ping_option)
+@add_options(ping_mode_option)
+@add_options(probe_option)
 @add_options(debug_option)
 @click.pass_obj
 def cimping_ids(context, target_ids, **options):
@@ -192,6 +196,8 @@ def cimping_ids(context, target_ids, **options):
 @click.argument('target-id', type=str, metavar='TargetID', required=False)
 @add_options(timeout_option)
 @add_options(no_ping_option)
+@add_options(ping_mode_option)
+@add_options(probe_option)
 @add_options(debug_option)
 @click.pass_obj
 def cimping_id(context, target_id, **options):
@@ -228,8 +234,16 @@ def cimping_id(context, target_id, **options):
               ' ' + '(Default: %s).' % False)
 @add_options(timeout_option)
 @add_options(no_ping_option)
+@add_options(ping_mode_option)
+@add_options(probe_option)
 @add_options(debug_option)
 @add_options(thread_option)
+@click.option('--event-loop', default=False, is_flag=True, required=False,
+              help='If set, test all of the servers concurrently from one '
+                   'thread with non-blocking sockets instead of a thread per '
+                   'server. This scales to thousands of targets since the '
+                   'total time is about that of the slowest server. The '
+                   '--no-thread option is ignored.')
 @click.pass_obj
 def cimping_all(context, **options):  # pylint: disable=redefined-builtin
     """
@@ -255,6 +269,16 @@ def cimping_all(context, **options):  # pylint: disable=redefined-builtin
 ######################################################################
 
 
+def format_timings(timings):
+    """
+    Return string with the time of each measured phase of a test from the
+    PhaseTimings timings.
+    """
+    return ' '.join('%s=%.3fs' % (phase, value)
+                    for phase, value in zip(timings._fields, timings)
+                    if value is not None)
+
+
 def print_ping_result(simpleping, test_result, verbose):
     """
     Display the ping results for a single ping
@@ -270,6 +294,9 @@ def print_ping_result(simpleping, test_result, verbose):
                         test_result.type,
                         test_result.code,
                         test_result.execution_time))
+            click.echo('Phases: %s Attempts: %s' %
+                       (format_timings(test_result.timings),
+                        test_result.attempts))
         click.echo('Running')     # print the word 'Running' to match javaping
 
 
@@ -282,6 +309,8 @@ def cmd_cimping_host(context, host, options):
                             password=options['password'],
                             timeout=options['timeout'],
                             ping=not options['no_ping'],
+                            ping_mode=options['ping_mode'],
+                            probe_strategy=options['probe'],
                             debug=options['d__debug'],
                             logfile=context.log_file,
                             log_level=context.log_level,
@@ -307,7 +336,10 @@ def cmd_cimping_all(context, options):  # pylint: disable=redefined-builtin
                                       log_level=context.log_level,
                                       verbose=context.verbose,
                                       threaded=not options['no_thread'],
-                                      include_disabled=include_disabled)
+                                      include_disabled=include_disabled,
+                                      ping_mode=options['ping_mode'],
+                                      probe_strategy=options['probe'],
+                                      event_loop=options['event_loop'])
     results = simple_ping_list.ping_servers()
 
     # get last pings information from history
@@ -415,6 +447,8 @@ def cmd_cimping_ids(context, target_ids, options):
                                 timeout=options['timeout'],
                                 targets_tbl=context.targets_tbl,
                                 ping=not options['no_ping'],
+                                ping_mode=options['ping_mode'],
+                                probe_strategy=options['probe'],
                                 logfile=context.log_file,
                                 log_level=context.log_level)
         test_result = simpleping.test_server(verify_cert=False)
@@ -444,6 +478,8 @@ def cmd_cimping_id(context, target_id, options):
     simpleping = SimplePing(target_id=target_id, timeout=options['timeout'],
                             targets_tbl=context.targets_tbl,
                             ping=not options['no_ping'],
+                            ping_mode=options['ping_mode'],
+                            probe_strategy=options['probe'],
                             logfile=context.log_file,
                             log_level=context.log_level)
 
@@ -26,6 +26,7 @@ from smipyping._logging import AUDIT_LOGGER_NAME, get_logger
 from .smicli import cli, CMD_OPTS_TXT
 from ._click_common import print_table, get_multiple_target_ids, \
     validate_target_ids
+from ._common_options import add_options, ping_mode_option
 
 
 @cli.group('explorer', options_metavar=CMD_OPTS_TXT)
@@ -55,6 +56,7 @@ def explorer_group():
 @click.option('--ping/--no-ping', default=True,
               help='Ping the the provider as initial step in test. '
                    'Default: ping')
+@add_options(ping_mode_option)
 @click.option('--thread/--no-thread', default=True,
               help='Run test multithreaded.  Much faster. This option is only'
                    'here to aid debugging if issues occur with multithread.'
@@ -114,6 +116,7 @@ def explore_all(context, **options):
 @click.option('--ping/--no-ping', default=True,
               help='Ping the the provider as initial step in test. '
                    'Default: ping')
+@add_options(ping_mode_option)
 @click.option('--thread/--no-thread', default=True,
               help='Run test multithreaded.  Much faster. '
                    'Default: thread')
@@ -158,6 +161,7 @@ def cmd_explore_all(context, **options):
                         log_level=None,
                         verbose=context.verbose,
                         ping=options['ping'],
+                        ping_mode=options['ping_mode'],
                         threaded=options['thread'],
                         output_format=context.output_format)
 
@@ -190,6 +194,7 @@ def cmd_explore_ids(context, target_ids, **options):
     explorer = Explorer('smicli', context.targets_tbl,
                         verbose=context.verbose,
                         ping=options['ping'],
+                        ping_mode=options['ping_mode'],
                         threaded=options['thread'],
                         logfile=context.log_file,
                         log_level=context.log_level,
@@ -0,0 +1,157 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+smicli command based on python click for continuously monitoring the
+targets with cimping.
+"""
+from __future__ import print_function, absolute_import
+
+import datetime
+import click
+
+from smipyping import PingsTable, TargetMonitor, datetime_display_str
+from smipyping.config import MONITOR_INTERVAL, MONITOR_JITTER, \
+    MONITOR_THREADS
+from smipyping._logging import AUDIT_LOGGER_NAME, get_logger
+
+from .smicli import cli, CMD_OPTS_TXT
+from ._common_options import add_options, ping_mode_option, probe_option
+from ._cmd_cimping import timeout_option
+
+
+@cli.command('monitor', options_metavar=CMD_OPTS_TXT)
+@click.option('-i', '--interval', type=float, default=MONITOR_INTERVAL,
+              help='Seconds between the cimping tests of each target.'
+                   ' ' + '(Default: %s).' % MONITOR_INTERVAL)
+@click.option('-j', '--jitter', type=float, default=MONITOR_JITTER,
+              help='Fraction of the interval (0 to 1) by which the time of '
+                   'each test is randomly moved so that the tests are spread '
+                   'over time.'
+                   ' ' + '(Default: %s).' % MONITOR_JITTER)
+@click.option('--target-interval', 'target_intervals', type=str,
+              multiple=True, metavar='TargetID:seconds',
+              help='Interval of one target (ex. 12:60). May be repeated.')
+@click.option('--duration', type=float, default=None,
+              help='Seconds after which the monitor stops. If not set, the '
+                   'monitor runs until interrupted with Ctrl-C.')
+@click.option('--threads', type=int, default=MONITOR_THREADS,
+              help='Maximum number of tests in progress.'
+                   ' ' + '(Default: %s).' % MONITOR_THREADS)
+@click.option('-d', '--disabled', default=False, is_flag=True,
+              help='If set include disabled targets.'
+                   ' ' + '(Default: %s).' % False)
+@click.option('--no-save', default=False, is_flag=True,
+              help='If set the results are displayed but not saved to the '
+                   'Pings table.')
+@add_options(timeout_option)
+@add_options(ping_mode_option)
+@add_options(probe_option)
+@click.pass_obj
+def monitor(context, **options):
+    """
+    Continuously cimping the targets in the database.
+
+    Tests each enabled target on its own interval, with random jitter so
+    that the tests are spread over time, and saves each result to the Pings
+    table as it completes. The targets table and the database and WBEM
+    server connections stay open between the tests. Changes of the status of
+    a target are displayed and logged to the audit log.
+
+    The interval, jitter, target intervals and threads may also be defined
+    in the monitor section of the config file.
+
+    ex. smicli monitor --interval 120
+    """
+    context.execute_cmd(lambda: cmd_monitor(context, options))
+
+
+######################################################################
+#   Action functions for monitor command
+######################################################################
+
+
+def result_status(test_result):
+    """Return the status string of the test result as saved in Pings."""
+    if test_result.exception:
+        return "%s %s" % (test_result.type, test_result.exception)
+    return test_result.type
+
+
+def cmd_monitor(context, options):
+    """
+    Test the targets on their schedules and save the results until
+    interrupted or the duration has passed.
+    """
+    try:
+        target_monitor = TargetMonitor(
+            context.targets_tbl, interval=options['interval'],
+            jitter=options['jitter'],
+            target_intervals=options['target_intervals'],
+            timeout=options['timeout'],
+            include_disabled=options['disabled'],
+            ping_mode=options['ping_mode'],
+            probe_strategy=options['probe'],
+            num_threads=options['threads'])
+    except ValueError as ve:
+        raise click.ClickException('Invalid monitor option: %s' % ve)
+
+    # Last saved status of each target for the detection of changes
+    last_tbl = PingsTable.factory(context.db_info, context.db_type,
+                                  context.verbose)
+    last_status = {ping[1]: ping[3] for ping in
+                   last_tbl.get_last_timestamped()}
+
+    pings_tbl = None
+    if not options['no_save']:
+        pings_tbl = PingsTable.factory(context.db_info, context.db_type,
+                                       context.verbose)
+
+    audit_logger = get_logger(AUDIT_LOGGER_NAME)
+    audit_logger.info('monitor started for %s targets %r',
+                      len(target_monitor.ping_list.target_ids),
+                      target_monitor)
+    context.spinner.stop()
+    click.echo('Monitoring %s targets. Ctrl-C to stop.' %
+               len(target_monitor.ping_list.target_ids))
+
+    count = 0
+    try:
+        for target_id, test_result in target_monitor.run(
+                duration=options['duration']):
+            count += 1
+            timestamp = datetime.datetime.now()
+            if pings_tbl is not None:
+                pings_tbl.append(target_id, test_result, timestamp)
+
+            status = result_status(test_result)
+            if status != last_status.get(target_id):
+                audit_logger.info('monitor Status change target %s from %s '
+                                  'to %s', target_id,
+                                  last_status.get(target_id), status)
+                click.echo('%s Target %s %s changed from %s to %s' %
+                           (datetime_display_str(timestamp), target_id,
+                            context.targets_tbl.build_url(target_id),
+                            last_status.get(target_id), status))
+            elif context.verbose:
+                click.echo('%s Target %s %s %s in %s' %
+                           (datetime_display_str(timestamp), target_id,
+                            context.targets_tbl.build_url(target_id),
+                            status, test_result.execution_time))
+            last_status[target_id] = status
+    except KeyboardInterrupt:
+        target_monitor.stop()
+
+    audit_logger.info('monitor stopped after %s tests', count)
+    click.echo('Monitor stopped after %s tests' % count)
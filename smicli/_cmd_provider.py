@@ -19,17 +19,21 @@ data file.
 """
 from __future__ import print_function, absolute_import
 
+from contextlib import contextmanager
+
 import click
 import six
 
-from pywbem import WBEMServer, WBEMConnection, Error, ValueMapping
+from pywbem import WBEMServer, Error, ValueMapping
 
-from smipyping._ping import ping_host
+from smipyping._ping import ping_host, tcp_ping, get_ping_mode
 from smipyping.config import PING_TIMEOUT
 from smipyping import filter_stringlist
+from smipyping._connectionpool import get_connection_pool
 
 from .smicli import cli, CMD_OPTS_TXT
-from ._common_options import add_options, namespace_option
+from ._common_options import add_options, namespace_option, \
+    ping_mode_option
 from ._click_common import print_table, get_target_id
 
 
@@ -56,6 +60,7 @@ def provider_group():
 @click.option('--timeout', type=int, required=False, default=PING_TIMEOUT,
               help='Timeout for the ping in seconds.'
                    ' ' + '(Default %s).' % PING_TIMEOUT)
+@add_options(ping_mode_option)
 @click.pass_obj
 def provider_ping(context, targetid, **options):
     """
@@ -192,11 +197,18 @@ def cmd_provider_ping(context, targetid, options):
     if targetid is None:
         return
 
-    ip_address = context.targets_tbl[targetid]['IPAddress']
-
-    result = ping_host(ip_address, options['timeout'])
+    target = context.targets_tbl[targetid]
+    ip_address = target['IPAddress']
+    ping_mode = options['ping_mode'] or get_ping_mode(targetid)
 
-    status = 'Passed' if result else 'Failed'
+    if ping_mode == 'tcp':
+        port = int(target['Port'])
+        result, latency = tcp_ping(ip_address, port, options['timeout'])
+        status = 'Passed (port %s, %.3f s)' % (port, latency) if result \
+            else 'Failed (port %s)' % port
+    else:
+        result = ping_host(ip_address, options['timeout'])
+        status = 'Passed' if result else 'Failed'
 
     click.echo('ping %s %s' % (ip_address, status))
 
@@ -217,32 +229,34 @@ def cmd_provider_profiles(context, targetid, options):
     targetid = get_target_id(context, targetid, options)
     if targetid is None:
         return
-    server = connect_target(context.targets_tbl, targetid)
-
-    found_server_profiles = server.get_selected_profiles(
-        registered_org=options['organization'],
-        registered_name=options['name'])
+    with connect_target(context.targets_tbl, targetid) as server:
+        found_server_profiles = server.get_selected_profiles(
+            registered_org=options['organization'],
+            registered_name=options['name'])
 
-    org_vm = ValueMapping.for_property(server,
-                                       server.interop_ns,
-                                       'CIM_RegisteredProfile',
-                                       'RegisteredOrganization')
+        org_vm = ValueMapping.for_property(server,
+                                           server.interop_ns,
+                                           'CIM_RegisteredProfile',
+                                           'RegisteredOrganization')
 
-    rows = []
-    for inst in found_server_profiles:
-        row = get_profile_info(org_vm, inst)
-        rows.append(row)
+        rows = []
+        for inst in found_server_profiles:
+            row = get_profile_info(org_vm, inst)
+            rows.append(row)
 
-    headers = ['Organization', 'Registered Name', 'Version']
+        headers = ['Organization', 'Registered Name', 'Version']
 
-    print_table(rows, headers, title='Advertised management profiles:',
-                table_format=context.output_format)
+        print_table(rows, headers, title='Advertised management profiles:',
+                    table_format=context.output_format)
 
 
+@contextmanager
 def connect_target(targets, target_id):
     """
-    Connect to the target defined by target_id.  This function does
-    not actually contact the server so there is no try block
+    Context manager that connects to the target defined by target_id with a
+    connection checked out of the connection pool for the with block.
+    Creating the WBEMServer does not actually contact the server so there is
+    no try block
     """
 
     try:
@@ -255,12 +269,11 @@ def connect_target(targets, target_id):
     if target['Principal'] or target['Credential']:
         creds = (target['Principal'], target['Credential'])
 
-    conn = WBEMConnection(uri,
-                          creds,
-                          no_verification=True,
-                          timeout=20)
-    server = WBEMServer(conn)
-    return server
+    with get_connection_pool().connection(uri,
+                                          creds,
+                                          no_verification=True,
+                                          timeout=20) as conn:
+        yield WBEMServer(conn)
 
 
 def cmd_provider_namespaces(context, targetid, options):
@@ -268,22 +281,22 @@ def cmd_provider_namespaces(context, targetid, options):
     targetid = get_target_id(context, targetid, options)
     if targetid is None:
         return
-    server = connect_target(context.targets_tbl, targetid)
-    try:
-        # execute the namespaces just to get the data
-        namespaces = server.namespaces
-        context.spinner.stop()
+    with connect_target(context.targets_tbl, targetid) as server:
+        try:
+            # execute the namespaces just to get the data
+            namespaces = server.namespaces
+            context.spinner.stop()
 
-        rows = []
-        for ns in namespaces:
-            rows.append([ns])
+            rows = []
+            for ns in namespaces:
+                rows.append([ns])
 
-        print_table(rows, ['Namespace Name'],
-                    title='Server Namespaces:',
-                    table_format=context.output_format)
+            print_table(rows, ['Namespace Name'],
+                        title='Server Namespaces:',
+                        table_format=context.output_format)
 
-    except Error as er:
-        raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
+        except Error as er:
+            raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
 
 
 def cmd_provider_interop(context, targetid, options):
@@ -291,22 +304,21 @@ def cmd_provider_interop(context, targetid, options):
     targetid = get_target_id(context, targetid, options)
     if targetid is None:
         return
-    server = connect_target(context.targets_tbl, targetid)
+    with connect_target(context.targets_tbl, targetid) as server:
+        try:
+            # execute the interop request before stopping spinner
+            interop_ns = server.interop_ns
+            context.spinner.stop()
 
-    try:
-        # execute the interop request before stopping spinner
-        interop_ns = server.interop_ns
-        context.spinner.stop()
+            rows = []
+            rows.append([interop_ns])
 
-        rows = []
-        rows.append([interop_ns])
+            print_table(rows, 'Namespace Name',
+                        title='Server Interop Namespace:',
+                        table_format=context.output_format)
 
-        print_table(rows, 'Namespace Name',
-                    title='Server Interop Namespace:',
-                    table_format=context.output_format)
-
-    except Error as er:
-        raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
+        except Error as er:
+            raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
 
 
 def cmd_provider_info(context, targetid, options):
@@ -314,28 +326,27 @@ def cmd_provider_info(context, targetid, options):
     targetid = get_target_id(context, targetid, options)
     if targetid is None:
         return
-    server = connect_target(context.targets_tbl, targetid)
+    with connect_target(context.targets_tbl, targetid) as server:
+        try:
+            # execute the namespaces to force contact with server before
+            # turning off the spinner.
+            server.namespaces  # pylint: disable=pointless-statement
+            context.spinner.stop()
 
-    try:
-        # execute the namespaces to force contact with server before
-        # turning off the spinner.
-        server.namespaces  # pylint: disable=pointless-statement
-        context.spinner.stop()
+            rows = []
+            headers = ['Brand', 'version', 'Interop Namespace', 'Namespaces']
+            if len(server.namespaces) > 50:
+                namespaces = '\n'.join(server.namespaces)
+            else:
+                namespaces = ', '.join(server.namespaces)
+            rows.append([server.brand, server.version, server.interop_ns,
+                         namespaces])
 
-        rows = []
-        headers = ['Brand', 'version', 'Interop Namespace', 'Namespaces']
-        if len(server.namespaces) > 50:
-            namespaces = '\n'.join(server.namespaces)
-        else:
-            namespaces = ', '.join(server.namespaces)
-        rows.append([server.brand, server.version, server.interop_ns,
-                     namespaces])
-
-        print_table(rows, headers, title='Server General Information',
-                    table_format=context.output_format)
+            print_table(rows, headers, title='Server General Information',
+                        table_format=context.output_format)
 
-    except Error as er:
-        raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
+        except Error as er:
+            raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
 
 
 def cmd_provider_classes(context, targetid, options):
@@ -346,53 +357,54 @@ def cmd_provider_classes(context, targetid, options):
     targetid = get_target_id(context, targetid, options)
     if targetid is None:
         return
-    server = connect_target(context.targets_tbl, targetid)
-
-    if options['namespace']:
-        ns_names = options['namespace']
-        if ns_names not in server.namespaces:
-            raise click.ClickException('Namespace %s not in server namespaces '
-                                       '%s' % (ns_names, server.namespaces))
-        ns_names = [ns_names]
-    else:
-        ns_names = server.namespaces
-        ns_names.sort()
-
-    classname_regex = options['classname']
-
-    try:
-        names_dict = {}
-        for ns_name in ns_names:
-            classnames = server.conn.EnumerateClassNames(
-                namespace=ns_name, DeepInheritance=True)
-            if classname_regex:
-                classnames = filter_stringlist(classname_regex, classnames)
-            classnames.sort()
-            names_dict[ns_name] = classnames
-
-        rows = []
-        if options['summary']:
-            headers = ['Namespace', 'Class count']
-            title = 'Server Class count'
-            for ns_name in sorted(names_dict):
-                rows.append((ns_name, len(names_dict[ns_name])))
-
+    with connect_target(context.targets_tbl, targetid) as server:
+        if options['namespace']:
+            ns_names = options['namespace']
+            if ns_names not in server.namespaces:
+                raise click.ClickException('Namespace %s not in server '
+                                           'namespaces %s' %
+                                           (ns_names, server.namespaces))
+            ns_names = [ns_names]
         else:
-            headers = ['Namespace', 'Classname']
-            title = 'Server Classes'
-            for ns_name, classes in sorted(six.iteritems(names_dict)):
-                ns_rows = []
-                for classname in classes:
-                    ns_rows.append([ns_name, classname])
-                # sort the result by classname
-                ns_rows.sort(key=lambda x: x[1])
-                rows.extend(ns_rows)
-
-        context.spinner.stop()
-        title += ' (filter=%s):' % classname_regex if classname_regex else ':'
-
-        print_table(rows, headers, title='Server Classes:',
-                    table_format=context.output_format)
-
-    except Error as er:
-        raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
+            ns_names = server.namespaces
+            ns_names.sort()
+
+        classname_regex = options['classname']
+
+        try:
+            names_dict = {}
+            for ns_name in ns_names:
+                classnames = server.conn.EnumerateClassNames(
+                    namespace=ns_name, DeepInheritance=True)
+                if classname_regex:
+                    classnames = filter_stringlist(classname_regex, classnames)
+                classnames.sort()
+                names_dict[ns_name] = classnames
+
+            rows = []
+            if options['summary']:
+                headers = ['Namespace', 'Class count']
+                title = 'Server Class count'
+                for ns_name in sorted(names_dict):
+                    rows.append((ns_name, len(names_dict[ns_name])))
+
+            else:
+                headers = ['Namespace', 'Classname']
+                title = 'Server Classes'
+                for ns_name, classes in sorted(six.iteritems(names_dict)):
+                    ns_rows = []
+                    for classname in classes:
+                        ns_rows.append([ns_name, classname])
+                    # sort the result by classname
+                    ns_rows.sort(key=lambda x: x[1])
+                    rows.extend(ns_rows)
+
+            context.spinner.stop()
+            title += ' (filter=%s):' % classname_regex if classname_regex \
+                else ':'
+
+            print_table(rows, headers, title='Server Classes:',
+                        table_format=context.output_format)
+
+        except Error as er:
+            raise click.ClickException("%s: %s" % (er.__class__.__name__, er))
@@ -19,11 +19,15 @@ servers.
 """
 from __future__ import print_function, absolute_import
 
+import sys
 import time
+import datetime
 import click
+from mysql.connector import Error as MySQLError
 
 from smipyping import ServerSweep,\
-    DEFAULT_SWEEP_PORT, SCAN_TYPES
+    DEFAULT_SWEEP_PORT, SCAN_TYPES, SweepHistoryTable, changed_subnets
+from smipyping.config import SWEEP_STATE_FILE, SWEEP_PROBE_TIMEOUT
 from .smicli import cli, CMD_OPTS_TXT
 from ._click_common import print_table
 # from .config import DEFAULT_NAMESPACE, DEFAULT_OPERATION_TIMEOUT, \
@@ -46,7 +50,8 @@ def sweep_group():
 @sweep_group.command('nets', options_metavar=CMD_OPTS_TXT)
 @click.option('-s', '--subnet', type=str, required=True, multiple=True,
               help='IP subnets to scan (ex. 10.1.132). One subnet per option '
-                   'Each subnet string is itself a definition that '
+                   'Each subnet string is either CIDR notation (ex. '
+                   '10.1.132.0/22) or a definition that '
                    'consists of period separated octets that are used to '
                    'create the individual ip addresses to be tested: '
                    '  * Integers: Each integer is in the range 0-255 '
@@ -55,7 +60,7 @@ def sweep_group():
                    '     form: int-int which defines the mininum and maximum '
                    '      values for that octet (ex 10.1.132-134) or '
                    '  * Integer lists: A range list is in the form: '
-                   '     int,int,int\n'
+                   '     int,int,int (list items may also be ranges)\n'
                    '     and defines the set of values for that octet. '
                    'Missing octet definitions are expanded to the value '
                    'range defined by the min and max octet value parameters '
@@ -71,6 +76,10 @@ def sweep_group():
 # TODO make default external
 @click.option('-t', '--scantype', type=click.Choice(SCAN_TYPES), default='tcp',
               help='Set scan type: %s. Some scan types require privilege mode.'
+                   ' The tcp-async scan type executes non-blocking connects'
+                   ' from a single thread and is the fastest unprivileged'
+                   ' scan. The syn-batch scan type sends SYN probes in'
+                   ' batches and requires privilege mode.'
                    ' ' + '(Default: %s.)' % 'tcp')
 @click.option('-m', 'MinOctetVal', type=click.IntRange(1, 254, clamp=False),
               required=False, default=1,
@@ -81,14 +90,61 @@ def sweep_group():
               help='Maximum expanded value for any octet that is not '
                    'specifically included in a net definition. Default = 254')
 @click.option('-D', '--dryrun', default=False, is_flag=True, required=False,
-              help='Display list of systems/ports to be scanned but do not '
-                   ' scan. This is a diagnostic tool'
+              help='Display count and address ranges of systems/ports to be '
+                   'scanned but do not scan. With --verbose, each ip/port is '
+                   'listed. This is a diagnostic tool'
                    ' ' + '(Default: %s.)' % False)
 @click.option('--no_threads', default=False, is_flag=True, required=False,
               help='Disable multithread scan.  This should only be used if '
                    'there are issues with the multithread scan. It is MUCH '
                    ' slower.'
                    ' ' + '(Default: %s.)' % False)
+@click.option('-o', '--output-file', type=click.Path(), required=False,
+              default=None,
+              help='Write each open host with its status (known/unknown) to '
+                   'this file as it is found so that the file can be '
+                   'followed while the sweep executes.')
+@click.option('--no-progress', default=False, is_flag=True, required=False,
+              help='Do not display the progress line (probes/s and '
+                   'estimated time remaining) on stderr during the sweep.'
+                   ' ' + '(Default: %s.)' % False)
+@click.option('-w', '--workers', type=click.IntRange(1, 64, clamp=False),
+              required=False, default=1,
+              help='Number of processes that execute the sweep. The '
+                   'addresses are split into this many shards, each scanned '
+                   'by a separate process with its own scan engine. A sweep '
+                   'can only be resumed with the same number of workers.'
+                   ' ' + '(Default: %s.)' % 1)
+@click.option('--adaptive-timeout', default=False, is_flag=True,
+              required=False,
+              help='Derive the probe timeout for each /24 subnet from the '
+                   'round trip times of the replies observed from the subnet '
+                   '(a multiple of the 99th percentile with a floor and '
+                   'ceiling) instead of the fixed %s second timeout. '
+                   '(Default: %s.)' % (SWEEP_PROBE_TIMEOUT, False))
+@click.option('--prefilter', type=click.Choice(['tcp', 'icmp']),
+              required=False, default=None,
+              help='Find the live hosts before probing the ports and probe '
+                   'all of the ports only on the live hosts. The tcp '
+                   'prefilter connects to the first port (a refused connect '
+                   'shows a live host) and the icmp prefilter pings each '
+                   'address. Hosts that drop both the probe of the first '
+                   'port and ping are not found with a prefilter. '
+                   '(Default: no prefilter.)')
+@click.option('--resume', default=False, is_flag=True, required=False,
+              help='Resume an interrupted sweep from the sweep state file. '
+                   'The subnet, port and octet value options must be the '
+                   'same as those of the interrupted sweep.'
+                   ' ' + '(Default: %s.)' % False)
+@click.option('--state-file', type=click.Path(), required=False,
+              default=SWEEP_STATE_FILE,
+              help='File in which the sweep state is saved periodically and '
+                   'when the sweep is interrupted so that it can be resumed.'
+                   ' ' + '(Default: %s.)' % SWEEP_STATE_FILE)
+@click.option('--no-history', default=False, is_flag=True, required=False,
+              help='Do not save the sweep and the open hosts found in the '
+                   'sweep history of the database.'
+                   ' ' + '(Default: %s.)' % False)
 @click.pass_obj
 def sweep_nets(context, **options):  # pylint: disable=redefined-builtin
     """
@@ -98,6 +154,28 @@ def sweep_nets(context, **options):  # pylint: disable=redefined-builtin
     context.execute_cmd(lambda: cmd_sweep_nets(context, options))
 
 
+@sweep_group.command('diff', options_metavar=CMD_OPTS_TXT)
+@click.option('-i', '--sweep-id', type=int, required=False, default=None,
+              help='SweepID of the sweep to compare from the sweep history. '
+                   '(Default: the newest sweep.)')
+@click.option('-f', '--from-id', type=int, required=False, default=None,
+              help='SweepID of the earlier sweep to compare with. '
+                   '(Default: the open hosts known from all earlier sweeps '
+                   'that probed the addresses and ports of the sweep.)')
+@click.pass_obj
+def sweep_diff(context, **options):
+    """
+    Display the open hosts that appeared or vanished in a sweep.
+
+    Compares the open hosts found by a sweep in the sweep history with
+    those found by earlier sweeps. Only the addresses and ports probed by
+    the sweep are compared so the result of a narrow sweep of a few subnets
+    shows only the changes in those subnets. The subnets with changes are
+    listed so that they can be swept again with the sweep nets command.
+    """
+    context.execute_cmd(lambda: cmd_sweep_diff(context, options))
+
+
 #####################################################################
 #
 #     Action functions for sweep
@@ -105,6 +183,29 @@ def sweep_nets(context, **options):  # pylint: disable=redefined-builtin
 #####################################################################
 
 
+def format_seconds(seconds):
+    """Return time in seconds as a string of hours:minutes:seconds."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
+def display_progress(done, total, elapsed):
+    """
+    Display sweep progress as a single line on stderr that is rewritten for
+    each update when stderr is a terminal.
+    """
+    rate = done / elapsed if elapsed else 0.0
+    eta = format_seconds((total - done) / rate) if rate else '?'
+    percent = 100.0 * done / total if total else 100.0
+    line = 'Probes %s/%s (%.1f%%) %.0f probes/s ETA %s' % \
+        (done, total, percent, rate, eta)
+    if sys.stderr.isatty():
+        click.echo('\r%s' % line.ljust(70), nl=(done >= total), err=True)
+    else:
+        click.echo(line, err=True)
+
+
 def cmd_sweep_nets(context, options):
     """
     Build the list of subnets to sweep from the inputs and execute the
@@ -112,7 +213,7 @@ def cmd_sweep_nets(context, options):
     defining servers found in the sweep.
     """
     # Sweep the servers and display result
-    if options['scantype'] != 'tcp':
+    if options['scantype'] not in ('tcp', 'tcp-async'):
         click.echo('WARNING: serversweep requires privilege mode for the %s '
                    'scantype' % options['scantype'])
 
@@ -129,14 +230,44 @@ def cmd_sweep_nets(context, options):
                         min_octet_val=options['MinOctetVal'],
                         max_octet_val=options['MaxOctetVal'],
                         verbose=context.verbose,
-                        scan_type=options['scantype'])
+                        scan_type=options['scantype'],
+                        state_file=options['state_file'],
+                        workers=options['workers'],
+                        adaptive_timeout=options['adaptive_timeout'],
+                        prefilter=options['prefilter'])
 
     if options['dryrun']:
         sweep.list_subnets_to_scan()
     else:
         click.echo('The sweep may take several minutes')
+        # Open hosts and progress are displayed as the sweep executes
+        context.spinner.stop()
+
+        output_file = None
+        if options['output_file']:
+            # A resumed sweep adds to the output of the interrupted sweep
+            output_file = open(options['output_file'],
+                               'a' if options['resume'] else 'w')
 
-        open_servers = sweep.sweep_servers()
+        def host_found(open_host):
+            """Display and write each open host as it is found"""
+            status = sweep.host_status(open_host)
+            if sys.stderr.isatty() and not options['no_progress']:
+                click.echo('\r', nl=False, err=True)
+            click.echo('Open %s:%s %s' % (open_host[0], open_host[1], status))
+            if output_file:
+                sweep.write_result(output_file, open_host)
+
+        progress = None if options['no_progress'] else display_progress
+        try:
+            open_servers = sweep.sweep_servers(open_host_callback=host_found,
+                                               progress_callback=progress,
+                                               resume=options['resume'])
+        except ValueError as ve:
+            raise click.ClickException('Sweep failed: %s' % ve)
+        finally:
+            if output_file:
+                output_file.close()
 
         headers = ['IPAddress', 'CompanyName', 'Product', 'Status']
 
@@ -149,6 +280,9 @@ def cmd_sweep_nets(context, options):
                 % (sweep.net_defs, options['port'], range_txt,
                    options['scantype'],
                    sweep.sweep_time, sweep.total_pings, len(open_servers))
+        if options['prefilter']:
+            title += ' pings skipped by %s prefilter=%s' % \
+                (options['prefilter'], sweep.total_skipped)
 
         execution_time = time.time() - start_time
         if execution_time <= 60:
@@ -172,4 +306,78 @@ def cmd_sweep_nets(context, options):
                    (known, unknown, (known + unknown), sweep.sweep_time,
                     execution_time))
 
+        if not options['no_history']:
+            try:
+                history_tbl = SweepHistoryTable.factory(context.db_info,
+                                                        context.db_type,
+                                                        context.verbose)
+                sweep_id = history_tbl.append(
+                    datetime.datetime.now(), sweep.sweep_definition(),
+                    options['scantype'], sweep.total_pings, open_servers)
+            except ValueError as ve:
+                raise click.ClickException('Save of sweep history failed: %s'
+                                           % ve)
+            except MySQLError as ex:
+                raise click.ClickException('Save of sweep history failed, '
+                                           'Database Error Exception: %s: %s'
+                                           % (ex.__class__.__name__, ex))
+            click.echo('Sweep saved in sweep history as SweepID %s' %
+                       sweep_id)
+
+
+def cmd_sweep_diff(context, options):
+    """
+    Compare a sweep from the sweep history with the earlier sweeps and
+    display the open hosts that appeared or vanished.
+    """
+    try:
+        history_tbl = SweepHistoryTable.factory(context.db_info,
+                                                context.db_type,
+                                                context.verbose)
+    except ValueError as ve:
+        raise click.ClickException('Sweep history load failed: %s' % ve)
+    except MySQLError as ex:
+        raise click.ClickException('Sweep history load failed, Database Error '
+                                   'Exception: %s: %s'
+                                   % (ex.__class__.__name__, ex))
+
+    sweep_ids = history_tbl.sweep_ids()
+    if not sweep_ids:
+        raise click.ClickException('No sweeps in sweep history')
+    sweep_id = options['sweep_id'] or sweep_ids[-1]
+    try:
+        appeared, vanished = history_tbl.diff(sweep_id,
+                                              from_id=options['from_id'])
+    except KeyError as ke:
+        raise click.ClickException('SweepID %s not in sweep history' % ke)
+    except MySQLError as ex:
+        raise click.ClickException('Sweep history load failed, Database Error '
+                                   'Exception: %s: %s'
+                                   % (ex.__class__.__name__, ex))
+
+    record = history_tbl[sweep_id]
+    from_txt = 'SweepID %s' % options['from_id'] if options['from_id'] \
+        else 'earlier sweeps'
+    title = 'Sweep changes: SweepID %s (%s) subnet(s)=%s port(s)=%s ' \
+        'compared with %s' % (sweep_id, record['Timestamp'],
+                              record['NetDefs'], record['Ports'], from_txt)
+
+    context.spinner.stop()
+    if not appeared and not vanished:
+        click.echo('%s\nNo changes' % title)
+        return
+
+    rows = []
+    for change, hosts in (('appeared', appeared), ('vanished', vanished)):
+        for ip, port in hosts:
+            target_ids = context.targets_tbl.get_targets_host((ip, port)) \
+                if context.targets_tbl is not None else []
+            rows.append([ip, port, change,
+                         ', '.join(str(id_) for id_ in target_ids)])
+    print_table(rows, headers=['IPAddress', 'Port', 'Change', 'TargetIDs'],
+                title=title)
+    click.echo('\nAppeared=%s, Vanished=%s' % (len(appeared), len(vanished)))
+    click.echo('Subnets with changes: %s' %
+               ' '.join(changed_subnets(appeared + vanished)))
+
 # what about database as option???
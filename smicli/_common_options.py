@@ -20,6 +20,8 @@ and help to be defined once and used multiple times.
 from __future__ import absolute_import
 
 import click
+from smipyping._ping import PING_MODES
+from smipyping._cimprobe import PROBE_STRATEGIES
 
 
 def add_options(options):
@@ -56,6 +58,26 @@ namespace_option = [                     # pylint: disable=invalid-name
                  help='Namespace to use for this operation. If not defined '
                       'all namespaces are used')]
 
+ping_mode_option = [              # pylint: disable=invalid-name
+    click.option('--ping-mode', type=click.Choice(PING_MODES), default=None,
+                 help='Method of the network level ping of the wbem '
+                      'servers. "icmp" sends an ICMP echo request and "tcp" '
+                      'connects to the WBEM server port, for servers that '
+                      'block ICMP. If not set, the mode defined for each '
+                      'target in the ping section of the config file '
+                      '(Default: icmp).')]
+
+probe_option = [              # pylint: disable=invalid-name
+    click.option('--probe', type=click.Choice(PROBE_STRATEGIES),
+                 default=None,
+                 help='CIM operation that tests the wbem servers. '
+                      '"enuminsts" enumerates the instances of the test '
+                      'class, "enumnames" only their paths, "pull" opens a '
+                      'pull enumeration of at most one path and "getclass" '
+                      'gets the test class. If not set, the strategy '
+                      'defined for each target in the probe section of the '
+                      'config file (Default: enuminsts).')]
+
 no_verify_option = [              # pylint: disable=invalid-name
     click.option('-N', '--no_verify', default=False, is_flag=True,
                  help='Disable verification prompt before the change is '
@@ -223,6 +223,58 @@ def cli(ctx, config_file, db_type, log, log_dest, output_format, verbose,
             # raise click.ClickException('No Database info provided for '
             #                           'database type %s' % db_type)
 
+        # Limits for the probes of sweep, cimping and explore
+        if ctx.default_map and 'ratelimit' in ctx.default_map:
+            try:
+                smipyping.configure_probe_throttle(
+                    **ctx.default_map['ratelimit'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid ratelimit section in '
+                                           'config file: %s' % ex)
+
+        # Ping mode of cimping and explore for all targets and by target
+        if ctx.default_map and 'ping' in ctx.default_map:
+            try:
+                smipyping.configure_ping_mode(**ctx.default_map['ping'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid ping section in config '
+                                           'file: %s' % ex)
+
+        # CIM operation of cimping for all targets and by target
+        if ctx.default_map and 'probe' in ctx.default_map:
+            try:
+                smipyping.configure_probe_strategy(
+                    **ctx.default_map['probe'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid probe section in config '
+                                           'file: %s' % ex)
+
+        # Repeats of the cimping tests that fail with transient errors
+        if ctx.default_map and 'retry' in ctx.default_map:
+            try:
+                smipyping.configure_retry_policy(**ctx.default_map['retry'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid retry section in config '
+                                           'file: %s' % ex)
+
+        # Time that ping results are reused by later commands
+        if ctx.default_map and 'reachability' in ctx.default_map:
+            try:
+                smipyping.configure_reachability_cache(
+                    **ctx.default_map['reachability'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid reachability section in '
+                                           'config file: %s' % ex)
+
+        # Reuse of the WBEM connections by later requests and commands
+        if ctx.default_map and 'connectionpool' in ctx.default_map:
+            try:
+                smipyping.configure_connection_pool(
+                    **ctx.default_map['connectionpool'])
+            except (TypeError, ValueError) as ex:
+                raise click.ClickException('Invalid connectionpool section '
+                                           'in config file: %s' % ex)
+
         config_file_dir = os.path.dirname(os.getcwd())
 
         # Enable the hidden loggers.
@@ -71,14 +71,26 @@ from ._userstable import *  # noqa: F401,F403
 from ._notificationstable import *  # noqa: F401,F403
 from ._previousscanstable import *  # noqa: F401,F403
 from ._programstable import *  # noqa: F401,F403
+from ._sweephistorytable import *  # noqa: F401,F403
 
 # TODO should drop _cliutils
 from ._cliutils import *  # noqa: F401,F403
 from ._scanport_syn import *  # noqa: F401,F403
 from ._scanport_tcp import *  # noqa: F401,F403
+from ._ipranges import *  # noqa: F401,F403
+from ._adaptivetimeout import *  # noqa: F401,F403
+from ._fingerprint import *  # noqa: F401,F403
+from ._ratelimit import *  # noqa: F401,F403
+from ._reachabilitycache import *  # noqa: F401,F403
+from ._connectionpool import *  # noqa: F401,F403
+from ._cimprobe import *  # noqa: F401,F403
+from ._retrypolicy import *  # noqa: F401,F403
+from ._workpipeline import *  # noqa: F401,F403
 
 # core functional smipyping libraries
+from ._simpleping_async import *  # noqa: F401,F403
 from ._simpleping import *  # noqa: F401,F403
+from ._monitor import *  # noqa: F401,F403
 from ._explore import *  # noqa: F401,F403
 from ._serversweep import *  # noqa: F401,F403
 from ._dbtablebase import *  # noqa: F401,F403
@@ -0,0 +1,140 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Port scan timeouts that adapt to the round trip times observed for each
+subnet during a sweep.
+
+Any reply to a probe (open or closed port) gives the round trip time to the
+subnet. Once enough replies have been seen from a subnet, the timeout for the
+addresses in that subnet is a multiple of the 99th percentile of the round
+trip times, limited by a floor and a ceiling.
+"""
+
+from __future__ import print_function, absolute_import
+
+import threading
+from collections import deque
+
+from .config import ADAPTIVE_TIMEOUT_MULTIPLIER, ADAPTIVE_TIMEOUT_MIN, \
+    ADAPTIVE_TIMEOUT_MAX
+
+__all__ = ['AdaptiveTimeout']
+
+
+class AdaptiveTimeout(object):
+    """
+    Tracks probe round trip times (RTT) per subnet and computes the probe
+    timeout for each address from them.  This is thread safe so it can be
+    shared by the threads of a threaded scan.
+    """
+    # Number of samples kept for each subnet
+    MAX_SAMPLES = 200
+
+    # Number of samples required before the timeout adapts
+    MIN_SAMPLES = 10
+
+    # Number of new samples after which the timeout for a subnet is
+    # recomputed
+    RECOMPUTE_SAMPLES = 10
+
+    def __init__(self, multiplier=None, min_timeout=None, max_timeout=None,
+                 prefix_len=24):
+        """
+        Parameters:
+
+          multiplier (int or float): Timeout as a multiple of the 99th
+            percentile RTT. Default
+            :data:`~smipyping.config.ADAPTIVE_TIMEOUT_MULTIPLIER`.
+
+          min_timeout (int or float): Floor for the timeout in seconds.
+            Default :data:`~smipyping.config.ADAPTIVE_TIMEOUT_MIN`.
+
+          max_timeout (int or float): Ceiling for the timeout in seconds.
+            This is also the timeout until enough samples have been seen for
+            a subnet. Default :data:`~smipyping.config.ADAPTIVE_TIMEOUT_MAX`.
+
+          prefix_len (integer): Number of leading bits of the ip address that
+            define a subnet. Must be 8, 16 or 24.
+        """
+        self.multiplier = multiplier or ADAPTIVE_TIMEOUT_MULTIPLIER
+        self.min_timeout = min_timeout or ADAPTIVE_TIMEOUT_MIN
+        self.max_timeout = max_timeout or ADAPTIVE_TIMEOUT_MAX
+        if prefix_len not in (8, 16, 24):
+            raise ValueError('prefix_len %s invalid. Must be 8, 16 or 24' %
+                             prefix_len)
+        self.octet_count = prefix_len // 8
+        # subnet: deque of recent RTT samples
+        self._samples = {}
+        # subnet: (computed timeout, samples added since computed)
+        self._timeouts = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'AdaptiveTimeout(multiplier=%s, min_timeout=%s, ' \
+               'max_timeout=%s, subnets=%s)' % (self.multiplier,
+                                                self.min_timeout,
+                                                self.max_timeout,
+                                                len(self._samples))
+
+    def subnet(self, ip_address):
+        """Return the subnet key for the dotted string ip_address."""
+        return ip_address.rsplit('.', 4 - self.octet_count)[0]
+
+    def add_sample(self, ip_address, rtt):
+        """
+        Record the round trip time rtt in seconds of a reply from
+        ip_address.
+        """
+        subnet = self.subnet(ip_address)
+        with self._lock:
+            samples = self._samples.get(subnet)
+            if samples is None:
+                samples = self._samples[subnet] = deque(
+                    maxlen=self.MAX_SAMPLES)
+            samples.append(rtt)
+            timeout, count = self._timeouts.get(subnet,
+                                                (self.max_timeout, 0))
+            count += 1
+            if len(samples) >= self.MIN_SAMPLES and \
+                    count >= self.RECOMPUTE_SAMPLES:
+                timeout = self.compute_timeout(samples)
+                count = 0
+            self._timeouts[subnet] = (timeout, count)
+
+    def compute_timeout(self, samples):
+        """
+        Return the timeout for the list of RTT samples: the 99th percentile
+        times the multiplier limited to the min and max timeout.
+        """
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return max(self.min_timeout,
+                   min(self.max_timeout, p99 * self.multiplier))
+
+    def timeout(self, ip_address):
+        """
+        Return the probe timeout in seconds for ip_address.
+        """
+        entry = self._timeouts.get(self.subnet(ip_address))
+        return entry[0] if entry else self.max_timeout
+
+    def subnet_timeouts(self):
+        """
+        Return dictionary of subnet: current timeout for the subnets with
+        samples.
+        """
+        with self._lock:
+            return dict((subnet, entry[0])
+                        for subnet, entry in self._timeouts.items())
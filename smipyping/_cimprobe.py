@@ -0,0 +1,122 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+CIM operations used by cimping to test that a WBEM server is alive.
+
+The probe strategies differ in the size of the response the server must
+build and the client must parse:
+
+  * enuminsts - EnumerateInstances of the test class. Returns all of the
+    instances with all of their properties.
+  * enumnames - EnumerateInstanceNames of the test class. Returns only the
+    instance paths.
+  * pull - OpenEnumerateInstancePaths of the test class with MaxObjectCount
+    1 followed by CloseEnumeration if the enumeration is not complete.
+    Returns at most one instance path. Requires a server that supports the
+    pull operations.
+  * getclass - GetClass of the test class with LocalOnly and without
+    qualifiers. Does not touch the instance providers.
+
+The strategy is set for all targets or for individual targets with
+:func:`configure_probe_strategy`.
+"""
+
+from __future__ import print_function, absolute_import
+
+from .config import PING_TEST_CLASS, DEFAULT_PROBE_STRATEGY
+
+__all__ = ['PROBE_STRATEGIES', 'probe_server', 'configure_probe_strategy',
+           'get_probe_strategy']
+
+#: Names of the probe strategies.
+PROBE_STRATEGIES = ['enuminsts', 'enumnames', 'pull', 'getclass']
+
+# Probe strategy of the targets that have none in _TARGET_PROBE_STRATEGIES
+_PROBE_STRATEGY = DEFAULT_PROBE_STRATEGY
+
+# Probe strategy of individual targets keyed by TargetID
+_TARGET_PROBE_STRATEGIES = {}
+
+
+def probe_server(conn, strategy, classname=PING_TEST_CLASS):
+    """
+    Execute the CIM operation of strategy with the pywbem connection conn.
+
+    Returns the number of objects returned by the server.
+
+    Exceptions:
+        pywbem exceptions of the operation. ValueError if strategy is
+        invalid.
+    """
+    if strategy == 'enuminsts':
+        return len(conn.EnumerateInstances(classname))
+    if strategy == 'enumnames':
+        return len(conn.EnumerateInstanceNames(classname))
+    if strategy == 'pull':
+        result = conn.OpenEnumerateInstancePaths(classname, MaxObjectCount=1)
+        if not result.eos:
+            conn.CloseEnumeration(result.context)
+        return len(result.paths)
+    if strategy == 'getclass':
+        conn.GetClass(classname, LocalOnly=True, IncludeQualifiers=False)
+        return 1
+    raise ValueError('Probe strategy %s invalid. Must be one of %s' %
+                     (strategy, ', '.join(PROBE_STRATEGIES)))
+
+
+def configure_probe_strategy(strategy=None, target_strategies=None):
+    """
+    Set the probe strategies used by cimping in this process.
+
+    Parameters:
+
+      strategy (:term:`string`): Probe strategy of all targets that are not
+        in target_strategies. One of :data:`PROBE_STRATEGIES`. If None,
+        :data:`~smipyping.config.DEFAULT_PROBE_STRATEGY`.
+
+      target_strategies (dict or list of :term:`string`): Probe strategy
+        keyed by TargetID or list of strings TargetID:strategy (ex.
+        '12:getclass').
+
+    Exceptions:
+        ValueError if a strategy or target strategy is invalid.
+    """
+    global _PROBE_STRATEGY  # pylint: disable=global-statement
+    strategy = strategy or DEFAULT_PROBE_STRATEGY
+    if isinstance(target_strategies, dict):
+        items = list(target_strategies.items())
+    else:
+        items = []
+        for item in target_strategies or []:
+            target_id, _, target_strategy = item.partition(':')
+            if not target_id.isdigit():
+                raise ValueError('Target strategy %s invalid. Must be '
+                                 'TargetID:strategy' % item)
+            items.append((int(target_id), target_strategy))
+    for value in [strategy] + [item[1] for item in items]:
+        if value not in PROBE_STRATEGIES:
+            raise ValueError('Probe strategy %s invalid. Must be one of %s' %
+                             (value, ', '.join(PROBE_STRATEGIES)))
+    _PROBE_STRATEGY = strategy
+    _TARGET_PROBE_STRATEGIES.clear()
+    _TARGET_PROBE_STRATEGIES.update(items)
+
+
+def get_probe_strategy(target_id=None):
+    """
+    Return the probe strategy configured for the target with target_id or
+    for all targets if target_id is None.
+    """
+    return _TARGET_PROBE_STRATEGIES.get(target_id, _PROBE_STRATEGY)
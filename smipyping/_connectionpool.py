@@ -0,0 +1,229 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Pool of pywbem WBEMConnection objects used by cimping, explore, the provider
+commands and the server sweep.
+
+A connection is lent to one user at a time: :meth:`WBEMConnectionPool.get`
+checks a connection out of the pool and :meth:`WBEMConnectionPool.release`
+checks it back in for reuse by later requests to the same server with the
+same parameters until it has not been used for the idle timeout of the pool.
+A connection is never shared by two threads since a WBEMConnection keeps the
+state of its last operation (debug, last_request, last_reply,
+last_server_response_time and the statistics).
+
+With versions of pywbem whose WBEMConnection keeps the HTTP session open
+between operations (pywbem 1.0 and later), reusing the connection reuses the
+established TCP and TLS session. With earlier versions each operation opens
+a new HTTP connection so the pool only saves the creation of the
+WBEMConnection objects.
+
+One pool is shared by the process (see :func:`configure_connection_pool` and
+:func:`get_connection_pool`) so that repeated cimping and monitoring cycles
+and the commands of the smicli repl use the same connections.
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pywbem import WBEMConnection
+
+from .config import CONNECTION_POOL_IDLE_TIMEOUT, CONNECTION_POOL_MAX_SIZE
+
+__all__ = ['WBEMConnectionPool', 'configure_connection_pool',
+           'get_connection_pool']
+
+
+def close_connection(conn):
+    """Close the HTTP session of conn if this pywbem version keeps one."""
+    close = getattr(conn, 'close', None)
+    if close is not None:
+        close()
+
+
+class WBEMConnectionPool(object):
+    """
+    Thread safe pool of WBEMConnection objects keyed by the url, credentials
+    (principal and password), namespace and the other parameters of the
+    connection.
+
+    Each connection is lent exclusively: it is removed from the pool by
+    :meth:`get` and is only available to other users after :meth:`release`.
+    A connection that is not released (for example one kept by the
+    WBEMServer of an explore result) is simply not reused.
+    """
+    def __init__(self, idle_timeout=CONNECTION_POOL_IDLE_TIMEOUT,
+                 max_size=CONNECTION_POOL_MAX_SIZE):
+        """
+        Parameters:
+
+          idle_timeout (int or float): Time in seconds after the last use of
+            a connection at which it is removed from the pool. If None or 0,
+            connections are not reused.
+
+          max_size (integer): Maximum number of idle connections in the pool.
+            The least recently used connection is removed when the pool is
+            full.
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        if idle_timeout is not None and idle_timeout < 0:
+            raise ValueError('idle_timeout %s invalid. Must be positive' %
+                             idle_timeout)
+        if max_size is not None and max_size < 1:
+            raise ValueError('max_size %s invalid. Must be ge 1' % max_size)
+        self.idle_timeout = idle_timeout or 0
+        self.max_size = max_size or CONNECTION_POOL_MAX_SIZE
+        # (connection key, last use time) keyed by the idle connections in
+        # least recently used first order
+        self._idle = OrderedDict()
+        # connection key keyed by the connections that are checked out
+        self._lent = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'WBEMConnectionPool(idle_timeout=%s, max_size=%s, ' \
+               'idle=%s, lent=%s)' % (self.idle_timeout, self.max_size,
+                                      len(self._idle), len(self._lent))
+
+    def __len__(self):
+        """Return the number of idle connections in the pool."""
+        return len(self._idle)
+
+    def get(self, url, creds=None, namespace=None, timeout=None,
+            no_verification=True, x509=None):
+        """
+        Check out a WBEMConnection for the parameters. An idle connection
+        from the pool is returned if there is one. Otherwise a new one is
+        created. The parameters are those of WBEMConnection with namespace
+        as the default namespace.
+
+        The caller has exclusive use of the connection until it returns it
+        with :meth:`release` or closes it with :meth:`discard`.
+        """
+        if not self.idle_timeout:
+            return WBEMConnection(url, creds, default_namespace=namespace,
+                                  no_verification=no_verification, x509=x509,
+                                  timeout=timeout)
+        key = (url, creds, namespace, no_verification, timeout,
+               tuple(sorted(x509.items())) if x509 else None)
+        with self._lock:
+            self._evict_idle(time.time())
+            # Most recently used first so that idle connections expire
+            for conn in reversed(self._idle):
+                if self._idle[conn][0] == key:
+                    del self._idle[conn]
+                    break
+            else:
+                conn = WBEMConnection(url, creds, default_namespace=namespace,
+                                      no_verification=no_verification,
+                                      x509=x509, timeout=timeout)
+            self._lent[conn] = key
+        return conn
+
+    def release(self, conn):
+        """
+        Check conn, returned by :meth:`get`, back in to the pool for reuse.
+        A connection that is not from the pool is closed.
+        """
+        conn.debug = False
+        with self._lock:
+            key = self._lent.pop(conn, None)
+            if key is None:
+                close_connection(conn)
+                return
+            now = time.time()
+            self._evict_idle(now)
+            self._idle[conn] = (key, now)
+            while len(self._idle) > self.max_size:
+                close_connection(self._idle.popitem(last=False)[0])
+
+    def discard(self, conn):
+        """
+        Close conn, returned by :meth:`get`, instead of returning it to the
+        pool, for example after an error that may have left its session
+        unusable.
+        """
+        with self._lock:
+            self._lent.pop(conn, None)
+            self._idle.pop(conn, None)
+        close_connection(conn)
+
+    @contextmanager
+    def connection(self, url, creds=None, namespace=None, timeout=None,
+                   no_verification=True, x509=None):
+        """
+        Context manager that checks out a connection with :meth:`get` for
+        the with block. The connection is released at the end of the block
+        or discarded if the block raises an exception.
+        """
+        conn = self.get(url, creds, namespace=namespace, timeout=timeout,
+                        no_verification=no_verification, x509=x509)
+        try:
+            yield conn
+        except BaseException:
+            self.discard(conn)
+            raise
+        self.release(conn)
+
+    def _evict_idle(self, now):
+        """Remove the connections past the idle timeout. Lock held."""
+        while self._idle:
+            conn = next(iter(self._idle))
+            if self._idle[conn][1] + self.idle_timeout > now:
+                return
+            del self._idle[conn]
+            close_connection(conn)
+
+    def clear(self):
+        """
+        Close and remove all of the idle connections. Connections that are
+        checked out are closed when they are released.
+        """
+        with self._lock:
+            for conn in self._idle:
+                close_connection(conn)
+            self._idle.clear()
+            self._lent.clear()
+
+
+# The WBEMConnectionPool shared by this process
+_CONNECTION_POOL = WBEMConnectionPool()
+
+
+def configure_connection_pool(idle_timeout=CONNECTION_POOL_IDLE_TIMEOUT,
+                              max_size=CONNECTION_POOL_MAX_SIZE):
+    """
+    Replace the WBEMConnectionPool shared by this process with an empty pool.
+    See :class:`WBEMConnectionPool` for the parameters. Returns the new pool.
+    """
+    global _CONNECTION_POOL  # pylint: disable=global-statement
+    _CONNECTION_POOL.clear()
+    _CONNECTION_POOL = WBEMConnectionPool(idle_timeout=idle_timeout,
+                                          max_size=max_size)
+    return _CONNECTION_POOL
+
+
+def get_connection_pool():
+    """
+    Return the WBEMConnectionPool shared by this process.
+    """
+    return _CONNECTION_POOL
@@ -28,9 +28,11 @@ from collections import namedtuple
 from urlparse import urlparse
 import threading
 
-from pywbem import WBEMConnection, WBEMServer, ValueMapping, Error, \
+from pywbem import WBEMServer, ValueMapping, Error, \
     ConnectionError, TimeoutError, AuthError
-from ._ping import ping_host
+from ._ping import ping_host, tcp_ping, url_ping_address, get_ping_mode
+from ._ratelimit import get_probe_throttle
+from ._connectionpool import get_connection_pool
 from .config import PING_TIMEOUT, DEFAULT_USERNAME, DEFAULT_PASSWORD
 from ._logging import get_logger, SmiPypingLoggers, logged_api_call, \
     EXPLORE_LOGGER_NAME, SMIPYPING_LOGGER_NAME
@@ -63,10 +65,17 @@ class Explorer(object):
 
     def __init__(self, prog, targets_tbl, logfile=None, log_level=None,
                  debug=None, ping=None, verbose=None, threaded=False,
-                 output_format='simple'):
-        """Initialize instance attributes."""
+                 output_format='simple', ping_mode=None):
+        """
+        Initialize instance attributes.
+
+        ping_mode is the ping mode (one of :data:`~smipyping.PING_MODES`)
+        for all of the servers. If None, the mode configured for each target
+        (see :func:`~smipyping.configure_ping_mode`).
+        """
         self.verbose = verbose
         self.ping = ping
+        self.ping_mode = ping_mode
         self.targets_tbl = targets_tbl
         self.timeout = None
         self.prog = prog
@@ -195,8 +204,15 @@ class Explorer(object):
         """ Explore a cim server for characteristics defined by
             the server class including namespaces, brand, version, etc. info.
 
+            The exploration is started when the probe throttle allows.
+
             Return: The ServerInfoTuple object
         """
+        with get_probe_throttle().probe(target['IPAddress']):
+            return self._explore_server(url, target, principal, credential)
+
+    def _explore_server(self, url, target, principal, credential):
+        """Explore the server after the probe throttle allows it."""
         cmd_time = 0
         start_time = time.time()   # Scan start time
         target_id = target['TargetID']
@@ -210,7 +226,7 @@ class Explorer(object):
                target['CompanyName'])
         svr_tuple = None
         if self.ping:
-            ping_result = self.ping_server(url, self.verbose)
+            ping_result = self.ping_server(url, self.verbose, target)
             if ping_result is False:
                 cmd_time = time.time() - start_time
                 self.logger.error('PING_FAIL %s time %.2f s', log_info,
@@ -221,10 +237,14 @@ class Explorer(object):
                                             time=cmd_time)
                 RESULTS.append(svr_tuple)
                 return svr_tuple
+        conn = None
         try:
             self.logger.info('Open %s', log_info)
-            conn = WBEMConnection(url, (principal, credential),
-                                  no_verification=True, timeout=20)
+            # The connection is checked out for the WBEMServer of the result,
+            # which uses it for the reports after the exploration, so it is
+            # not returned to the pool.
+            conn = get_connection_pool().get(url, (principal, credential),
+                                             no_verification=True, timeout=20)
             server = WBEMServer(conn)
 
             # Access the server since the creation of the connection
@@ -293,21 +313,35 @@ class Explorer(object):
                                         cmd_time)
             traceback.format_exc()
 
+        if svr_tuple.status != 'OK' and conn is not None:
+            get_connection_pool().discard(conn)
         RESULTS.append(svr_tuple)
         return svr_tuple
 
-    def ping_server(self, url, verbose):  # pylint: disable=no-self-use
+    def ping_server(self, url, verbose, target=None):
         """
-        Get the netloc from the url and ping the server.
+        Get the netloc from the url and ping the server. If the ping mode of
+        the target is tcp, the ping is a connect to the Port of the target.
 
         Returns the result text that must match the defined texts.
 
         """
         netloc = urlparse(url).netloc
         target_address = netloc.split(':')
-        result = ping_host(target_address[0], PING_TIMEOUT)
+        target_id = target['TargetID'] if target else None
+        ping_mode = self.ping_mode or get_ping_mode(target_id)
+        if ping_mode == 'tcp':
+            port = int(target['Port']) if target else \
+                url_ping_address(url)[1]
+            result, latency = tcp_ping(target_address[0], port, PING_TIMEOUT)
+            if result:
+                self.logger.info('TCP ping %s port %s latency %.3fs',
+                                 target_address[0], port, latency)
+        else:
+            result = ping_host(target_address[0], PING_TIMEOUT)
         if verbose:
-            print('Ping host=%s, result=%s' % (target_address[0], result))
+            print('Ping host=%s, mode=%s, result=%s' % (target_address[0],
+                                                        ping_mode, result))
         return result
 
     def explore_server_profiles(self, server, args, short_explore=True):
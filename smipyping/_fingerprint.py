@@ -0,0 +1,271 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unauthenticated fingerprint of an open port to determine if it is a WBEM
+server (CIM-XML over HTTP/HTTPS) without executing any CIM operation that
+loads the server.
+
+A single minimal CIM-XML request (GetQualifier) is posted to /cimom without
+credentials. WBEM servers either reject it with CIM-XML specific headers
+(CIMError, CIMOperation, CIMProtocolVersion) or an authentication challenge
+or answer it with a CIM-XML response. Any other HTTP response identifies
+some other HTTP service.  The Server header and, for https, the subject and
+digest of the TLS certificate are recorded as the server identity.
+"""
+
+from __future__ import print_function, absolute_import
+
+import ssl
+import socket
+import hashlib
+from collections import namedtuple
+import six
+from six.moves import http_client
+
+from .config import FINGERPRINT_TIMEOUT
+
+__all__ = ['WBEMFingerprint', 'fingerprint_host', 'FP_WBEM', 'FP_HTTP',
+           'FP_OTHER', 'FP_NO_RESPONSE']
+
+#: Classification of a port that responds as a WBEM server
+FP_WBEM = 'WBEM'
+#: Classification of a port that responds as some other HTTP service
+FP_HTTP = 'HTTP'
+#: Classification of a port that accepts connections but does not speak HTTP
+FP_OTHER = 'Other'
+#: Classification of a port that did not respond
+FP_NO_RESPONSE = 'NoResponse'
+
+#: Result of fingerprint_host.
+#:
+#: classification: One of FP_WBEM, FP_HTTP, FP_OTHER, FP_NO_RESPONSE.
+#: http_status: HTTP status code of the response or None.
+#: server: Server identity from the Server or WWW-Authenticate headers or
+#: None.
+#: cim_protocol_version: Value of the CIMProtocolVersion header or None.
+#: cert_subject: Subject of the TLS certificate or None.
+#: cert_sha256: SHA-256 hex digest of the TLS certificate or None.
+#: detail: Text describing the response or the error.
+#: scheme: Scheme (http or https) used for the fingerprint.
+WBEMFingerprint = namedtuple('WBEMFingerprint',
+                             ['classification', 'http_status', 'server',
+                              'cim_protocol_version', 'cert_subject',
+                              'cert_sha256', 'detail', 'scheme'])
+
+# Response headers only sent by CIM-XML servers (DSP0200)
+CIM_HEADERS = ('cimoperation', 'cimerror', 'cimprotocolversion',
+               'pegasusauthorization')
+
+FINGERPRINT_BODY = (
+    '<?xml version="1.0" encoding="utf-8" ?>\n'
+    '<CIM CIMVERSION="2.0" DTDVERSION="2.0">'
+    '<MESSAGE ID="1001" PROTOCOLVERSION="1.0"><SIMPLEREQ>'
+    '<IMETHODCALL NAME="GetQualifier">'
+    '<LOCALNAMESPACEPATH><NAMESPACE NAME="interop"/></LOCALNAMESPACEPATH>'
+    '<IPARAMVALUE NAME="QualifierName"><VALUE>Abstract</VALUE></IPARAMVALUE>'
+    '</IMETHODCALL></SIMPLEREQ></MESSAGE></CIM>')
+
+# Start of the detail of the result for a failed TLS handshake
+TLS_ERROR = 'TLS error'
+
+FINGERPRINT_HEADERS = {
+    'Content-type': 'application/xml; charset="utf-8"',
+    'CIMOperation': 'MethodCall',
+    'CIMMethod': 'GetQualifier',
+    'CIMObject': 'interop',
+}
+
+
+# Short names of the X.509 name attributes included in the certificate
+# subject keyed by the DER encoded attribute OID
+NAME_ATTRIBUTES = {
+    b'\x55\x04\x03': 'CN',
+    b'\x55\x04\x06': 'C',
+    b'\x55\x04\x0a': 'O',
+    b'\x55\x04\x0b': 'OU',
+}
+
+
+def der_element(data, pos):
+    """
+    Return tuple of (tag, content start, content end) of the DER element
+    at pos in data.
+    """
+    tag = six.indexbytes(data, pos)
+    length = six.indexbytes(data, pos + 1)
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7f
+        length = 0
+        for index in range(count):
+            length = (length << 8) | six.indexbytes(data, pos + index)
+        pos += count
+    return tag, pos, pos + length
+
+
+def der_children(data, start, end):
+    """Return list of (tag, start, end) of the DER elements in start:end."""
+    children = []
+    while start < end:
+        child = der_element(data, start)
+        children.append(child)
+        start = child[2]
+    return children
+
+
+def cert_subject(der_cert):
+    """
+    Return the subject of the DER encoded X.509 certificate der_cert as a
+    string of the CN, O, OU and C attributes (ex. 'CN=host, O=company').
+    """
+    certificate = der_element(der_cert, 0)
+    tbs = der_element(der_cert, certificate[1])
+    fields = der_children(der_cert, tbs[1], tbs[2])
+    # skip the optional explicit version
+    if fields[0][0] == 0xa0:
+        fields = fields[1:]
+    # serialNumber, signature, issuer, validity, subject
+    subject = fields[4]
+    attributes = []
+    for rdn in der_children(der_cert, subject[1], subject[2]):
+        for attribute in der_children(der_cert, rdn[1], rdn[2]):
+            oid, value = der_children(der_cert, attribute[1], attribute[2])[:2]
+            name = NAME_ATTRIBUTES.get(der_cert[oid[1]:oid[2]])
+            if name:
+                text = der_cert[value[1]:value[2]].decode('utf-8', 'replace')
+                attributes.append('%s=%s' % (name, text))
+    return ', '.join(attributes)
+
+
+def cert_info(der_cert):
+    """
+    Return tuple of (subject, sha256 digest) of the DER encoded certificate.
+    The subject is None if it cannot be decoded.
+    """
+    if not der_cert:
+        return None, None
+    try:
+        subject = cert_subject(der_cert)
+    except (IndexError, ValueError):
+        subject = None
+    return subject, hashlib.sha256(der_cert).hexdigest()
+
+
+def classify_response(status, headers, body):
+    """
+    Return tuple of (classification, server identity) for the HTTP response
+    with status, headers (dictionary with lower case names) and the start of
+    the body.
+
+    Any 401 reply to the CIM-XML request is treated as a WBEM server because
+    servers such as OpenPegasus use the host name as the authentication realm
+    and send no CIM headers until the client authenticates.
+    """
+    server = headers.get('server')
+    if any(header in headers for header in CIM_HEADERS) or \
+            b'<CIM ' in body:
+        return FP_WBEM, server
+    if status == 401:
+        return FP_WBEM, server or headers.get('www-authenticate')
+    return FP_HTTP, server
+
+
+def fingerprint_host(host, port, scheme=None, timeout=None):
+    """
+    Fingerprint the service at host:port without credentials.
+
+    Parameters:
+
+      host (:term:`string`): ip address or host name.
+
+      port (integer): port of the service.
+
+      scheme (:term:`string`): 'http' or 'https'. If None, http is used for
+        port 5988 and https for any other port with a retry with http if the
+        TLS handshake fails.
+
+      timeout (int or float): Timeout in seconds for the connection and the
+        response. If None, :data:`~smipyping.config.FINGERPRINT_TIMEOUT` is
+        used.
+
+    Returns:
+      :class:`WBEMFingerprint`
+    """
+    timeout = timeout or FINGERPRINT_TIMEOUT
+    if scheme is None:
+        if int(port) == 5988:
+            return fingerprint_host(host, port, 'http', timeout)
+        result = fingerprint_host(host, port, 'https', timeout)
+        if result.detail.startswith(TLS_ERROR):
+            http_result = fingerprint_host(host, port, 'http', timeout)
+            if http_result.classification in (FP_WBEM, FP_HTTP):
+                return http_result
+        return result
+
+    if scheme == 'https':
+        # The certificate is recorded, not verified
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        conn = http_client.HTTPSConnection(host, int(port), timeout=timeout,
+                                           context=context)
+    else:
+        conn = http_client.HTTPConnection(host, int(port), timeout=timeout)
+
+    cert_subject = cert_sha256 = None
+    try:
+        try:
+            conn.connect()
+        except ssl.SSLError as ex:
+            return WBEMFingerprint(FP_OTHER, None, None, None, None, None,
+                                   '%s %s' % (TLS_ERROR, ex), scheme)
+        except socket.error as ex:
+            return WBEMFingerprint(FP_NO_RESPONSE, None, None, None, None,
+                                   None, 'No response: %s' % ex, scheme)
+        if scheme == 'https':
+            cert_subject, cert_sha256 = cert_info(
+                conn.sock.getpeercert(binary_form=True))
+
+        # The service accepted the connection so any failure from here on
+        # shows that it is not an HTTP service.
+        try:
+            conn.request('POST', '/cimom', FINGERPRINT_BODY,
+                         FINGERPRINT_HEADERS)
+            response = conn.getresponse()
+            headers = dict((name.lower(), value)
+                           for name, value in response.getheaders())
+            body = response.read(1024)
+        except socket.timeout as ex:
+            return WBEMFingerprint(FP_OTHER, None, None, None, cert_subject,
+                                   cert_sha256, 'No HTTP response: %s' % ex,
+                                   scheme)
+        except (socket.error, http_client.HTTPException) as ex:
+            return WBEMFingerprint(FP_OTHER, None, None, None, cert_subject,
+                                   cert_sha256, 'Not HTTP: %r' % ex, scheme)
+    finally:
+        conn.close()
+
+    # Python 2 httplib accepts a response without a status line as HTTP/0.9
+    if response.version == 9:
+        return WBEMFingerprint(FP_OTHER, None, None, None, cert_subject,
+                               cert_sha256, 'Not HTTP: no status line', scheme)
+
+    classification, server = classify_response(response.status, headers,
+                                               body)
+    return WBEMFingerprint(classification, response.status, server,
+                           headers.get('cimprotocolversion'), cert_subject,
+                           cert_sha256,
+                           'HTTP %s %s' % (response.status, response.reason),
+                           scheme)
@@ -0,0 +1,287 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compact representation of the IPv4 addresses defined by sweep net
+definitions.
+
+The addresses are kept as ranges of 32 bit integers so that the number of
+addresses is known without expanding the definitions and the dotted string
+form of an address is only built when the address is used.
+"""
+
+from __future__ import print_function, absolute_import
+
+import socket
+import struct
+import itertools
+from array import array
+from bisect import bisect_right
+import six
+
+__all__ = ['IPRanges']
+
+OCTET_MAX = 255
+IPV4_OCTET_COUNT = 4
+
+
+def ip_to_int(ip_address):
+    """Convert the dotted string ip_address to an integer."""
+    return struct.unpack('!I', socket.inet_aton(ip_address))[0]
+
+
+def int_to_ip(value):
+    """Convert the integer value to a dotted string ip address."""
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def parse_octet(octet, net_def):
+    """
+    Return the list of integer values defined by one octet of a net
+    definition. The octet is an integer, a range (min-max) or a list of
+    integers and ranges separated by commas.
+
+    Exceptions:
+        ValueError if the octet definition is invalid.
+    """
+    values = []
+    for item in octet.split(','):
+        if item.isdigit():
+            min_ = max_ = int(item)
+        elif '-' in item:
+            range_ = item.split('-')
+            if len(range_) != 2:
+                raise ValueError('Range %s invalid. Too many components' %
+                                 item)
+            if not range_[0].isdigit() or not range_[1].isdigit():
+                raise ValueError('Range %s invalid in net definition %s' %
+                                 (item, net_def))
+            min_ = int(range_[0])
+            max_ = int(range_[1])
+            if max_ < min_:
+                raise ValueError('Value %s must be ge %s in  def %s' %
+                                 (max_, min_, octet))
+        else:
+            raise ValueError('Invalid octet %s in net definition %s' %
+                             (octet, net_def))
+        if max_ > OCTET_MAX:
+            raise ValueError('Value %s in octet %s invalid. gt %s' %
+                             (max_, octet, OCTET_MAX))
+        values.extend(six.moves.range(min_, max_ + 1))
+    return values
+
+
+class IPRanges(object):
+    """
+    Sequence of IPv4 addresses stored as ranges of integers.
+
+    The ranges are kept in the order of the net definitions so iterating
+    over an IPRanges object returns the addresses in the same order as the
+    octet by octet expansion of the definitions.
+
+    Supports len(), iteration, membership tests of dotted string addresses,
+    indexing and slicing (step 1 only) where indexing returns the dotted
+    string address and slicing returns a new IPRanges object.
+    """
+    def __init__(self, net_defs=None, min_octet_val=1, max_octet_val=254):
+        """
+        Parameters:
+
+          net_defs (:term:`string` or list of :term:`string`): Net
+            definitions to add. See :meth:`add`.
+
+          min_octet_val (integer): minimum value used for the expansion of
+            any octet not defined in a net definition.
+
+          max_octet_val (integer): maximum value used for the expansion of
+            any octet not defined in a net definition.
+
+        Exceptions:
+            ValueError if any net definition is invalid.
+        """
+        self.min_octet_val = min_octet_val
+        self.max_octet_val = max_octet_val
+        # first and last (inclusive) address of each range
+        self._starts = array('L')
+        self._ends = array('L')
+        # number of addresses in all of the ranges before each range
+        self._offsets = array('L')
+        self._count = 0
+
+        if net_defs is None:
+            net_defs = []
+        elif isinstance(net_defs, six.string_types):
+            net_defs = [net_defs]
+        for net_def in net_defs:
+            self.add(net_def)
+
+    def __repr__(self):
+        return 'IPRanges(ranges=%s, count=%s)' % (len(self._starts),
+                                                  self._count)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for start, end in six.moves.zip(self._starts, self._ends):
+            for value in six.moves.range(start, end + 1):
+                yield int_to_ip(value)
+
+    def __contains__(self, ip_address):
+        value = ip_to_int(ip_address)
+        for start, end in six.moves.zip(self._starts, self._ends):
+            if start <= value <= end:
+                return True
+        return False
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            if step != 1:
+                raise ValueError('IPRanges slice step must be 1')
+            return self.slice(start, stop)
+
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError('IPRanges index %s out of range' % index)
+        range_index = bisect_right(self._offsets, index) - 1
+        index -= self._offsets[range_index]
+        return int_to_ip(self._starts[range_index] + index)
+
+    def add(self, net_def):
+        """
+        Add the addresses defined by net_def.
+
+        net_def is either:
+
+          CIDR notation (ex. 10.1.132.0/22). The network and broadcast
+          addresses are not included for prefixes of less than 31 bits.
+
+          A definition of up to four period separated octets where each
+          octet is an integer, a range (min-max) or a list of integers and
+          ranges separated by commas. Missing octets are expanded to the range
+          min_octet_val to max_octet_val.
+
+        Exceptions:
+            ValueError if net_def is invalid.
+        """
+        net_def = net_def.strip()
+        if '/' in net_def:
+            self.add_cidr(net_def)
+            return
+
+        octets = net_def.split('.')
+        if len(octets) > IPV4_OCTET_COUNT:
+            raise ValueError('Too many octets in net definition %s' % net_def)
+        octet_lists = [parse_octet(octet, net_def) for octet in octets]
+        while len(octet_lists) < IPV4_OCTET_COUNT:
+            octet_lists.append(list(six.moves.range(self.min_octet_val,
+                                                    self.max_octet_val + 1)))
+
+        # The last octet is kept as runs of consecutive values so a
+        # /24 is a single range.
+        last_runs = []
+        for value in octet_lists[3]:
+            if last_runs and last_runs[-1][1] + 1 == value:
+                last_runs[-1][1] = value
+            else:
+                last_runs.append([value, value])
+
+        for octet_1, octet_2, octet_3 in itertools.product(*octet_lists[:3]):
+            base = (octet_1 << 24) | (octet_2 << 16) | (octet_3 << 8)
+            for first, last in last_runs:
+                self.add_range(base + first, base + last)
+
+    def add_cidr(self, net_def):
+        """
+        Add the host addresses of the network defined in CIDR notation.
+
+        Exceptions:
+            ValueError if net_def is invalid.
+        """
+        try:
+            address, prefix = net_def.split('/')
+            if len(address.split('.')) != IPV4_OCTET_COUNT:
+                raise ValueError('address must have 4 octets')
+            prefix = int(prefix)
+            if prefix < 0 or prefix > 32:
+                raise ValueError('prefix must be 0-32')
+            network = ip_to_int(address)
+        except (ValueError, socket.error) as ex:
+            raise ValueError('Invalid CIDR net definition %s: %s' %
+                             (net_def, ex))
+
+        host_mask = (1 << (32 - prefix)) - 1
+        network &= ~host_mask & 0xFFFFFFFF
+        first = network
+        last = network | host_mask
+        if prefix < 31:
+            first += 1
+            last -= 1
+        self.add_range(first, last)
+
+    def add_range(self, start, end):
+        """
+        Add the addresses from the integer start to end (inclusive). A range
+        that continues the last range is merged into it.
+        """
+        if self._ends and self._ends[-1] + 1 == start:
+            self._ends[-1] = end
+        else:
+            self._starts.append(start)
+            self._ends.append(end)
+            self._offsets.append(self._count)
+        self._count += end - start + 1
+
+    def ranges(self):
+        """
+        Return list of tuples of (first address, last address, count) for
+        each range with the addresses as dotted strings.
+        """
+        return [(int_to_ip(start), int_to_ip(end), end - start + 1)
+                for start, end in six.moves.zip(self._starts, self._ends)]
+
+    def slice(self, start, stop):
+        """
+        Return a new IPRanges object with the addresses from index start up
+        to but not including index stop.
+        """
+        new = IPRanges(min_octet_val=self.min_octet_val,
+                       max_octet_val=self.max_octet_val)
+        if start >= stop:
+            return new
+        range_index = bisect_right(self._offsets, start) - 1
+        while range_index < len(self._starts):
+            offset = self._offsets[range_index]
+            if offset >= stop:
+                break
+            first = self._starts[range_index] + max(0, start - offset)
+            last = min(self._ends[range_index],
+                       self._starts[range_index] + stop - 1 - offset)
+            new.add_range(first, last)
+            range_index += 1
+        return new
+
+    def shard(self, index, count):
+        """
+        Split the addresses into count contiguous shards of nearly equal size
+        and return shard index (0 to count - 1) as a new IPRanges object.
+        """
+        if count < 1 or index < 0 or index >= count:
+            raise ValueError('Invalid shard %s of %s' % (index, count))
+        size, remainder = divmod(self._count, count)
+        start = index * size + min(index, remainder)
+        stop = start + size + (1 if index < remainder else 0)
+        return self.slice(start, stop)
@@ -0,0 +1,248 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Continuous cimping of the targets, each on its own schedule.
+
+The smicli monitor command uses :class:`TargetMonitor` in place of running
+cimping all periodically (ex. from cron). Each target is tested on its own
+interval with random jitter so that the tests, and the writes of their
+results to the pings table, are spread over time rather than executed in
+one burst, and a change of the status of a target is detected within about
+one interval of the target. The targets table, the database connection and
+the pooled WBEM connections (see :mod:`smipyping._connectionpool`) stay
+open between the tests.
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import heapq
+import random
+import threading
+
+from .config import MONITOR_INTERVAL, MONITOR_JITTER, MONITOR_THREADS
+from ._simpleping import SimplePingList
+from ._workpipeline import threaded_pipeline
+from ._logging import get_logger
+
+__all__ = ['MonitorScheduler', 'TargetMonitor']
+
+LOG = get_logger(__name__)
+
+
+class MonitorScheduler(object):
+    """
+    Thread safe schedule of the next test of each target.
+
+    A target is either in the schedule or being tested. :meth:`due_targets`
+    removes each target from the schedule when its time comes and
+    :meth:`reschedule` puts it back when its test completes so that a target
+    whose test takes longer than its interval is never tested twice at the
+    same time.
+    """
+    def __init__(self, target_ids, interval=MONITOR_INTERVAL,
+                 jitter=MONITOR_JITTER, target_intervals=None):
+        """
+        Parameters:
+
+          target_ids (list of integer): TargetIDs of the targets to test.
+
+          interval (int or float): Time in seconds between the tests of each
+            target that is not in target_intervals. If None,
+            :data:`~smipyping.config.MONITOR_INTERVAL`.
+
+          jitter (float): Fraction of the interval (0 to 1) by which each
+            test time is randomly moved. If None,
+            :data:`~smipyping.config.MONITOR_JITTER`.
+
+          target_intervals (dict or list of :term:`string`): Interval keyed
+            by TargetID or list of strings TargetID:interval (ex. '12:60').
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        self.interval = MONITOR_INTERVAL if interval is None else interval
+        self.jitter = MONITOR_JITTER if jitter is None else jitter
+        if isinstance(target_intervals, dict):
+            items = list(target_intervals.items())
+        else:
+            items = []
+            for item in target_intervals or []:
+                target_id, _, value = item.partition(':')
+                try:
+                    items.append((int(target_id), float(value)))
+                except ValueError:
+                    raise ValueError('Target interval %s invalid. Must be '
+                                     'TargetID:seconds' % item)
+        for value in [self.interval] + [item[1] for item in items]:
+            if value <= 0:
+                raise ValueError('Interval %s invalid. Must be gt 0' % value)
+        if not 0 <= self.jitter <= 1:
+            raise ValueError('Jitter %s invalid. Must be between 0 and 1' %
+                             self.jitter)
+        self.target_intervals = dict(items)
+        # heap of (test time, TargetID)
+        self._schedule = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        # Spread the first tests over one interval
+        now = time.time()
+        for target_id in target_ids:
+            heapq.heappush(self._schedule, (
+                now + random.uniform(0, self.interval_of(target_id)),
+                target_id))
+
+    def __repr__(self):
+        return 'MonitorScheduler(interval=%s, jitter=%s, targets=%s)' % \
+            (self.interval, self.jitter, len(self._schedule))
+
+    def __len__(self):
+        return len(self._schedule)
+
+    def interval_of(self, target_id):
+        """Return the test interval in seconds of the target."""
+        return self.target_intervals.get(target_id, self.interval)
+
+    def next_time(self, target_id, start):
+        """
+        Return the time of the next test of the target whose last test
+        started at start.
+        """
+        return start + self.interval_of(target_id) * \
+            (1 + random.uniform(-self.jitter, self.jitter))
+
+    def reschedule(self, target_id, start):
+        """Schedule the next test of the target whose test has completed."""
+        with self._cond:
+            heapq.heappush(self._schedule,
+                           (self.next_time(target_id, start), target_id))
+            self._cond.notify()
+
+    def stop(self):
+        """Make due_targets return."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def due_targets(self):
+        """
+        Generator that yields the TargetID of each target when its test is
+        due until :meth:`stop` is called.
+        """
+        while True:
+            with self._cond:
+                target_id = None
+                while not self._stopped:
+                    now = time.time()
+                    if self._schedule and self._schedule[0][0] <= now:
+                        target_id = heapq.heappop(self._schedule)[1]
+                        break
+                    self._cond.wait(self._schedule[0][0] - now
+                                    if self._schedule else None)
+                if target_id is None:
+                    return
+            yield target_id
+
+
+class TargetMonitor(object):
+    """
+    Continuous cimping of the targets of a targets table, each on the
+    schedule of a :class:`MonitorScheduler`.
+    """
+    def __init__(self, targets_tbl, target_ids=None, interval=None,
+                 jitter=None, target_intervals=None, timeout=None,
+                 include_disabled=False, ping_mode=None, probe_strategy=None,
+                 num_threads=None):
+        """
+        Parameters:
+
+          targets_tbl: The targets table of the targets.
+
+          target_ids (list of integer): TargetIDs of the targets to test. If
+            None, the enabled targets or, with include_disabled, all of the
+            targets.
+
+          interval, jitter, target_intervals: See
+            :class:`MonitorScheduler`.
+
+          timeout, include_disabled, ping_mode, probe_strategy: See
+            :class:`~smipyping.SimplePingList`.
+
+          num_threads (integer): Maximum number of tests in progress. If
+            None, :data:`~smipyping.config.MONITOR_THREADS`.
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        self.ping_list = SimplePingList(targets_tbl, target_ids=target_ids,
+                                        timeout=timeout,
+                                        include_disabled=include_disabled,
+                                        ping_mode=ping_mode,
+                                        probe_strategy=probe_strategy)
+        self.scheduler = MonitorScheduler(self.ping_list.target_ids,
+                                          interval=interval, jitter=jitter,
+                                          target_intervals=target_intervals)
+        self.num_threads = num_threads or MONITOR_THREADS
+
+    def __repr__(self):
+        return 'TargetMonitor(targets=%s, scheduler=%r, num_threads=%s)' % \
+            (len(self.ping_list.target_ids), self.scheduler,
+             self.num_threads)
+
+    def test_target(self, target_id):
+        """
+        Execute the cimping test of the target. Returns tuple of (start
+        time, TestResult). An unexpected exception is reported as a
+        PyWBEMError result rather than ending the monitor.
+        """
+        start = time.time()
+        try:
+            return start, self.ping_list.ping_target(target_id)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOG.exception('Test of target %s failed', target_id)
+            return start, self.ping_list.make_test_result(
+                'PyWBEMError', ex, time.time() - start)
+
+    def stop(self):
+        """
+        Stop starting tests. :meth:`run` returns when the tests in progress
+        complete.
+        """
+        self.scheduler.stop()
+
+    def run(self, duration=None):
+        """
+        Test the targets on their schedules until :meth:`stop` is called or
+        for duration seconds if duration is not None.
+
+        Returns:
+          Generator that yields a tuple (target_id, TestResult) as each test
+          completes.
+        """
+        timer = None
+        if duration is not None:
+            timer = threading.Timer(duration, self.stop)
+            timer.daemon = True
+            timer.start()
+        try:
+            for target_id, (start, test_result) in threaded_pipeline(
+                    self.scheduler.due_targets(), self.test_target,
+                    self.num_threads, queue_depth=self.num_threads):
+                self.scheduler.reschedule(target_id, start)
+                yield target_id, test_result
+        finally:
+            self.stop()
+            if timer is not None:
+                timer.cancel()
@@ -14,16 +14,420 @@
 # limitations under the License.
 """
 Functions to support pinging a system either by uri or hostname
+
+Pings are sent from the process with an unprivileged ICMP datagram socket
+where the kernel allows them (on Linux, the group of the process must be in
+net.ipv4.ping_group_range). Otherwise the system ping command is executed in
+a subprocess.
+
+For servers that block ICMP, the tcp ping mode tests the reachability of a
+host with a TCP connect to its WBEM server port instead (see
+:func:`tcp_ping`). The mode is set for all targets or for individual
+targets with :func:`configure_ping_mode`.
+
+The results of the pings are saved in the reachability cache of the process
+(see :func:`~smipyping.get_reachability_cache`) and reused until they
+expire.
 """
 from __future__ import absolute_import
 
 import os
+import errno
+import random
+import select
+import socket
+import struct
+import time
 import platform
 import subprocess
 import urlparse
-from .config import PING_TIMEOUT
+import six
+from .config import PING_TIMEOUT, MAX_THREADS, DEFAULT_PING_MODE
+from ._logging import get_logger
+from ._ratelimit import get_probe_throttle
+from ._reachabilitycache import get_reachability_cache
+from ._scanport_tcp import check_port_tcp
+from ._workpipeline import threaded_pipeline
+
+__all__ = ['ping_host', 'ping_hosts', 'ping_uri', 'icmp_ping', 'tcp_ping',
+           'url_ping_address', 'configure_ping_mode', 'get_ping_mode',
+           'PING_MODES']
+
+LOG = get_logger(__name__)
+
+#: Ways of testing the reachability of a server. icmp sends an ICMP echo
+#: request to the host and tcp connects to the WBEM server port.
+PING_MODES = ['icmp', 'tcp']
+
+# WBEM server port for each url scheme when the url does not include a port
+WBEM_DEFAULT_PORTS = {'http': 5988, 'https': 5989}
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Number of random bytes in the payload of the echo requests
+ECHO_PAYLOAD_SIZE = 16
+
+# Receive buffer size requested for the socket of ping_hosts so that replies
+# are not dropped while the requests are sent
+PING_HOSTS_RCVBUF = 1024 * 1024
+
+# Socket creation errors that show that unprivileged ICMP sockets are not
+# allowed or not supported
+ICMP_SOCKET_DENIED_ERRNOS = (errno.EACCES, errno.EPERM,
+                             errno.EPROTONOSUPPORT, errno.ESOCKTNOSUPPORT,
+                             errno.EAFNOSUPPORT)
+
+# None until the first ping tries to open an unprivileged ICMP socket. Then
+# True if the kernel allows them for this process and False if not.
+_ICMP_SOCKET_ALLOWED = None
+
+# Ping mode of the targets that have no mode in _TARGET_PING_MODES
+_PING_MODE = DEFAULT_PING_MODE
+
+# Ping mode of individual targets keyed by TargetID
+_TARGET_PING_MODES = {}
 
-__all__ = ['ping_host', 'ping_uri']
+
+def icmp_checksum(data):
+    """Return the internet checksum (RFC 1071) of the bytes data."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%sH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def open_icmp_socket():
+    """
+    Return an unprivileged ICMP datagram socket or None if the kernel does
+    not allow them for this process.
+    """
+    global _ICMP_SOCKET_ALLOWED  # pylint: disable=global-statement
+    if _ICMP_SOCKET_ALLOWED is False:
+        return None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
+                             socket.IPPROTO_ICMP)
+    except socket.error as er:
+        if er.errno not in ICMP_SOCKET_DENIED_ERRNOS:
+            raise
+        _ICMP_SOCKET_ALLOWED = False
+        return None
+    _ICMP_SOCKET_ALLOWED = True
+    return sock
+
+
+def echo_request(sequence, payload):
+    """Return ICMP echo request packet with sequence and payload."""
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, 0, sequence)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, 0,
+                       sequence) + payload
+
+
+def parse_echo_reply(data):
+    """
+    Return tuple of (sequence, payload) of the ICMP echo reply data received
+    from an ICMP datagram socket or None if data is not an echo reply.
+    """
+    # Some systems (ex. macOS) include the IP header
+    if data and six.indexbytes(data, 0) >> 4 == 4:
+        data = data[(six.indexbytes(data, 0) & 0x0f) * 4:]
+    if len(data) < 8:
+        return None
+    reply_type, _, _, _, sequence = struct.unpack('!BBHHH', data[:8])
+    if reply_type != ICMP_ECHO_REPLY:
+        return None
+    return sequence, data[8:]
+
+
+def icmp_ping(hostname, timeout=None):
+    """
+    Ping hostname with an ICMP echo request sent from this process.
+
+    Parameters:
+
+      hostname: Host name or ip address of the host to ping.
+
+      timeout: Time in seconds to wait for the reply. If None,
+        :data:`~smipyping.config.PING_TIMEOUT` is used.
+
+    Returns:
+        True if the host replied, False if not and None if unprivileged ICMP
+        sockets are not allowed so the ping could not be sent.
+    """
+    ping_timeout = timeout if timeout else PING_TIMEOUT
+    sock = open_icmp_socket()
+    if sock is None:
+        return None
+    try:
+        try:
+            ip_address = socket.gethostbyname(hostname)
+        except socket.error:
+            return False
+
+        # The kernel replaces the identifier with its own value for the
+        # socket so replies are matched by sequence and payload.
+        sequence = random.randint(0, 0xffff)
+        payload = os.urandom(ECHO_PAYLOAD_SIZE)
+        try:
+            sock.sendto(echo_request(sequence, payload), (ip_address, 0))
+        except socket.error:
+            return False
+
+        deadline = time.time() + ping_timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or \
+                    not select.select([sock], [], [], remaining)[0]:
+                return False
+            try:
+                data, address = sock.recvfrom(1024)
+            except socket.error:
+                return False
+            if address[0] == ip_address and \
+                    parse_echo_reply(data) == (sequence, payload):
+                return True
+    finally:
+        sock.close()
+
+
+def ping_hosts(hosts, timeout=None, throttle=None, use_cache=True):
+    """
+    Ping all of the hosts in hosts within a single timeout window.
+
+    The echo requests for all of the hosts are sent from one ICMP socket and
+    the replies are collected until timeout seconds after the last request
+    was sent. Each request is matched to its reply by the address of the
+    host and the sequence number. The sends are limited by the rate of the
+    probe throttle.
+
+    If unprivileged ICMP sockets are not allowed, each host is pinged with
+    :func:`ping_host` from MAX_THREADS threads.
+
+    Parameters:
+
+      hosts: iterable of host names or ip addresses.
+
+      timeout: Time in seconds to wait for the replies. If None,
+        :data:`~smipyping.config.PING_TIMEOUT` is used.
+
+      throttle (:class:`~smipyping.ProbeThrottle`): Throttle that limits the
+        rate of the echo requests. If None, the throttle returned by
+        :func:`~smipyping.get_probe_throttle` is used.
+
+      use_cache (:class:`py:bool`): If True, the hosts with a result in the
+        reachability cache are not pinged and the results of the pings are
+        saved in the cache.
+
+    Returns:
+        Dictionary with each host as key and tuple of (reachable, rtt) as
+        value where rtt is the round trip time in seconds of the reply or
+        None if the host did not reply.
+    """
+    ping_timeout = timeout if timeout else PING_TIMEOUT
+    hosts = list(hosts)
+    results = {}
+    if use_cache:
+        cache = get_reachability_cache()
+        for host in hosts:
+            cached = cache.get(('icmp', host))
+            if cached is not None:
+                results[host] = cached
+        hosts = [host for host in hosts if host not in results]
+        if hosts:
+            for host, result in six.iteritems(
+                    _ping_hosts(hosts, ping_timeout, throttle)):
+                cache.put(('icmp', host), *result)
+                results[host] = result
+        return results
+    return _ping_hosts(hosts, ping_timeout, throttle)
+
+
+def _ping_hosts(hosts, ping_timeout, throttle):
+    """
+    Ping the list hosts without the reachability cache. See
+    :func:`ping_hosts`.
+    """
+    results = dict((host, (False, None)) for host in hosts)
+    throttle = throttle or get_probe_throttle()
+    sock = open_icmp_socket()
+    if sock is None:
+        def timed_ping(host):
+            """Return tuple of (reachable, rtt) for host."""
+            throttle.wait_rate()
+            start = time.time()
+            if ping_host(host, ping_timeout, use_cache=False):
+                return True, time.time() - start
+            return False, None
+
+        for host, result in threaded_pipeline(hosts, timed_ping,
+                                              MAX_THREADS):
+            results[host] = result
+        return results
+
+    # Echo requests waiting for a reply keyed by (ip, sequence) with value
+    # (list of hosts with the ip, send time)
+    pending = {}
+    payload = os.urandom(ECHO_PAYLOAD_SIZE)
+
+    def receive(wait_time):
+        """Receive the replies that arrive within wait_time seconds."""
+        while pending and select.select([sock], [], [], wait_time)[0]:
+            try:
+                data, address = sock.recvfrom(1024)
+            except socket.error:
+                return
+            wait_time = 0
+            reply = parse_echo_reply(data)
+            if reply is None or reply[1] != payload:
+                continue
+            entry = pending.pop((address[0], reply[0]), None)
+            if entry is not None:
+                rtt = time.time() - entry[1]
+                for host in entry[0]:
+                    results[host] = (True, rtt)
+
+    try:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            PING_HOSTS_RCVBUF)
+        except socket.error:
+            pass
+        # hosts with the same ip address share one echo request
+        host_ips = {}
+        for host in hosts:
+            try:
+                host_ips.setdefault(socket.gethostbyname(host),
+                                    []).append(host)
+            except socket.error:
+                pass
+
+        sequence = random.randint(0, 0xffff)
+        for ip_address, ip_hosts in six.iteritems(host_ips):
+            sequence = (sequence + 1) & 0xffff
+            throttle.wait_rate()
+            try:
+                sock.sendto(echo_request(sequence, payload), (ip_address, 0))
+            except socket.error:
+                continue
+            pending[(ip_address, sequence)] = (ip_hosts, time.time())
+            # Do not let the replies fill the socket receive buffer during
+            # long sends
+            receive(0)
+
+        deadline = time.time() + ping_timeout
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            receive(remaining)
+    finally:
+        sock.close()
+    return results
+
+
+def tcp_ping(hostname, port, timeout=None, use_cache=True):
+    """
+    Test the reachability of hostname with a TCP connect to port.
+
+    The host is reachable if the connect is accepted or refused since either
+    reply shows that the host is up.
+
+    Parameters:
+
+      hostname: Host name or ip address of the host to ping.
+
+      port (integer): TCP port, normally the port of the WBEM server.
+
+      timeout: Time in seconds allowed for the connect. If None,
+        :data:`~smipyping.config.PING_TIMEOUT` is used.
+
+      use_cache (:class:`py:bool`): If True, return the result saved in the
+        reachability cache if there is one and save the result of the ping
+        in the cache.
+
+    Returns:
+        Tuple of (reachable, latency) where latency is the time in seconds
+        for the connect or None if the host is not reachable.
+    """
+    cache = get_reachability_cache()
+    key = ('tcp', hostname, port)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    ping_timeout = timeout if timeout else PING_TIMEOUT
+    reachable, latency = False, None
+    try:
+        ip_address = socket.gethostbyname(hostname)
+    except socket.error:
+        ip_address = None
+
+    if ip_address:
+        start_time = time.time()
+        connected, result, _ = check_port_tcp(ip_address, port, False, LOG,
+                                              timeout=ping_timeout)
+        if connected or result == errno.ECONNREFUSED:
+            reachable, latency = True, time.time() - start_time
+    if use_cache:
+        cache.put(key, reachable, latency)
+    return reachable, latency
+
+
+def url_ping_address(url):
+    """
+    Return tuple of (host, port) of the WBEM server defined by url. The port
+    is the default WBEM port of the url scheme if the url has no port.
+    """
+    parsed_url = urlparse.urlparse(url)
+    host = parsed_url.netloc.split(':')[0]
+    port = parsed_url.port or \
+        WBEM_DEFAULT_PORTS.get(parsed_url.scheme, WBEM_DEFAULT_PORTS['https'])
+    return host, port
+
+
+def configure_ping_mode(mode=None, tcp_targets=None, icmp_targets=None):
+    """
+    Set the ping modes used by cimping and explore in this process.
+
+    Parameters:
+
+      mode (:term:`string`): Ping mode of all targets that are not in
+        tcp_targets or icmp_targets. One of :data:`PING_MODES`. If None,
+        :data:`~smipyping.config.DEFAULT_PING_MODE`.
+
+      tcp_targets (iterable of integer): TargetIDs of targets pinged with a
+        TCP connect to their WBEM server port.
+
+      icmp_targets (iterable of integer): TargetIDs of targets pinged with
+        an ICMP echo request.
+
+    Exceptions:
+        ValueError if mode is invalid.
+    """
+    global _PING_MODE  # pylint: disable=global-statement
+    mode = mode or DEFAULT_PING_MODE
+    if mode not in PING_MODES:
+        raise ValueError('Ping mode %s invalid. Must be one of %s' %
+                         (mode, ', '.join(PING_MODES)))
+    _PING_MODE = mode
+    _TARGET_PING_MODES.clear()
+    for target_id in tcp_targets or []:
+        _TARGET_PING_MODES[target_id] = 'tcp'
+    for target_id in icmp_targets or []:
+        _TARGET_PING_MODES[target_id] = 'icmp'
+
+
+def get_ping_mode(target_id=None):
+    """
+    Return the ping mode configured for the target with target_id or for
+    all targets if target_id is None.
+    """
+    return _TARGET_PING_MODES.get(target_id, _PING_MODE)
 
 
 def ping_uri(uri, timeout=None):
@@ -44,11 +448,11 @@ def ping_uri(uri, timeout=None):
     return result
 
 
-def ping_host(hostname, timeout=None):
+def ping_host(hostname, timeout=None, use_cache=True):
     """ Simple ping of a defined hostname.
-    Calls system ping in a subprocess.
-    This works in user mode whereas ICMP pings in Python only work in
-    admin mode.
+    Sends the ping from this process with :func:`icmp_ping` if unprivileged
+    ICMP sockets are allowed. Otherwise calls system ping in a subprocess.
+    Both work in user mode whereas raw ICMP sockets only work in admin mode.
 
     Parameters:
 
@@ -56,32 +460,50 @@ def ping_host(hostname, timeout=None):
         Address of the host to ping
 
       timeout:
-        True if ping succeeds.
+        Time in seconds to wait for the reply.
+
+      use_cache:
+        If True, return the result saved in the reachability cache if there
+        is one and save the result of the ping in the cache.
 
     Returns:
 
         Returns True if Ping succeeded
     """
-    ping_timeout = timeout if timeout else PING_TIMEOUT
-    if platform.system() == "Windows":
-        command = "ping " + hostname + " -q -n 1 -w " + str(ping_timeout * 1000)
-    else:
-        command = "ping -i 2 -W " + str(ping_timeout) + " -c 1 " + hostname
+    cache = get_reachability_cache()
+    key = ('icmp', hostname)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached[0]
 
-    need_sh = False if platform.system().lower() == "windows" else True
+    result = _ping_host(hostname, timeout if timeout else PING_TIMEOUT)
+    if use_cache:
+        cache.put(key, result)
+    return result
 
-    # execute the ping command and discard text response
-    FNULL = open(os.devnull, 'w')
-    return subprocess.call(
-        command, shell=need_sh, stdout=FNULL, stderr=subprocess.STDOUT) == 0
+
+def _ping_host(hostname, ping_timeout):
+    """
+    Ping hostname from this process or with the system ping command and
+    return True if the ping succeeded.
+    """
+    result = icmp_ping(hostname, ping_timeout)
+    if result is not None:
+        return result
+
+    if platform.system() == "Windows":
+        command = ['ping', hostname, '-n', '1', '-w',
+                   str(ping_timeout * 1000)]
+    else:
+        command = ['ping', '-i', '2', '-W', str(ping_timeout), '-c', '1',
+                   hostname]
 
     # execute the ping command and discard text response
-    # TODO we have two pieces of code. Drop one of them.
-    # TODO Should we log the exception
-    # try:
-    #    subprocess.check_call(shlex.split(command), shell=need_sh)
-    #    return True
-
-    # except subprocess.CalledProcessError as e:
-    #    print('ping exception %s' % e)
-    #    return False
+    with open(os.devnull, 'w') as devnull:
+        try:
+            return subprocess.call(command, stdout=devnull,
+                                   stderr=subprocess.STDOUT) == 0
+        except OSError:
+            # ping command not found
+            return False
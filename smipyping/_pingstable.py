@@ -34,15 +34,24 @@ from ._common import compute_startend_dates
 __all__ = ['PingsTable']
 
 
+# Columns with the time in seconds of each phase of the test in the order of
+# the fields of PhaseTimings. NULL for a phase that was not measured.
+TIMING_COLUMNS = ['DNSTime', 'PingTime', 'ConnectTime', 'TLSTime',
+                  'ResponseTime', 'ParseTime', 'OperationTime', 'ServerTime']
+
+
 class PingsTable(DBTableBase):
     """
     `PingID` int(11) unsigned NOT NULL AUTO_INCREMENT,
     `TargetID` int(11) unsigned NOT NULL,
     `Timestamp` datetime NOT NULL,
     `Status` varchar(255) NOT NULL,
+    `DNSTime` float DEFAULT NULL, and the other TIMING_COLUMNS
+    `Attempts` int(11) unsigned NOT NULL DEFAULT 1,
     """
     key_field = 'PingID'
-    fields = [key_field, 'targetID', 'Timestamp', 'Status']
+    fields = [key_field, 'targetID', 'Timestamp', 'Status'] + \
+        TIMING_COLUMNS + ['Attempts']
     table_name = 'Pings'
 
     @classmethod
@@ -558,16 +567,18 @@ class MySQLPingsTable(SQLPingsTable, MySQLDBMixin):
     def append(self, target_id, status, timestamp):
         """
         Write a new record to the database containing the target_id,
-        scan status and a timestamp
+        scan status, a timestamp, the time of each phase of the test and the
+        number of test operations executed
 
         Parameters:
           target_id :term:`integer`
             The database target_id of the wbem_server for which the
             status is being reported.
 
-          status (:term:`string`):
-            String containing the status of the last test of the wbem
-            server.
+          status (:class:`~smipyping.TestResult`):
+            The result of the last test of the wbem server. The phases of
+            its timings are written to the TIMING_COLUMNS and its attempts
+            to Attempts.
 
           timestamp (TODO)
             The time stamp for the scan.  NOTE: This may not be exactly the
@@ -580,10 +591,12 @@ class MySQLPingsTable(SQLPingsTable, MySQLDBMixin):
             status_str = '%s' % (status.type)
         else:
             status_str = '%s %s' % (status.type, status.exception)
-        sql = ("INSERT INTO Pings "
-               "(TargetID, Timestamp, Status) "
-               "VALUES (%s, %s, %s)")
-        data = (target_id, timestamp, status_str)
+        columns = ['TargetID', 'Timestamp', 'Status'] + TIMING_COLUMNS + \
+            ['Attempts']
+        sql = ("INSERT INTO Pings (%s) VALUES (%s)" %
+               (', '.join(columns), ', '.join(['%s'] * len(columns))))
+        data = (target_id, timestamp, status_str) + \
+            tuple(status.timings) + (status.attempts,)
 
         try:
             cursor.execute(sql, data)
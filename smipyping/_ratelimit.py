@@ -0,0 +1,246 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Rate limit and per-subnet concurrency limit for the probes and connections
+to servers executed by server sweeps, cimping and explore.
+
+A :class:`ProbeThrottle` combines a global token bucket rate limit with a
+limit on the number of probes in progress to any one subnet.  One throttle
+is shared by all of the probes of the process (see
+:func:`configure_probe_throttle` and :func:`get_probe_throttle`) so that the
+limits apply to the total of the probes regardless of which threads or
+scan engines execute them.
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import threading
+from contextlib import contextmanager
+
+__all__ = ['ProbeThrottle', 'configure_probe_throttle', 'get_probe_throttle']
+
+# Time in seconds that an event loop waits before trying again to start a
+# probe to a subnet that has no free slot
+SUBNET_RETRY_INTERVAL = 0.05
+
+
+class ProbeThrottle(object):
+    """
+    Token bucket rate limiter with per-subnet concurrency caps.  This is
+    thread safe.
+
+    Each probe takes one token from the bucket, which is refilled at rate
+    tokens per second up to burst tokens, and one of the subnet_concurrency
+    slots of the subnet of its ip address until it completes.
+    """
+    def __init__(self, rate=None, burst=None, subnet_concurrency=None,
+                 subnet_prefix_len=24):
+        """
+        Parameters:
+
+          rate (int or float): Maximum probes started per second. If None or
+            0, the rate is not limited.
+
+          burst (integer): Maximum number of probes that may be started at
+            once after an idle period. If None, one second of probes
+            (rate) with a minimum of 1.
+
+          subnet_concurrency (integer): Maximum number of probes in
+            progress to the addresses of one subnet. If None or 0, not
+            limited.
+
+          subnet_prefix_len (integer): Number of leading bits of the ip
+            address that define a subnet. Must be 8, 16, 24 or 32.
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        if rate is not None and rate < 0:
+            raise ValueError('Rate limit %s invalid. Must be positive' % rate)
+        if subnet_prefix_len not in (8, 16, 24, 32):
+            raise ValueError('subnet_prefix_len %s invalid. Must be 8, 16, 24 '
+                             'or 32' % subnet_prefix_len)
+        self.rate = rate or None
+        self.burst = burst or (max(1, int(rate)) if rate else None)
+        self.subnet_concurrency = subnet_concurrency or None
+        self.subnet_prefix_len = subnet_prefix_len
+        self._octet_count = subnet_prefix_len // 8
+        self._tokens = float(self.burst or 0)
+        self._last_fill = time.time()
+        # count of probes in progress for each subnet with probes in progress
+        self._subnet_counts = {}
+        self._lock = threading.Lock()
+        self._subnet_released = threading.Condition(self._lock)
+
+    def __repr__(self):
+        return 'ProbeThrottle(rate=%s, burst=%s, subnet_concurrency=%s, ' \
+               'subnet_prefix_len=%s)' % (self.rate, self.burst,
+                                          self.subnet_concurrency,
+                                          self.subnet_prefix_len)
+
+    @property
+    def unlimited(self):
+        """True if neither the rate nor the subnet concurrency is limited."""
+        return self.rate is None and self.subnet_concurrency is None
+
+    def config(self, workers=1):
+        """
+        Return dictionary of the constructor parameters for the throttle of
+        one of workers processes that share the limits of this throttle.
+        The rate and burst are divided between the processes. The subnet
+        concurrency is not, since each process probes different addresses.
+        """
+        return {'rate': float(self.rate) / workers if self.rate else None,
+                'burst': max(1, self.burst // workers) if self.burst else None,
+                'subnet_concurrency': self.subnet_concurrency,
+                'subnet_prefix_len': self.subnet_prefix_len}
+
+    def subnet(self, ip_address):
+        """Return the subnet key for the dotted string ip_address."""
+        return ip_address.rsplit('.', 4 - self._octet_count)[0] \
+            if self._octet_count < 4 else ip_address
+
+    def _fill(self, now):
+        """Add the tokens for the time since the last fill. Lock held."""
+        self._tokens = min(float(self.burst),
+                           self._tokens + (now - self._last_fill) * self.rate)
+        self._last_fill = now
+
+    def rate_delay(self):
+        """
+        Take a token if one is available and return 0. Otherwise return the
+        time in seconds until a token will be available without taking one.
+        For event loops that cannot block.
+        """
+        if self.rate is None:
+            return 0
+        with self._lock:
+            self._fill(time.time())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def wait_rate(self):
+        """Block until a token is available and take it."""
+        delay = self.rate_delay()
+        while delay:
+            time.sleep(delay)
+            delay = self.rate_delay()
+
+    def try_acquire_subnet(self, ip_address):
+        """
+        Take a slot of the subnet of ip_address and return True if one is
+        free. Otherwise return False. For event loops that cannot block.
+        """
+        if self.subnet_concurrency is None:
+            return True
+        subnet = self.subnet(ip_address)
+        with self._lock:
+            count = self._subnet_counts.get(subnet, 0)
+            if count >= self.subnet_concurrency:
+                return False
+            self._subnet_counts[subnet] = count + 1
+            return True
+
+    def acquire_subnet(self, ip_address):
+        """
+        Block until a slot of the subnet of ip_address is free and take it.
+        """
+        if self.subnet_concurrency is None:
+            return
+        subnet = self.subnet(ip_address)
+        with self._lock:
+            while self._subnet_counts.get(subnet, 0) >= \
+                    self.subnet_concurrency:
+                # timeout so that the wait can be interrupted by Ctrl-C
+                self._subnet_released.wait(0.5)
+            self._subnet_counts[subnet] = \
+                self._subnet_counts.get(subnet, 0) + 1
+
+    def release_subnet(self, ip_address):
+        """Release the slot of the subnet of ip_address."""
+        if self.subnet_concurrency is None:
+            return
+        subnet = self.subnet(ip_address)
+        with self._lock:
+            count = self._subnet_counts.get(subnet, 0) - 1
+            if count > 0:
+                self._subnet_counts[subnet] = count
+            else:
+                self._subnet_counts.pop(subnet, None)
+            self._subnet_released.notify_all()
+
+    def try_probe(self, ip_address):
+        """
+        Start a probe of ip_address without blocking, for event loops.
+
+        Returns 0 if a slot of the subnet and a token were taken. The slot
+        must be released with release_subnet when the probe completes.
+        Otherwise, nothing is taken and the time in seconds to wait before
+        trying again is returned.
+        """
+        if self.unlimited:
+            return 0
+        if not self.try_acquire_subnet(ip_address):
+            return SUBNET_RETRY_INTERVAL
+        delay = self.rate_delay()
+        if delay:
+            self.release_subnet(ip_address)
+        return delay
+
+    @contextmanager
+    def probe(self, ip_address):
+        """
+        Context manager for one blocking probe of ip_address. Waits for a
+        free slot of the subnet and for a token and releases the slot when
+        the probe completes.
+        """
+        if self.unlimited:
+            yield
+            return
+        self.acquire_subnet(ip_address)
+        try:
+            self.wait_rate()
+            yield
+        finally:
+            self.release_subnet(ip_address)
+
+
+# The ProbeThrottle shared by all of the probes of this process
+_PROBE_THROTTLE = ProbeThrottle()
+
+
+def configure_probe_throttle(rate=None, burst=None, subnet_concurrency=None,
+                             subnet_prefix_len=24):
+    """
+    Set the limits of the ProbeThrottle shared by the server sweeps, cimping
+    and explore in this process. See :class:`ProbeThrottle` for the
+    parameters. Returns the new throttle.
+    """
+    global _PROBE_THROTTLE  # pylint: disable=global-statement
+    _PROBE_THROTTLE = ProbeThrottle(rate=rate, burst=burst,
+                                    subnet_concurrency=subnet_concurrency,
+                                    subnet_prefix_len=subnet_prefix_len)
+    return _PROBE_THROTTLE
+
+
+def get_probe_throttle():
+    """
+    Return the ProbeThrottle shared by the server sweeps, cimping and
+    explore in this process. By default, nothing is limited.
+    """
+    return _PROBE_THROTTLE
@@ -0,0 +1,150 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cache of the results of the pings of hosts.
+
+The ping functions of :mod:`smipyping._ping` save their results in one
+:class:`ReachabilityCache` shared by the process (see
+:func:`configure_reachability_cache` and :func:`get_reachability_cache`) so
+that the cimping, explore and provider commands executed one after the
+other (ex. in the smicli repl) do not ping a host again while its last
+result is still fresh.  Failed pings are cached for a separate, normally
+shorter, time.
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import threading
+
+from .config import REACHABILITY_CACHE_TTL, REACHABILITY_CACHE_NEGATIVE_TTL
+
+__all__ = ['ReachabilityCache', 'configure_reachability_cache',
+           'get_reachability_cache']
+
+
+class ReachabilityCache(object):
+    """
+    Thread safe cache of ping results with a time to live.
+
+    The keys are tuples that define the ping (ex. ('icmp', host) or
+    ('tcp', host, port)) and the values are tuples of (reachable, latency).
+    """
+    def __init__(self, ttl=REACHABILITY_CACHE_TTL,
+                 negative_ttl=REACHABILITY_CACHE_NEGATIVE_TTL):
+        """
+        Parameters:
+
+          ttl (int or float): Time in seconds that the result of a
+            successful ping is kept. If None or 0, nothing is cached.
+
+          negative_ttl (int or float): Time in seconds that the result of
+            a failed ping is kept. If None or 0, failed pings are not cached.
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        if ttl is not None and ttl < 0:
+            raise ValueError('ttl %s invalid. Must be positive' % ttl)
+        if negative_ttl is not None and negative_ttl < 0:
+            raise ValueError('negative_ttl %s invalid. Must be positive' %
+                             negative_ttl)
+        self.ttl = ttl or 0
+        self.negative_ttl = (negative_ttl or 0) if self.ttl else 0
+        # (reachable, latency, expiry time) keyed by ping key
+        self._entries = {}
+        self._next_purge = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ReachabilityCache(ttl=%s, negative_ttl=%s, entries=%s)' % \
+            (self.ttl, self.negative_ttl, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        """True if any ping results are cached."""
+        return bool(self.ttl)
+
+    def get(self, key):
+        """
+        Return tuple of (reachable, latency) saved for key or None if there
+        is no result for key or it has expired.
+        """
+        if not self.ttl:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[key]
+                return None
+            return entry[0], entry[1]
+
+    def put(self, key, reachable, latency=None):
+        """Save the result of the ping defined by key."""
+        ttl = self.ttl if reachable else self.negative_ttl
+        if not ttl:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (reachable, latency, now + ttl)
+            if now >= self._next_purge:
+                self._purge(now)
+                self._next_purge = now + self.ttl
+
+    def _purge(self, now):
+        """Remove the expired entries. Lock held."""
+        for key, entry in list(self._entries.items()):
+            if entry[2] <= now:
+                del self._entries[key]
+
+    def invalidate(self, host):
+        """Remove the results of all of the pings of host."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[1] == host:
+                    del self._entries[key]
+
+    def clear(self):
+        """Remove all of the results."""
+        with self._lock:
+            self._entries.clear()
+
+
+# The ReachabilityCache shared by all of the pings of this process
+_REACHABILITY_CACHE = ReachabilityCache()
+
+
+def configure_reachability_cache(ttl=REACHABILITY_CACHE_TTL,
+                                 negative_ttl=REACHABILITY_CACHE_NEGATIVE_TTL):
+    """
+    Replace the ReachabilityCache shared by the pings of this process with
+    an empty cache with the defined times to live. See
+    :class:`ReachabilityCache` for the parameters. Returns the new cache.
+    """
+    global _REACHABILITY_CACHE  # pylint: disable=global-statement
+    _REACHABILITY_CACHE = ReachabilityCache(ttl=ttl, negative_ttl=negative_ttl)
+    return _REACHABILITY_CACHE
+
+
+def get_reachability_cache():
+    """
+    Return the ReachabilityCache shared by the pings of this process.
+    """
+    return _REACHABILITY_CACHE
@@ -0,0 +1,106 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Retry policy of the cimping tests.
+
+A single TimeoutError or ConnectionError of a test is often a transient
+condition of the network or of the server rather than an outage. With a
+:class:`RetryPolicy`, SimplePing repeats a test that failed that way after an
+exponential backoff and, optionally, sends a second hedged request when the
+operation takes longer than a latency threshold, so that the stored status
+is more accurate without raising the timeout of all of the tests. The policy
+of the process is set with :func:`configure_retry_policy`.
+"""
+
+from __future__ import print_function, absolute_import
+
+from .config import CIMPING_RETRIES, CIMPING_RETRY_BACKOFF, \
+    CIMPING_HEDGE_DELAY
+
+__all__ = ['RetryPolicy', 'configure_retry_policy', 'get_retry_policy']
+
+#: Result types of the tests that are repeated.
+RETRY_RESULTS = ['TimeoutError', 'ConnectionError']
+
+
+class RetryPolicy(object):
+    """
+    Number of repeats, backoff and hedge delay of the cimping tests.
+    """
+    def __init__(self, retries=CIMPING_RETRIES, backoff=CIMPING_RETRY_BACKOFF,
+                 hedge_delay=CIMPING_HEDGE_DELAY):
+        """
+        Parameters:
+
+          retries (integer): Number of times a failed test is repeated. If
+            None or 0, tests are not repeated.
+
+          backoff (int or float): Time in seconds before the first repeat.
+            The time doubles for each further repeat. If None, 0.
+
+          hedge_delay (int or float): Time in seconds after which a second
+            request is sent if the operation has not completed. If None or 0,
+            no hedged requests are sent.
+
+        Exceptions:
+            ValueError if any parameter is invalid.
+        """
+        if retries is not None and retries < 0:
+            raise ValueError('retries %s invalid. Must be positive' % retries)
+        if backoff is not None and backoff < 0:
+            raise ValueError('backoff %s invalid. Must be positive' % backoff)
+        if hedge_delay is not None and hedge_delay < 0:
+            raise ValueError('hedge_delay %s invalid. Must be positive' %
+                             hedge_delay)
+        self.retries = retries or 0
+        self.backoff = backoff or 0
+        self.hedge_delay = hedge_delay or None
+
+    def __repr__(self):
+        return 'RetryPolicy(retries=%s, backoff=%s, hedge_delay=%s)' % \
+            (self.retries, self.backoff, self.hedge_delay)
+
+    @staticmethod
+    def retryable(result):
+        """Return True if a test with the result type should be repeated."""
+        return result in RETRY_RESULTS
+
+    def backoff_delay(self, retry):
+        """Return the time in seconds to wait before repeat number retry."""
+        return self.backoff * 2 ** (retry - 1)
+
+
+# The RetryPolicy of the cimping tests of this process
+_RETRY_POLICY = RetryPolicy()
+
+
+def configure_retry_policy(retries=CIMPING_RETRIES,
+                           backoff=CIMPING_RETRY_BACKOFF,
+                           hedge_delay=CIMPING_HEDGE_DELAY):
+    """
+    Replace the RetryPolicy of the cimping tests of this process. See
+    :class:`RetryPolicy` for the parameters. Returns the new policy.
+    """
+    global _RETRY_POLICY  # pylint: disable=global-statement
+    _RETRY_POLICY = RetryPolicy(retries=retries, backoff=backoff,
+                                hedge_delay=hedge_delay)
+    return _RETRY_POLICY
+
+
+def get_retry_policy():
+    """
+    Return the RetryPolicy of the cimping tests of this process.
+    """
+    return _RETRY_POLICY
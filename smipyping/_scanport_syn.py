@@ -19,17 +19,36 @@ if it is open
 This is the code that is privilege aware because it uses raw tcp and that
 requires admin privileges in the Python interpreter.
 """
-# required to turn off  IP v6 warning message from scapy in import
+from __future__ import print_function, absolute_import
+
 import sys
 import logging
+import heapq
+import itertools
+import random
+import select
+import threading
+import time
+from six.moves import queue
 from scapy.all import IP, TCP, sr1, sr, conf, RandShort
+
+from .config import MAX_SYN_PENDING
+
+# turn off IP v6 warning messages from scapy
 SCPY_LOG = logging.getLogger("scapy.runtime")
 SCPY_LOG.setLevel(49)
 
-__all__ = ['check_port_syn']
+__all__ = ['check_port_syn', 'SynBatchScanner']
+
+# Disable verbose in scapy sr(), sr1() methods
+conf.verb = 0  # noqa: F405
+
+SYNACK = 0x12
+RSTACK = 0x14
+RST = 0x04
 
 
-def check_port_syn(dst_ip, dst_port, verbose, logger):
+def check_port_syn(dst_ip, dst_port, verbose, logger, timeout=2):
     """
     Check a single address with SYN for open port.
 
@@ -39,17 +58,15 @@ def check_port_syn(dst_ip, dst_port, verbose, logger):
     Using SYN allows us to test for open port but in Python requires that
     the code execute in admin mode.
 
+    timeout is the time in seconds to wait for the reply.
+
     Returns tuple (Boolean result, None, None)
     """
-    SYNACK = 0x12
-    RSTACK = 0x14
-
-    conf.verb = 0  # Disable verbose in sr(), sr1() methods  #noqa: F405
     result = False
     src_port = RandShort()
     response = None
     p = IP(dst=dst_ip) / TCP(sport=src_port, dport=dst_port, flags='S')
-    resp = sr1(p, timeout=2)  # Sending packet
+    resp = sr1(p, timeout=timeout)  # Sending packet
     if str(type(resp)) == "<type 'NoneType'>":
         response = 'none'
         logger.debug('PORTSCAN_SYN: %s Closed. response="none"', dst_ip)
@@ -80,3 +97,251 @@ def check_port_syn(dst_ip, dst_port, verbose, logger):
     sys.stdout.flush()
     # Returns tuple of
     return (result, None, response)
+
+
+class SynBatchScanner(object):
+    """
+    Scan a sequence of addresses for open ports with SYN packets sent in
+    batches.
+
+    A single sender sends SYN packets for up to max_pending addresses
+    without waiting for the replies and a single receive thread matches the
+    SYN-ACK and RST replies to the probes sent using the key
+    (ip address, port, source port).  Addresses for which there is no reply
+    within timeout seconds are reported as closed.
+
+    Like check_port_syn, this requires privileged mode.
+    """
+    # Number of source ports used for probes. The source port is part of the
+    # key that matches replies to probes.
+    SRC_PORT_COUNT = 8192
+
+    def __init__(self, verbose, logger, timeout=2, max_pending=None,
+                 adaptive_timeout=None, throttle=None):
+        """
+        Parameters:
+
+          verbose (bool): If True, display the result of each probe.
+
+          logger: Logger for debug output.
+
+          timeout (int or float): Time in seconds to wait for the reply to
+            each probe.
+
+          max_pending (int): Maximum number of probes sent without a reply.
+            If None, :data:`~smipyping.config.MAX_SYN_PENDING` is used.
+
+          adaptive_timeout (:class:`~smipyping.AdaptiveTimeout`): If not
+            None, the timeout for each probe is taken from it instead of
+            timeout and the round trip time of each reply is added to it.
+
+          throttle (:class:`~smipyping.ProbeThrottle`): If not None, each
+            probe is sent only when the rate limit and the concurrency limit
+            of the subnet of its address allow.
+        """
+        self.verbose = verbose
+        self.logger = logger
+        self.timeout = timeout
+        self.max_pending = max_pending or MAX_SYN_PENDING
+        self.adaptive_timeout = adaptive_timeout
+        self.throttle = throttle if throttle is not None and \
+            not throttle.unlimited else None
+        self.src_port_base = random.randint(32768,
+                                            65535 - self.SRC_PORT_COUNT)
+        self._src_port_index = 0
+        self._replies = queue.Queue()
+        self._stop_receiver = threading.Event()
+
+    def probe_timeout(self, ip_address):
+        """Return the time in seconds to wait for the reply from ip_address."""
+        if self.adaptive_timeout is not None:
+            return self.adaptive_timeout.timeout(ip_address)
+        return self.timeout
+
+    def release_probe(self, ip_address):
+        """Release the throttle slot of the completed probe of ip_address."""
+        if self.throttle is not None:
+            self.throttle.release_subnet(ip_address)
+
+    def next_src_port(self):
+        """Return the source port for the next probe."""
+        self._src_port_index = (self._src_port_index + 1) % \
+            self.SRC_PORT_COUNT
+        return self.src_port_base + self._src_port_index
+
+    def receive_replies(self, listen_sock):
+        """
+        Receive thread function. Puts the key and TCP flags of each reply
+        to a probe into the replies queue until the scan is stopped.
+        """
+        min_port = self.src_port_base
+        max_port = self.src_port_base + self.SRC_PORT_COUNT
+        while not self._stop_receiver.is_set():
+            if not select.select([listen_sock], [], [], 0.1)[0]:
+                continue
+            pkt = listen_sock.recv()
+            if pkt is None or not pkt.haslayer(TCP) or not pkt.haslayer(IP):
+                continue
+            tcp = pkt.getlayer(TCP)
+            if tcp.dport < min_port or tcp.dport >= max_port:
+                continue
+            self._replies.put(((pkt.getlayer(IP).src, tcp.sport, tcp.dport),
+                               int(tcp.flags)))
+
+    def open_listen_socket(self, iface):
+        """
+        Open the socket that receives the replies on the interface iface,
+        filtered to the source ports of the probes if the filter can be
+        compiled on this system.
+        """
+        bpf = 'tcp and dst portrange %s-%s' % \
+            (self.src_port_base, self.src_port_base + self.SRC_PORT_COUNT - 1)
+        try:
+            return conf.L2listen(iface=iface, filter=bpf)
+        except Exception as ex:  # pylint: disable=broad-except
+            self.logger.debug('PORTSCAN_SYN: filter %r failed %s. Using '
+                              'unfiltered listen', bpf, ex)
+            return conf.L2listen(iface=iface)
+
+    def scan(self, test_addresses):
+        """
+        Scan the addresses in test_addresses.
+
+        Parameters:
+
+          test_addresses: iterable of tuples of (ip address, port) to test.
+            This is consumed only as fast as the probes are sent so it may be
+            a generator.
+
+        Returns:
+          Generator that yields a tuple (test_address, Boolean result,
+          response) as the reply to each probe is received or the probe times
+          out.  Results are in completion order.
+        """
+        addr_iter = iter(test_addresses)
+        try:
+            first_address = next(addr_iter)
+        except StopIteration:
+            return
+        addr_iter = itertools.chain([first_address], addr_iter)
+        # Probes without reply keyed by (ip, port, src_port) with value
+        # (test_address, send time, sequence number)
+        pending = {}
+        # heap of (deadline, sequence number, key) for the probes in pending.
+        # Entries for probes that were answered are discarded when they reach
+        # the top.
+        deadlines = []
+        sequence = itertools.count()
+        retry_address = None
+        exhausted = False
+
+        # Replies are received on the interface of the route to the first
+        # address. Sweeps are expected to be on a single interface.
+        iface = conf.route.route(first_address[0])[0]
+        listen_sock = self.open_listen_socket(iface)
+        send_sock = conf.L3socket()
+        self._stop_receiver.clear()
+        receiver = threading.Thread(target=self.receive_replies,
+                                    args=(listen_sock,))
+        receiver.daemon = True
+        receiver.start()
+
+        try:
+            while True:
+                # Time until the throttle allows the next probe to be sent
+                throttle_wait = 0
+                # Send probes until the pending limit is reached
+                while not exhausted and len(pending) < self.max_pending:
+                    if retry_address is not None:
+                        test_address, retry_address = retry_address, None
+                    else:
+                        try:
+                            test_address = next(addr_iter)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    if self.throttle is not None:
+                        throttle_wait = self.throttle.try_probe(
+                            test_address[0])
+                        if throttle_wait:
+                            retry_address = test_address
+                            break
+                    dst_port = int(test_address[1])
+                    src_port = self.next_src_port()
+                    syn = TCP(sport=src_port, dport=dst_port, flags='S')
+                    send_sock.send(IP(dst=test_address[0]) / syn)
+                    key = (test_address[0], dst_port, src_port)
+                    send_time = time.time()
+                    seq = next(sequence)
+                    pending[key] = (test_address, send_time, seq)
+                    heapq.heappush(deadlines,
+                                   (send_time + self.probe_timeout(
+                                       test_address[0]), seq, key))
+
+                if not pending:
+                    if retry_address is None:
+                        return
+                    time.sleep(throttle_wait)
+                    continue
+
+                completed = []
+                wait_time = max(0, deadlines[0][0] - time.time())
+                if throttle_wait:
+                    wait_time = min(wait_time, throttle_wait)
+                try:
+                    reply = self._replies.get(timeout=wait_time)
+                    while True:
+                        key, flags = reply
+                        entry = pending.pop(key, None)
+                        # Ignore duplicate and unrelated replies.
+                        # The kernel resets the connections that reply with
+                        # SYN-ACK since it did not open them.
+                        if entry is not None:
+                            self.release_probe(key[0])
+                            if self.adaptive_timeout is not None:
+                                self.adaptive_timeout.add_sample(
+                                    key[0], time.time() - entry[1])
+                            if flags & SYNACK == SYNACK:
+                                completed.append((entry[0], True,
+                                                  'Open, SYNACK'))
+                            elif flags & RST:
+                                completed.append((entry[0], False,
+                                                  'Closed, RSTACK'))
+                            else:
+                                completed.append((entry[0], False,
+                                                  'Flags 0x%x' % flags))
+                        reply = self._replies.get_nowait()
+                except queue.Empty:
+                    pass
+
+                # Expire the probes that have exceeded the timeout
+                now = time.time()
+                while deadlines:
+                    deadline, seq, key = deadlines[0]
+                    entry = pending.get(key)
+                    stale = entry is None or entry[2] != seq
+                    if not stale and deadline > now:
+                        break
+                    heapq.heappop(deadlines)
+                    if stale:
+                        continue
+                    del pending[key]
+                    self.release_probe(key[0])
+                    completed.append((entry[0], False, 'none'))
+
+                for test_address, result, response in completed:
+                    self.logger.debug('PORTSCAN_SYN: %s:%s %s',
+                                      test_address[0], test_address[1],
+                                      response)
+                    if self.verbose:
+                        print('%s:%s %s' % (test_address[0], test_address[1],
+                                            response))
+                    yield (test_address, result, response)
+
+        finally:
+            for key in pending:
+                self.release_probe(key[0])
+            self._stop_receiver.set()
+            receiver.join()
+            send_sock.close()
+            listen_sock.close()
@@ -16,24 +16,46 @@
 Scan port function using the TCP connect.  This scans a single port to determine
 if it is open
 
+This module also includes a scanner that executes non-blocking TCP connects
+for a sequence of ports from a single thread.
+
 This code does NOT require privileged mode
 """
+from __future__ import print_function, absolute_import
+
 import os
+import errno
+import heapq
+import itertools
+import select
 import socket
+import time
+import six
+
+from .config import MAX_ASYNC_SOCKETS
 
-__all__ = ['check_port_tcp']
+__all__ = ['check_port_tcp', 'scan_ports_tcp_async']
 
+# connect_ex return codes that indicate that a non-blocking connect is
+# in progress
+CONNECT_PENDING_ERRNOS = (errno.EINPROGRESS, errno.EWOULDBLOCK,
+                          errno.EALREADY)
 
-def check_port_tcp(dst_ip, dst_port, verbose, logger):
+# socket creation errors that indicate the process is out of file descriptors
+NO_FD_ERRNOS = (errno.EMFILE, errno.ENFILE)
+
+
+def check_port_tcp(dst_ip, dst_port, verbose, logger, timeout=2):
     """
     Test for open port using TCP connect.
 
     Returns tuple (Boolean Result, result errno or exception)
     This method does not require privileged mode to execute.
 
+    timeout is the time in seconds allowed for the connect.
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(2)
+    sock.settimeout(timeout)
     try:
         result = sock.connect_ex((dst_ip, dst_port))
         if result:
@@ -55,3 +77,263 @@ def check_port_tcp(dst_ip, dst_port, verbose, logger):
         logger.debug('PORTSCAN_TCP: Connect exception %s', ex)
         print('TCP Connect exception %s' % ex)
         return (False, 1000, ex)
+
+
+class SocketPoller(object):
+    """
+    Wait for write-ready (i.e. connect complete) events, or read-ready events
+    for the sockets registered as readable, on a set of sockets using the
+    best mechanism available on this platform (epoll, poll or select).
+    """
+    def __init__(self):
+        # readable flag keyed by file descriptor
+        self._fds = {}
+        # poll() timeout is integer milliseconds, epoll() is seconds
+        self._timeout_ms = False
+        if hasattr(select, 'epoll'):
+            self._poller = select.epoll()
+            self._mask = select.EPOLLOUT | select.EPOLLERR | select.EPOLLHUP
+            self._read_mask = select.EPOLLIN | select.EPOLLERR | \
+                select.EPOLLHUP
+        elif hasattr(select, 'poll'):
+            self._poller = select.poll()
+            self._timeout_ms = True
+            self._mask = select.POLLOUT | select.POLLERR | select.POLLHUP
+            self._read_mask = select.POLLIN | select.POLLERR | select.POLLHUP
+        else:
+            self._poller = None
+
+    def register(self, fd, readable=False):
+        """
+        Add the socket file descriptor fd to the poll set. If readable is
+        True, wait for fd to be ready to read instead of ready to write.
+        """
+        self._fds[fd] = readable
+        if self._poller is not None:
+            self._poller.register(fd,
+                                  self._read_mask if readable else self._mask)
+
+    def modify(self, fd, readable):
+        """Change the event that is waited for on the registered fd."""
+        if self._fds[fd] == readable:
+            return
+        self._fds[fd] = readable
+        if self._poller is not None:
+            self._poller.modify(fd,
+                                self._read_mask if readable else self._mask)
+
+    def unregister(self, fd):
+        """Remove the socket file descriptor fd from the poll set."""
+        if self._fds.pop(fd, None) is not None and self._poller is not None:
+            self._poller.unregister(fd)
+
+    def poll(self, timeout):
+        """
+        Wait up to timeout seconds for events and return the list of file
+        descriptors that are ready.
+        """
+        if self._poller is None:
+            if not self._fds:
+                time.sleep(timeout)
+                return []
+            rlist = [fd for fd, readable in six.iteritems(self._fds)
+                     if readable]
+            wlist = [fd for fd, readable in six.iteritems(self._fds)
+                     if not readable]
+            # Failed connects are reported in the exception list on Windows
+            ready = select.select(rlist, wlist, list(self._fds), timeout)
+            return list(set(ready[0]) | set(ready[1]) | set(ready[2]))
+        if self._timeout_ms:
+            events = self._poller.poll(int(timeout * 1000))
+        else:
+            events = self._poller.poll(timeout)
+        return [event[0] for event in events]
+
+    def close(self):
+        """Release the poller."""
+        if hasattr(self._poller, 'close'):
+            self._poller.close()
+        self._fds.clear()
+
+
+def scan_ports_tcp_async(test_addresses, verbose, logger, timeout=2,
+                         max_sockets=None, adaptive_timeout=None,
+                         throttle=None):
+    """
+    Test a sequence of addresses for open ports using non-blocking TCP
+    connects executed from a single thread.
+
+    Up to max_sockets connects are in progress at any time.  As each connect
+    completes or times out, the next address is taken from test_addresses so
+    that test_addresses may be a generator and is consumed only as fast as
+    the scan proceeds.
+
+    Parameters:
+
+      test_addresses: iterable of tuples of (ip address, port) to test.
+
+      verbose (bool): If True, display failed connects.
+
+      logger: Logger for debug output.
+
+      timeout (int or float): Time in seconds allowed for each connect.
+
+      max_sockets (int): Maximum number of connects in progress. If None,
+        :data:`~smipyping.config.MAX_ASYNC_SOCKETS` is used.
+
+      adaptive_timeout (:class:`~smipyping.AdaptiveTimeout`): If not None,
+        the timeout for each connect is taken from it instead of timeout
+        and the round trip time of each connect that gets a reply (open or
+        refused) is added to it.
+
+      throttle (:class:`~smipyping.ProbeThrottle`): If not None, each
+        connect is started only when the rate limit and the concurrency
+        limit of the subnet of its address allow.
+
+    Returns:
+      Generator that yields a tuple (test_address, Boolean result, errno)
+      as each connect completes.  Results are in completion order, not in the
+      order of test_addresses.
+
+    This method does not require privileged mode to execute.
+    """
+    max_sockets = max_sockets or MAX_ASYNC_SOCKETS
+    if throttle is not None and throttle.unlimited:
+        throttle = None
+    addr_iter = iter(test_addresses)
+    poller = SocketPoller()
+    # Connects in progress keyed by file descriptor with value
+    # (socket, test_address, start time, sequence number)
+    pending = {}
+    # heap of (deadline, sequence number, fd) for the connects in pending.
+    # Entries for connects that already completed are discarded when they
+    # reach the top since the fd may have been reused.
+    deadlines = []
+    sequence = itertools.count()
+    retry_address = None
+    exhausted = False
+
+    try:
+        while True:
+            completed = []
+            # Time until the throttle allows the next connect to start
+            throttle_wait = 0
+
+            # Start connects until the in-progress limit is reached
+            while not exhausted and len(pending) < max_sockets:
+                if retry_address is not None:
+                    test_address, retry_address = retry_address, None
+                else:
+                    try:
+                        test_address = next(addr_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                if throttle is not None:
+                    throttle_wait = throttle.try_probe(test_address[0])
+                    if throttle_wait:
+                        retry_address = test_address
+                        break
+                try:
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                except socket.error as er:
+                    if throttle is not None:
+                        throttle.release_subnet(test_address[0])
+                    if er.errno not in NO_FD_ERRNOS or not pending:
+                        raise
+                    # Hold this address until some sockets have been closed
+                    max_sockets = len(pending)
+                    retry_address = test_address
+                    logger.debug('PORTSCAN_TCP: Out of file descriptors. '
+                                 'max_sockets reduced to %s', max_sockets)
+                    break
+
+                sock.setblocking(0)
+                try:
+                    result = sock.connect_ex(test_address)
+                except socket.error as ex:
+                    logger.debug('PORTSCAN_TCP: Connect exception %s', ex)
+                    result = 1000
+                if result in CONNECT_PENDING_ERRNOS:
+                    start = time.time()
+                    seq = next(sequence)
+                    if adaptive_timeout is not None:
+                        deadline = start + \
+                            adaptive_timeout.timeout(test_address[0])
+                    else:
+                        deadline = start + timeout
+                    pending[sock.fileno()] = (sock, test_address, start, seq)
+                    heapq.heappush(deadlines, (deadline, seq, sock.fileno()))
+                    poller.register(sock.fileno())
+                else:
+                    sock.close()
+                    if throttle is not None:
+                        throttle.release_subnet(test_address[0])
+                    completed.append((test_address, result))
+
+            if pending:
+                # Do not wait if there are results ready to return
+                if completed:
+                    wait_time = 0
+                else:
+                    wait_time = max(0, deadlines[0][0] - time.time())
+                if throttle_wait:
+                    wait_time = min(wait_time, throttle_wait)
+
+                for fd in poller.poll(wait_time):
+                    sock, test_address, start, _ = pending.pop(fd)
+                    poller.unregister(fd)
+                    result = sock.getsockopt(socket.SOL_SOCKET,
+                                             socket.SO_ERROR)
+                    sock.close()
+                    if throttle is not None:
+                        throttle.release_subnet(test_address[0])
+                    if adaptive_timeout is not None and \
+                            result in (0, errno.ECONNREFUSED):
+                        adaptive_timeout.add_sample(test_address[0],
+                                                    time.time() - start)
+                    completed.append((test_address, result))
+
+                # Expire the connects that have exceeded the timeout
+                now = time.time()
+                while deadlines:
+                    deadline, seq, fd = deadlines[0]
+                    entry = pending.get(fd)
+                    stale = entry is None or entry[3] != seq
+                    if not stale and deadline > now:
+                        break
+                    heapq.heappop(deadlines)
+                    if stale:
+                        continue
+                    del pending[fd]
+                    poller.unregister(fd)
+                    entry[0].close()
+                    if throttle is not None:
+                        throttle.release_subnet(entry[1][0])
+                    completed.append((entry[1], errno.ETIMEDOUT))
+
+            elif throttle_wait and not completed:
+                time.sleep(throttle_wait)
+
+            for test_address, result in completed:
+                if result:
+                    error_txt = os.strerror(result) if result != 1000 \
+                        else 'exception'
+                    logger.debug('PORTSCAN_TCP: ERROR_RTN: ip=%s, port=%s, '
+                                 'erno=%s:%s', test_address[0],
+                                 test_address[1], result, error_txt)
+                    if verbose:
+                        print('ERROR RTN: ip=%s, port=%s, erno=%s:%s' %
+                              (test_address[0], test_address[1], result,
+                               error_txt))
+                yield (test_address, result == 0, result)
+
+            if exhausted and not pending:
+                return
+
+    finally:
+        for entry in six.itervalues(pending):
+            entry[0].close()
+            if throttle is not None:
+                throttle.release_subnet(entry[1][0])
+        poller.close()
@@ -32,25 +32,52 @@ from __future__ import print_function, absolute_import
 import os
 import sys
 import time
-from threading import Thread
-import Queue
-import itertools
+import json
+import signal
+import datetime
+import threading
+import multiprocessing
+import traceback
+from errno import ECONNREFUSED
+from collections import OrderedDict
 import six
+from six.moves import queue
 
-from pywbem import WBEMConnection, Error, AuthError, TimeoutError, \
+from pywbem import Error, AuthError, TimeoutError, \
     CIMError, ConnectionError, CIM_ERR_INVALID_NAMESPACE
 
-from .config import MAX_THREADS
-from ._scanport_syn import check_port_syn
-from ._scanport_tcp import check_port_tcp
+from .config import MAX_THREADS, SWEEP_CHECKPOINT_INTERVAL, \
+    SWEEP_PROBE_TIMEOUT, SWEEP_PREFILTER_BATCH, SWEEP_IDENTIFY_THREADS, \
+    SWEEP_IDENTIFY_DEADLINE, DEFAULT_OPERATION_TIMEOUT
+from ._ping import ping_hosts
+from ._scanport_syn import check_port_syn, SynBatchScanner
+from ._scanport_tcp import check_port_tcp, scan_ports_tcp_async
+from ._adaptivetimeout import AdaptiveTimeout
+from ._ratelimit import ProbeThrottle, get_probe_throttle
+from ._ipranges import IPRanges
+from ._fingerprint import fingerprint_host, FP_WBEM
 from ._logging import get_logger, logged_api_call, SWEEP_LOGGER_NAME
+from ._workpipeline import threaded_pipeline
+from ._connectionpool import get_connection_pool
 
 
-__all__ = ['ServerSweep', 'SCAN_TYPES']
+__all__ = ['ServerSweep', 'SweepState', 'SCAN_TYPES', 'PREFILTER_TYPES']
 
 LOG = get_logger(__name__)
 
-SCAN_TYPES = ['tcp', 'syn', 'all']
+# Maximum number of results and maximum time in seconds that a sweep worker
+# process holds results before sending them to the parent process.
+RESULT_BATCH_SIZE = 256
+RESULT_BATCH_INTERVAL = 0.5
+
+# Minimum timeout in seconds of a credential test of an unknown open host
+# started just before the identify deadline
+MIN_IDENTIFY_TIMEOUT = 0.1
+
+SCAN_TYPES = ['tcp', 'syn', 'all', 'tcp-async', 'syn-batch']
+
+# Liveness prefilters executed before the port probes
+PREFILTER_TYPES = [None, 'tcp', 'icmp']
 
 # TODO Future: use pywbem.servers to automatically handle finding a first
 #              namespace
@@ -61,6 +88,278 @@ INTEROP_NAMESPACES = [
 ]
 
 
+class SweepState(object):
+    """
+    Progress of a server sweep that is saved to a state file so that an
+    interrupted sweep can be resumed.
+
+    The position is the index of the first address for which not all of
+    the probes have completed. All addresses before the position have
+    been completely probed so a resumed sweep starts at the position.
+
+    Probes of addresses after the position may also have completed before
+    the sweep was interrupted. A resumed sweep probes them again but counts
+    a probe of an address at or below completed_index, the highest address
+    index that was completed or skipped, only if it was in progress (in
+    pending) when the state was saved, and reports each open host only once.
+
+    A sweep executed by multiple worker processes saves the position,
+    completed index and pending probes within each shard of the addresses
+    in shard_positions, shard_completed and shard_pending instead.
+    """
+    def __init__(self, filename, sweep_def, position=0, open_hosts=None,
+                 probes_done=0, shard_positions=None, probes_skipped=0,
+                 completed_index=-1, pending=None, shard_completed=None,
+                 shard_pending=None):
+        """
+        Parameters:
+
+          filename (:term:`string`): Name of the state file.
+
+          sweep_def (dict): Definition of the sweep (net_defs, ports,
+            min_octet_val, max_octet_val) that a resumed sweep must match.
+
+          position (integer): Index of the first address to be probed.
+
+          open_hosts (list of tuples): (ip, port) open hosts already found.
+
+          probes_done (integer): Number of probes already completed.
+
+          shard_positions (list of integer): Position within each shard for
+            a sweep executed by multiple worker processes.
+
+          probes_skipped (integer): Number of probes not executed because
+            the liveness prefilter found no host at the address.
+
+          completed_index (integer): Highest index of an address with a
+            completed or skipped probe, or -1.
+
+          pending (list of tuples): (ip, port) of the probes that were in
+            progress when the state was saved.
+
+          shard_completed (list of integer): Completed index within each
+            shard for a sweep executed by multiple worker processes.
+
+          shard_pending (list of list of tuples): Pending probes of each
+            shard for a sweep executed by multiple worker processes.
+        """
+        self.filename = filename
+        self.sweep_def = sweep_def
+        self.start_position = position
+        self.open_hosts = open_hosts or []
+        self.probes_done = probes_done
+        self.shard_positions = shard_positions
+        self.probes_skipped = probes_skipped
+        self.completed_index = completed_index
+        self.shard_completed = shard_completed
+        self.shard_pending = shard_pending
+        # Probes of the addresses up to this index were counted before the
+        # sweep was resumed
+        self._counted_index = completed_index
+        self._pending = set(pending or [])
+        self._open_set = set(self.open_hosts)
+        self._next_index = position
+        # Address index of each probe in progress keyed by (ip, port)
+        self._in_progress = {}
+        # Count of probes in progress for each address index in index order
+        self._address_probes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filename, sweep_def):
+        """
+        Load the sweep state from filename.
+
+        Exceptions:
+            ValueError if the file cannot be read or it was saved for a sweep
+            with a different definition than sweep_def.
+        """
+        try:
+            with open(filename, 'r') as fp:
+                state = json.load(fp)
+        except (IOError, ValueError) as ex:
+            raise ValueError('Cannot load sweep state file %s: %s' %
+                             (filename, ex))
+        if state['sweep'] != json.loads(json.dumps(sweep_def)):
+            raise ValueError('Sweep state file %s is for a different sweep: '
+                             '%s' % (filename, state['sweep']))
+        return cls(filename, sweep_def, position=state['position'],
+                   open_hosts=[tuple(host) for host in state['open_hosts']],
+                   probes_done=state['probes_done'],
+                   shard_positions=state.get('shard_positions'),
+                   probes_skipped=state.get('probes_skipped', 0),
+                   completed_index=state.get('completed_index', -1),
+                   pending=[tuple(probe) for probe in
+                            state.get('pending', [])],
+                   shard_completed=state.get('shard_completed'),
+                   shard_pending=[[tuple(probe) for probe in pending]
+                                  for pending in
+                                  state.get('shard_pending') or []] or None)
+
+    @property
+    def position(self):
+        """
+        Index of the first address for which not all probes are complete.
+        """
+        with self._lock:
+            if self._address_probes:
+                return next(iter(self._address_probes))
+            return self._next_index
+
+    def probe_started(self, address_index, test_addr):
+        """Record that the probe of test_addr has been started."""
+        with self._lock:
+            self._in_progress.setdefault(test_addr, []).append(address_index)
+            self._address_probes[address_index] = \
+                self._address_probes.get(address_index, 0) + 1
+            self._next_index = address_index + 1
+
+    def address_skipped(self, address_index, probe_count):
+        """
+        Record that the probe_count probes of the address at address_index
+        are skipped because there is no live host at the address.
+        """
+        with self._lock:
+            if address_index > self._counted_index:
+                self.probes_skipped += probe_count
+            self.completed_index = max(self.completed_index, address_index)
+            self._next_index = address_index + 1
+
+    def add_result(self, test_addr, result, counted=True):
+        """
+        Record the result of a probe without tracking the position. Used
+        for the results of worker processes that track their own positions.
+        If counted is False the probe is not added to probes_done.
+
+        Returns True if test_addr is an open host that was not found before.
+        """
+        with self._lock:
+            if counted:
+                self.probes_done += 1
+            if not result or test_addr in self._open_set:
+                return False
+            self._open_set.add(test_addr)
+            self.open_hosts.append(test_addr)
+            return True
+
+    def probe_finished(self, test_addr):
+        """
+        Record that the probe of test_addr is complete for the position.
+        Returns False if the probe was already counted before the sweep was
+        resumed.
+        """
+        with self._lock:
+            indexes = self._in_progress[test_addr]
+            address_index = indexes.pop(0)
+            if not indexes:
+                del self._in_progress[test_addr]
+            self._address_probes[address_index] -= 1
+            if not self._address_probes[address_index]:
+                del self._address_probes[address_index]
+            self.completed_index = max(self.completed_index, address_index)
+            counted = address_index > self._counted_index or \
+                test_addr in self._pending
+            self._pending.discard(test_addr)
+            return counted
+
+    def pending_probes(self):
+        """
+        Return list of the (ip, port) of the probes in progress and of the
+        pending probes of the resumed sweep that have not completed.
+        """
+        with self._lock:
+            return list(set(self._in_progress) | self._pending)
+
+    def probe_completed(self, test_addr, result):
+        """
+        Record that the probe of test_addr is complete. Returns True if
+        test_addr is an open host that was not found before.
+        """
+        return self.add_result(test_addr, result,
+                               self.probe_finished(test_addr))
+
+    def save(self):
+        """
+        Write the state to the state file. The file is replaced only when
+        the new state has been completely written.
+        """
+        position = self.position
+        pending = self.pending_probes()
+        shard_pending = None
+        if self.shard_pending is not None:
+            shard_pending = [list(probes) for probes in self.shard_pending]
+        with self._lock:
+            state = {'sweep': self.sweep_def,
+                     'position': position,
+                     'open_hosts': self.open_hosts,
+                     'probes_done': self.probes_done,
+                     'probes_skipped': self.probes_skipped,
+                     'completed_index': self.completed_index,
+                     'pending': pending,
+                     'shard_positions': self.shard_positions,
+                     'shard_completed': self.shard_completed,
+                     'shard_pending': shard_pending,
+                     'saved': datetime.datetime.now().isoformat()}
+        tmp_filename = '%s.tmp' % self.filename
+        with open(tmp_filename, 'w') as fp:
+            json.dump(state, fp)
+        if os.path.exists(self.filename) and sys.platform == 'win32':
+            os.remove(self.filename)
+        os.rename(tmp_filename, self.filename)
+
+    def remove(self):
+        """Remove the state file if it exists."""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+def sweep_shard_process(sweep_args, throttle_config, shard_index, shard_count,
+                        position, completed_index, pending, result_queue):
+    """
+    Worker process function for a sweep executed by multiple processes.
+
+    Builds a ServerSweep from sweep_args with a ProbeThrottle built from
+    throttle_config, scans shard shard_index of
+    shard_count of its addresses starting at position in the shard and puts
+    batches of results to result_queue as tuples of (shard_index, list of
+    (test_address, result, counted), shard status). The shard status is a
+    tuple of (position, probes skipped, completed index, pending probes) in
+    the shard. completed_index and pending are those of a resumed sweep as
+    described for SweepState and counted is False for a probe that was
+    already counted before the sweep was resumed.
+    A batch of None marks the end of the shard and a string batch is the
+    traceback of an exception.
+    """
+    # Ctrl-C is handled by the parent process which terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        sweep = ServerSweep(throttle=ProbeThrottle(**throttle_config),
+                            **sweep_args)
+        shard = sweep.address_ranges().shard(shard_index, shard_count)
+        state = SweepState(None, None, position=position,
+                           completed_index=completed_index, pending=pending)
+
+        def shard_status():
+            """Return the status of the shard to send with a batch."""
+            return (state.position, state.probes_skipped,
+                    state.completed_index, state.pending_probes())
+
+        batch = []
+        send_time = time.time() + RESULT_BATCH_INTERVAL
+        for test_addr, result in sweep.scan_probes(
+                sweep.tracked_test_list(shard, state)):
+            batch.append((test_addr, result,
+                          state.probe_finished(test_addr)))
+            if len(batch) >= RESULT_BATCH_SIZE or time.time() >= send_time:
+                result_queue.put((shard_index, batch, shard_status()))
+                batch = []
+                send_time = time.time() + RESULT_BATCH_INTERVAL
+        result_queue.put((shard_index, batch, shard_status()))
+        result_queue.put((shard_index, None, shard_status()))
+    except Exception:  # pylint: disable=broad-except
+        result_queue.put((shard_index, traceback.format_exc(), None))
+
+
 class ServerSweep(object):
     """
     Class to define the functionality to execute port sweeps of
@@ -68,13 +367,14 @@ class ServerSweep(object):
     """
     def __init__(self, net_defs, ports, targets_tbl=None, no_threads=False,
                  min_octet_val=1, max_octet_val=254, verbose=False,
-                 scan_type='tcp'):
+                 scan_type='tcp', state_file=None, workers=1,
+                 adaptive_timeout=False, prefilter=None, throttle=None):
         """
         Parameters:
-          net_defs: list of subnets. Each subnet is defined as a sweep range
-          where the sweep range for each component of the ip address is an
-          integer (designates a single address), a range (integer:integer),
-          or a list (integer,integer,integer)
+          net_defs: list of subnets. Each subnet is defined in CIDR notation
+          or as a sweep range where the sweep range for each component of the
+          ip address is an integer (designates a single address), a range
+          (integer:integer), or a list (integer,integer,integer)
 
           ports:(list of integer or integer) one or more ports to be included
           in the scan
@@ -98,6 +398,32 @@ class ServerSweep(object):
           default is to use the threaded implementation
 
           verbose: detailed display if True
+
+          state_file (:term:`string`): Name of a file to which the sweep
+            state is saved every SWEEP_CHECKPOINT_INTERVAL seconds and when
+            the sweep is interrupted so that the sweep can be resumed. If
+            None, the state is not saved.
+
+          workers (integer): Number of processes that execute the sweep. If
+            greater than 1, the addresses are split into that many shards
+            and each shard is scanned by a separate process with its own
+            scan engine.
+
+          adaptive_timeout (bool): If True, the timeout of each probe is
+            derived from the round trip times observed for its subnet (see
+            :class:`~smipyping.AdaptiveTimeout`) instead of the fixed
+            SWEEP_PROBE_TIMEOUT.
+
+          prefilter (:term:`string`): If 'tcp' or 'icmp', the addresses are
+            first checked for a live host with a single probe each (a TCP
+            connect to the first port or a ping) and only the live hosts are
+            probed on all of the ports. If None, every address is probed on
+            every port.
+
+          throttle (:class:`~smipyping.ProbeThrottle`): Rate and per-subnet
+            concurrency limits for the probes. If None, the throttle
+            returned by :func:`~smipyping.get_probe_throttle` is used. With
+            multiple workers, the rate is divided between the workers.
         """
         self.net_defs = net_defs
         self.min_octet_val = min_octet_val
@@ -108,9 +434,20 @@ class ServerSweep(object):
         self.verbose = verbose
         self.total_sweep_time = None
         self.total_pings = None
+        self.total_skipped = None
+        # WBEMFingerprint of each unknown open host keyed by (ip, port)
+        self.fingerprints = {}
         self.scan_type = scan_type
+        self.state_file = state_file
+        self.workers = workers
+        self.adaptive_timeout = AdaptiveTimeout() if adaptive_timeout \
+            else None
+        if prefilter not in PREFILTER_TYPES:
+            raise ValueError('Invalid prefilter %s. Must be one of %s' %
+                             (prefilter, PREFILTER_TYPES))
+        self.prefilter = prefilter
+        self.throttle = throttle or get_probe_throttle()
         self.logger = get_logger(SWEEP_LOGGER_NAME)
-        self.kill_threads = False
         self._sweep_time = 0
 
     @property
@@ -122,6 +459,14 @@ class ServerSweep(object):
         """
         return self._sweep_time
 
+    def probe_timeout(self, ip_address):
+        """
+        Return the timeout in seconds for a probe of ip_address.
+        """
+        if self.adaptive_timeout is not None:
+            return self.adaptive_timeout.timeout(ip_address)
+        return SWEEP_PROBE_TIMEOUT
+
     def check_port(self, test_address):
         """
         Runs defined test against a single ip/port defined as a tuple in
@@ -140,27 +485,46 @@ class ServerSweep(object):
         Exceptions:
             ValueError if self.scan_type invalid
         """
+        with self.throttle.probe(test_address[0]):
+            return self._check_port(test_address)
+
+    def _check_port(self, test_address):
+        """
+        Execute check_port for test_address after the throttle allows it.
+        """
         error = None
+        timeout = self.probe_timeout(test_address[0])
+        start_time = time.time()
         try:
             if self.scan_type == 'syn':
                 result, err, str_ = check_port_syn(test_address[0],
                                                    test_address[1],
                                                    self.verbose,
-                                                   self.logger)
+                                                   self.logger,
+                                                   timeout=timeout)
+                rtt = time.time() - start_time
+                replied = str_ in ('Open, SYNACK', 'Closed, RSTACK')
             elif self.scan_type == 'tcp':
                 result, err, str_ = check_port_tcp(test_address[0],
                                                    test_address[1],
                                                    self.verbose,
-                                                   self.logger)
+                                                   self.logger,
+                                                   timeout=timeout)
+                rtt = time.time() - start_time
                 error = str_
+                replied = err in (0, ECONNREFUSED)
             elif self.scan_type == 'all':
+                # The syn check executes concurrently with the tcp check so
+                # the time per address is that of the slower check.
+                wait_syn_check = self.start_syn_check(test_address, timeout)
                 resulttcp, errno, str_ = check_port_tcp(test_address[0],
                                                         test_address[1],
                                                         self.verbose,
-                                                        self.logger)
-                resultsyn, cd, bl = check_port_syn(test_address[0],
-                                                   test_address[1],
-                                                   self.verbose, self.logger)
+                                                        self.logger,
+                                                        timeout=timeout)
+                rtt = time.time() - start_time
+                replied = errno in (0, ECONNREFUSED)
+                resultsyn, cd, bl = wait_syn_check()
                 result = resulttcp
                 if resulttcp != resultsyn:
                     self.logger.debug('scanner result differ. addr=%s, syn=%s,'
@@ -180,113 +544,143 @@ class ServerSweep(object):
             print('KeyboardInterrupt CheckPort')
             raise
 
+        if self.adaptive_timeout is not None and replied:
+            self.adaptive_timeout.add_sample(test_address[0], rtt)
+
         return (result, error)
 
+    def start_syn_check(self, test_address, timeout):
+        """
+        Start check_port_syn for test_address in a separate thread.
+
+        Returns a function that waits for the check to complete and returns
+        its result or raises its exception.
+        """
+        outcome = {}
+
+        def syn_check():
+            """Execute the check and save its result or exception."""
+            try:
+                outcome['result'] = check_port_syn(test_address[0],
+                                                   test_address[1],
+                                                   self.verbose, self.logger,
+                                                   timeout=timeout)
+            except Exception:  # pylint: disable=broad-except
+                outcome['exc_info'] = sys.exc_info()
+
+        thread = threading.Thread(target=syn_check)
+        thread.daemon = True
+        thread.start()
+
+        def wait_syn_check():
+            """Wait for the syn check and return its result."""
+            thread.join()
+            if 'exc_info' in outcome:
+                six.reraise(*outcome['exc_info'])
+            return outcome['result']
+
+        return wait_syn_check
+
     def list_subnets_to_scan(self):
         """
-        show the ip addresses and ports to be scanned as a list and count
+        show the ip address ranges and ports to be scanned and count
         of the totals.  This is primarily a diagnostic tool but helps users
-        determine what all will be scanned.
+        determine what all will be scanned. If verbose, each ip/port
+        combination is also listed. No liveness prefilter is executed
+        so that nothing is sent to the network.
         """
-        test_list = [result for result in self.build_test_list()]
-        print('scan list count=%s:' % len(test_list))
-        index = 0
-        for test_addr in test_list:
-            index += 1
-            print(' %4s %s' % (index, test_addr))
+        ip_ranges = self.address_ranges()
+        print('scan list count=%s: ports=%s' % (self.probe_count, self.ports))
+        for first, last, count in ip_ranges.ranges():
+            print('  %s - %s  count=%s' % (first, last, count))
+        if self.verbose:
+            index = 0
+            for test_ip in ip_ranges:
+                for port_ in self.ports:
+                    index += 1
+                    print(' %4s %s' % (index, (test_ip, port_)))
+
+    def scan_probes(self, test_list=None):
+        """
+        Execute the port check for each ip/port combination in test_list with
+        the scan engine defined by scan_type and no_threads.
+
+        Parameters:
+
+          test_list: iterable of (ip address, port) tuples. If None, the
+            combinations from build_test_list are used.
+
+        Returns:
+          Generator that yields a tuple (test_address, Boolean result) for
+          each ip/port as its check completes.
+        """
+        if test_list is None:
+            test_list = self.build_test_list()
+
+        # The tcp-async and syn-batch scans are not threaded by design
+        if self.scan_type == 'tcp-async':
+            for test_addr, result, _ in scan_ports_tcp_async(
+                    test_list, self.verbose, self.logger,
+                    timeout=SWEEP_PROBE_TIMEOUT,
+                    adaptive_timeout=self.adaptive_timeout,
+                    throttle=self.throttle):
+                yield test_addr, result
+
+        elif self.scan_type == 'syn-batch':
+            scanner = SynBatchScanner(self.verbose, self.logger,
+                                      timeout=SWEEP_PROBE_TIMEOUT,
+                                      adaptive_timeout=self.adaptive_timeout,
+                                      throttle=self.throttle)
+            for test_addr, result, _ in scanner.scan(test_list):
+                yield test_addr, result
+
+        elif self.no_threads:
+            for test_addr in test_list:
+                result, error = self.check_port(test_addr)  # Test one ip:port
+                response_txt = 'Exists' if result else ('None: %s' % error)
+                self.logger.info('SCAN Result ip=%s, result=%s',
+                                 (test_addr,), response_txt)
+                if self.verbose:
+                    print('test address=%s, %s' % ((test_addr,),
+                                                   response_txt))
+                yield test_addr, result
+
+        else:
+            # TODO not passing on error information
+            for test_addr, check_result in threaded_pipeline(
+                    test_list, self.check_port, MAX_THREADS):
+                yield test_addr, check_result[0]
 
     @logged_api_call
     def scan_subnets(self):
         """
-        Nonthreaded scan of IP addresses for open ports.
+        Scan of IP addresses for open ports.
 
-        Scan a subnet and return list of hosts found with port open.
+        Scan a subnet and return list of hosts found with port open using
+        the scan engine defined by scan_type and no_threads.
 
         Subnet can be either a specific subnet or a list of subnets
         Ports can be either single port or list of ports
-        Returns Dictionary of hosts that have defined port open.
+        Returns list of (ip address, port) tuples for the open ports found.
         """
         open_hosts = []
         test_count = 0
-        for test_addr in self.build_test_list():
+        for test_addr, result in self.scan_probes():
             test_count += 1
-            result, error = self.check_port(test_addr)  # Test one ip:port
-            response_txt = 'Exists' if result else ('None: %s' % error)
-            self.logger.info('SCAN Result ip=%s, result=%s',
-                             (test_addr,), response_txt)
-            if self.verbose:
-                print('test address=%s, %s' % ((test_addr,), response_txt))
-
             if result:  # Port exists
                 open_hosts.append(test_addr)  # Append to list
         self.total_pings = test_count
 
         return open_hosts
 
-    def process_queue(self, queue, results):
-        """This is a thread function that processes a queue to do check_port.
-        Each queue entry is a tuple of ip_address(with port) and results
-        list where the results are appended for each succseful scan.
-        """
-        while not queue.empty():
-            if self.kill_threads:
-                return
-            work = queue.get()
-            results = work[1]   # get results list from work
-            check_result, error = self.check_port(work[0])
-            # TODO not passing on error information
-            if check_result is True:
-                # append address info to the results list
-                results.append(work[0])
-            queue.task_done()
-        return
-
-    @logged_api_call
-    def scan_subnets_threaded(self):
-        """
-        Threaded scan of IP Addresses for open ports.
-
-        Scan the IP address defined by the input and return a list of open
-        IP addresses. This function creates multiple processes and executes
-        each call in a process for speed.
-        """
-
-        # set up queue to hold all call info
-        queue = Queue.Queue(maxsize=0)
-        num_threads = MAX_THREADS
-
-        results = []
-        test_count = 0
-        for test_addr in self.build_test_list():
-            test_count += 1
-            queue.put((test_addr, results))
-        self.total_pings = test_count
-
-        # Start worker threads.
-        threads = []
-        for i in range(num_threads):  # pylint: disable=unused-variable
-            t = Thread(target=self.process_queue, args=(queue, results))
-            t.daemon = True    # allows main program to exit.
-            threads.append(t)
-            t.start()
-
-        try:
-            queue.join()
-        except KeyboardInterrupt:
-            print("Ctrl-C received! Sending kill to threads...")
-            self.kill_threads = True
-            for t in threads:
-                t.kill_received = True
-
-        # returns list of ip addresses that were were found
-        return results
-
     @logged_api_call
     def expand_subnet_definition(self, net_def):
         """
         Get a list of IP addresses from the net_definition provided in net_def.
 
-        The syntax for the net definition is as follows:
+        The syntax for the net definition is either CIDR notation (ex.
+        10.1.132.0/22) which expands to the host addresses of that network or
+        the following:
 
         Defines for octets of an IPV4 address where each octet is one of the
         following:
@@ -317,108 +711,161 @@ class ServerSweep(object):
             ValueError if any of the components of the net definition are in
             error.
         """
-        octet_max = 255
+        for ip in IPRanges(net_def, self.min_octet_val, self.max_octet_val):
+            yield ip
 
-        try:
-            octets = net_def.split('.')
-            ipv4_octet_count = 4
-            for index in range(ipv4_octet_count):
-                try:
-                    octets[index]
-                except IndexError:
-                    octets.append('%d-%d' % (self.min_octet_val,
-                                             self.max_octet_val))
-        except Exception as ex:
-            print('Exception subnet %s Exception %s' % (net_def, ex))
-            raise
+    def normalize_inputs(self):
+        """
+        Convert the net_defs and ports attributes to lists.
+        """
+        if isinstance(self.net_defs, tuple):
+            self.net_defs = list(self.net_defs)
+        if not isinstance(self.net_defs, list):
+            self.net_defs = [self.net_defs]
 
-        octet_lists = []
-        try:
-            for octet in octets:
-                if octet.isdigit():
-                    try:
-                        octet = int(octet)
-                    except Exception as ex:
-                        raise ValueError('octet %s not integer' % octet)
-                    octet_lists.append([octet])
-                elif '-' in octet:
-                    range_ = octet.split('-')
-                    min_ = int(range_[0])
-                    max_ = int(range_[1]) + 1    # range is inclusive
-                    if len(range_) != 2:
-                        raise ValueError('Range %s invalid. Too many components'
-                                         % range_)
-                    if min_ < 0:
-                        raise ValueError('Value %s in range %s invalid' %
-                                         (min_,
-                                          range_))
-                    if max_ > octet_max:
-                        raise ValueError('Value %s in range %s invalid. gt %s'
-                                         % (max_, range_, octet_max))
-                    if max_ <= min_:
-                        raise ValueError('Value %s must be gt %s in  def %s' %
-                                         (max_, min_, octet))
-
-                    octect_list = [item for item in six.moves.range(min_, max_)]
-                    octet_lists.append(octect_list)
-                elif ',' in octet:
-                    items = octet.split(',')
-                    octet_lists.append([int(x) for x in items])
-                else:
-                    raise ValueError('Invalid octet %s in net definition %s' %
-                                     (octet, net_def))
-        except ValueError:
-            raise
+        if not isinstance(self.ports, (list, tuple)):
+            self.ports = [self.ports]
 
-        # product_get, a generator that iproduces results of merged lists
-        for ip in itertools.product(*octet_lists):
-            yield '.'.join(map(str, ip))
+    def address_ranges(self):
+        """
+        Return :class:`~smipyping.IPRanges` object with all of the ip
+        addresses defined by the net_defs. This does not expand the
+        addresses.
 
-    def build_test_list(self):
+        Exceptions:
+            ValueError if any of the net definitions is invalid.
+        """
+        self.normalize_inputs()
+        return IPRanges(self.net_defs, self.min_octet_val, self.max_octet_val)
+
+    @property
+    def probe_count(self):
+        """
+        Returns the number of ip/port combinations defined for the sweep
+        without building the list of combinations.
+        """
+        self.normalize_inputs()
+        return len(self.address_ranges()) * len(self.ports)
+
+    def build_test_list(self, ip_ranges=None):
         """
         Create list of IP addresses and ports to scan.
 
         Create dictionary of IP address: port for all ports in the ranges
         defined by the input parameters and return that dictionary
 
+        Parameters:
+
+          ip_ranges (:class:`~smipyping.IPRanges`): The addresses to
+            combine with the ports. If None, the addresses defined by
+            the net_defs attribute are used.
+
         Returns:
           Generator that generates a set of the combination of net defs and
           ports until the combinations are exhausted.
 
           Each call returns a tuple of (IP address, port)
         """
+        self.normalize_inputs()
+        if ip_ranges is None:
+            ip_ranges = self.address_ranges()
+
+        for _, test_ip, live in self.prefiltered_addresses(ip_ranges):
+            if not live:
+                continue
+            # return one tuple of ip address, port for each call
+            for port_ in self.ports:
+                yield test_ip, port_
+
+    def live_addresses(self, addresses):
+        """
+        Return the set of the ip addresses in the list addresses at which
+        a host responds to the liveness prefilter.
 
-        if isinstance(self.net_defs, tuple):
-            self.net_defs = list(self.net_defs)
-        if not isinstance(self.net_defs, list):
-            self.net_defs = [self.net_defs]
+        The tcp prefilter considers a host live if a connect to the first
+        port of the sweep is accepted or refused. The icmp prefilter
+        considers a host live if it responds to ping.
+        """
+        live = set()
+        if self.prefilter == 'tcp':
+            for test_addr, _, result in scan_ports_tcp_async(
+                    [(ip, self.ports[0]) for ip in addresses], False,
+                    self.logger, timeout=SWEEP_PROBE_TIMEOUT,
+                    adaptive_timeout=self.adaptive_timeout,
+                    throttle=self.throttle):
+                if result in (0, ECONNREFUSED):
+                    live.add(test_addr[0])
+        elif self.prefilter == 'icmp':
+            # A sweep must see the current state of every address
+            for ip, result in six.iteritems(
+                    ping_hosts(addresses, throttle=self.throttle,
+                               use_cache=False)):
+                if result[0]:
+                    live.add(ip)
+        else:
+            raise ValueError('Invalid prefilter %s' % self.prefilter)
+        self.logger.debug('Prefilter %s: %s of %s addresses live',
+                          self.prefilter, len(live), len(addresses))
+        return live
 
-        if not isinstance(self.ports, (list, tuple)):
-            self.ports = [self.ports]
+    def prefiltered_addresses(self, ip_ranges, start=0):
+        """
+        Generator of tuples (address index, ip address, live) for the
+        addresses of ip_ranges from index start.
+
+        If prefilter is None, every address is live. Otherwise, the
+        liveness of the addresses is checked in batches of
+        :data:`~smipyping.config.SWEEP_PREFILTER_BATCH` addresses so that
+        the port probes start before the prefilter of the whole sweep is
+        complete.
+        """
+        addresses = ip_ranges[start:]
+        if not self.prefilter:
+            for address_index, ip in enumerate(addresses, start):
+                yield address_index, ip, True
+            return
 
-        for net_def in self.net_defs:
-            for test_ip in self.expand_subnet_definition(net_def):
-                # return one tuple of ip address, port for each call
-                for port_ in self.ports:
-                    yield test_ip, port_
+        for batch_start in six.moves.range(0, len(addresses),
+                                           SWEEP_PREFILTER_BATCH):
+            batch = list(addresses[batch_start:
+                                   batch_start + SWEEP_PREFILTER_BATCH])
+            live = self.live_addresses(batch)
+            for address_index, ip in enumerate(batch, start + batch_start):
+                yield address_index, ip, ip in live
+
+    def host_status(self, open_host):
+        """
+        Return 'known' if open_host (ip address, port) is in the targets
+        table, 'unknown' if it is not, or '' if there is no targets table.
+        """
+        if self.targets_tbl is None:
+            return ''
+        record_list = self.targets_tbl.get_targets_host(open_host)
+        return 'known' if record_list else 'unknown'
+
+    def write_result(self, output, open_host):
+        """
+        Write one open host and its status to the open file output. The
+        output is flushed so that the file can be followed while the sweep
+        executes.
+        """
+        print('%s:%s %s' % (open_host[0], open_host[1],
+                            self.host_status(open_host)), file=output)
+        output.flush()
 
     def write_results(self, open_hosts, output_file='serversweep.txt',
                       unknown_only=True):
         """
-        Write the results to an output file for further processing
+        Write the results to an output file for further processing. If
+        unknown_only is True and there is a targets table, only the open
+        hosts that are not in the targets table are written.
         """
         with open(output_file, 'w+') as f1:
-            # add code to filter
             for open_host in open_hosts:
-                ip_address = '%s:%s' % (open_host[0], open_host[1])
-                status = ''
-                if self.targets_tbl is not None:
-                    record_list = self.targets_tbl.get_targets_host(open_host)
-                    status = 'known' if record_list else 'unknown'
-                if unknown_only and status == 'unknown':
-                    print('%s %s' % (ip_address, status), file=f1)
-                else:
-                    print('%s %s' % (ip_address, status), file=f1)
+                if unknown_only and self.targets_tbl is not None and \
+                        self.host_status(open_host) != 'unknown':
+                    continue
+                self.write_result(f1, open_host)
 
     def prep_open_hosts_report(self, open_hosts):
         """
@@ -429,9 +876,15 @@ class ServerSweep(object):
           * determine if the openhost is in the targets table. If it exists
             add info from the targets_table including CompanyName, etc
 
-          * if it is not in the targets table, determine if it can be accessed
-            with any of the possible principals and credentials and if it
-            will return a CIM Response that is not an error.
+          * if it is not in the targets table, fingerprint it without
+            credentials (see :meth:`fingerprint_hosts`) to determine if it
+            is a WBEM server and its server identity.
+
+          * if the fingerprint shows a WBEM server, determine if it can be
+            accessed with any of the possible principals and credentials and
+            if it will return a CIM Response that is not an error. The
+            unknown hosts are tested concurrently (see
+            :meth:`identify_hosts`).
 
         If userdata is found, include the userdata info including CompanyName,
         Product, etc.
@@ -454,59 +907,172 @@ class ServerSweep(object):
         known = 0
         rows = []
 
-        if open_hosts:
-            # open_hosts.sort(key=lambda ip: map(int, ip.split('.')))
-            # TODO this probably requires ordered dict rather than dictionary to
-            # keep order. We are not outputing in full order. Note that
-            # ip address itself is not good ordering since not all octets are
-            # 3 char
-            cred_target_ids = self.targets_tbl.get_unique_creds()
-            for host_data in open_hosts:
-                ip_address = '%s:%s' % (host_data[0], host_data[1])
-                if self.targets_tbl is not None:
-                    # Test for address already in table.
-                    targets_list = self.targets_tbl.get_targets_host(host_data)
-                    if targets_list:
-                        for targetid in targets_list:
-                            entry = self.targets_tbl.get_target(targetid)
-                            if entry is None:
-                                unknown += 1
-                                rows.append([ip_address, "Not in targets table",
-                                             "", ""])
-                            else:
-                                known += 1
-                                rows.append(
-                                    [ip_address, entry['CompanyName'],
-                                     entry['Product'],
-                                     'SMI_VER %s' % entry['SMIVersion']])
-                    else:
-                        status = self.test_host_params(cred_target_ids,
-                                                       host_data)
+        if not open_hosts:
+            return(rows, known, unknown)
+
+        # no host info requested.
+        if self.targets_tbl is None:
+            return([['%s:%s' % host_data] for host_data in open_hosts],
+                   known, unknown)
+
+        # open_hosts.sort(key=lambda ip: map(int, ip.split('.')))
+        # TODO this probably requires ordered dict rather than dictionary to
+        # keep order. We are not outputing in full order. Note that
+        # ip address itself is not good ordering since not all octets are
+        # 3 char
+        unknown_hosts = [host_data for host_data in open_hosts
+                         if not self.targets_tbl.get_targets_host(host_data)]
+        host_status = {}
+        if unknown_hosts:
+            fingerprints = self.fingerprint_hosts(unknown_hosts)
+            wbem_hosts = [host_data for host_data, fingerprint
+                          in fingerprints.items()
+                          if fingerprint.classification == FP_WBEM]
+            for host_data in unknown_hosts:
+                if host_data not in wbem_hosts:
+                    fingerprint = fingerprints[host_data]
+                    host_status[host_data] = '%s: %s' % (
+                        fingerprint.classification, fingerprint.detail)
+            if wbem_hosts:
+                host_status.update(self.identify_hosts(
+                    self.targets_tbl.get_unique_creds(), wbem_hosts))
+
+        for host_data in open_hosts:
+            ip_address = '%s:%s' % (host_data[0], host_data[1])
+            # Test for address already in table.
+            targets_list = self.targets_tbl.get_targets_host(host_data)
+            if targets_list:
+                for targetid in targets_list:
+                    entry = self.targets_tbl.get_target(targetid)
+                    if entry is None:
                         unknown += 1
-                        rows.append([ip_address, "Unknown", "", status])
-
-                # no host info requested.
-                else:
-                    rows.append([ip_address])
+                        rows.append([ip_address, "Not in targets table",
+                                     "", ""])
+                    else:
+                        known += 1
+                        rows.append(
+                            [ip_address, entry['CompanyName'],
+                             entry['Product'],
+                             'SMI_VER %s' % entry['SMIVersion']])
+            else:
+                unknown += 1
+                fingerprint = self.fingerprints[host_data]
+                server = fingerprint.server or fingerprint.cert_subject
+                rows.append([ip_address, "Unknown", server or "",
+                             host_status[host_data]])
         return(rows, known, unknown)
 
-    def test_host_params(self, cred_target_ids, host_data):
+    def fingerprint_hosts(self, hosts, max_threads=None):
+        """
+        Fingerprint each of the open hosts in hosts concurrently with
+        :func:`~smipyping.fingerprint_host` to determine if it is a WBEM
+        server without credentials and without executing CIM operations.
+
+        Parameters:
+
+          hosts: list of (ip address, port) tuples of the hosts.
+
+          max_threads (integer): Maximum number of hosts fingerprinted at
+            the same time. If None,
+            :data:`~smipyping.config.SWEEP_IDENTIFY_THREADS` is used.
+
+        Returns:
+          Dictionary of host: :class:`~smipyping.WBEMFingerprint` for each
+          host in hosts. The fingerprints are also added to the
+          fingerprints attribute.
+        """
+        max_threads = max_threads or SWEEP_IDENTIFY_THREADS
+        results = {}
+        for host_data, fingerprint in threaded_pipeline(
+                hosts, lambda host_data: fingerprint_host(*host_data),
+                min(max_threads, len(hosts))):
+            self.logger.info('Fingerprint %s:%s %s', host_data[0],
+                             host_data[1], fingerprint)
+            results[host_data] = fingerprint
+        self.fingerprints.update(results)
+        return results
+
+    def identify_hosts(self, cred_target_ids, hosts, max_threads=None,
+                       deadline=None):
+        """
+        Execute test_host_params for each of the open hosts in hosts
+        concurrently.
+
+        Parameters:
+
+          cred_target_ids: list of (principal, credential) tuples to test.
+
+          hosts: list of (ip address, port) tuples of the hosts to test.
+
+          max_threads (integer): Maximum number of hosts tested at the same
+            time. If None,
+            :data:`~smipyping.config.SWEEP_IDENTIFY_THREADS` is used.
+
+          deadline (int or float): Maximum time in seconds for testing all
+            of the hosts. No new test is started after the deadline. If None,
+            :data:`~smipyping.config.SWEEP_IDENTIFY_DEADLINE` is used.
+
+        Returns:
+          Dictionary of host: status string for each host in hosts.
+        """
+        max_threads = max_threads or SWEEP_IDENTIFY_THREADS
+        end_time = time.time() + (deadline or SWEEP_IDENTIFY_DEADLINE)
+
+        def identify(host_data):
+            """Worker function. Returns the status for one host."""
+            try:
+                return self.test_host_params(cred_target_ids, host_data,
+                                             end_time=end_time)
+            except Exception as ex:  # pylint: disable=broad-except
+                return 'General Exception %s' % ex
+
+        host_status = {}
+        for host_data, status in threaded_pipeline(
+                hosts, identify, min(max_threads, len(hosts))):
+            host_status[host_data] = status
+        return host_status
+
+    def test_host_params(self, cred_target_ids, host_data, end_time=None):
         """
         A open hostname, port has been found. This method tests possible
         WBEMConnection parameters to determine there are any known passwords
         that will be accepted or CIMOperations that will work and reports
         the issues.  This helps determine if it is a real WBEM Server
+
+        The tests stop with the first principal, credential and namespace
+        that works. If end_time (a time.time() value) is not None, no test is
+        started after end_time and the timeout of each test is limited to
+        the time remaining.
         """
         # Test if we can contact address with known creds
         ip_address = '%s:%s' % (host_data[0], host_data[1])
         status = "Unknown"
-        for cred in cred_target_ids:
+        # Use the scheme that the fingerprint of the host found
+        if host_data in self.fingerprints:
+            scheme = self.fingerprints[host_data].scheme
+        else:
             scheme = 'http' if host_data[1] == 5988 else 'https'
-            host_url = "%s://%s" % (scheme, ip_address)
+        host_url = "%s://%s" % (scheme, ip_address)
+
+        def test_timeout():
+            """Return timeout for the next test or 0 if past end_time."""
+            if end_time is None:
+                return DEFAULT_OPERATION_TIMEOUT
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return 0
+            return min(DEFAULT_OPERATION_TIMEOUT,
+                       max(remaining, MIN_IDENTIFY_TIMEOUT))
+
+        for cred in cred_target_ids:
             test_namespace = 'interop'
+            timeout = test_timeout()
+            if not timeout:
+                status = 'Identify deadline exceeded. %s' % status
+                break
             try:
                 self.test_host(host_url, test_namespace, principal=cred[0],
-                               credential=cred[1])
+                               credential=cred[1], timeout=timeout)
                 status = 'Found: usr=%s pw=%s ns=%s' % (cred[0], cred[1],
                                                         test_namespace)
                 break
@@ -514,16 +1080,26 @@ class ServerSweep(object):
                 # if CIMError namespace try other namespaces
                 if ce.status_code == CIM_ERR_INVALID_NAMESPACE:
                     for ns in INTEROP_NAMESPACES:
+                        timeout = test_timeout()
+                        if not timeout:
+                            status = 'Identify deadline exceeded. %s' % \
+                                status
+                            break
                         try:
                             self.test_host(host_url, ns, principal=cred[0],
-                                           credential=cred[1])
+                                           credential=cred[1],
+                                           timeout=timeout)
                             status = "Found %s %s %s" % (cred[0],
                                                          cred[1], ns)
+                            break
                         except CIMError as cex:
                             if cex.status_code != CIM_ERR_INVALID_NAMESPACE:
                                 print('Testother namespaces ip %s ns %s er %s'
                                       % (host_url, ns, cex))
                                 break
+                        except Error as er:
+                            status = "Error %s" % er
+                            break
                     break
                 status = 'CIMError %s' % ce
 
@@ -552,50 +1128,225 @@ class ServerSweep(object):
 
         return status
 
-    def sweep_servers(self):
+    def sweep_definition(self):
+        """
+        Return dictionary defining the addresses and ports of the sweep.
+        This is saved in the sweep state to validate a resume.
+        """
+        self.normalize_inputs()
+        return {'net_defs': list(self.net_defs),
+                'ports': [int(port) for port in self.ports],
+                'min_octet_val': self.min_octet_val,
+                'max_octet_val': self.max_octet_val,
+                'workers': self.workers}
+
+    def tracked_test_list(self, ip_ranges, state):
+        """
+        Generator of the (ip address, port) tuples like build_test_list for
+        the addresses from the state position that records each probe started
+        in state.
+        """
+        for address_index, test_ip, live in self.prefiltered_addresses(
+                ip_ranges, state.start_position):
+            if not live:
+                state.address_skipped(address_index, len(self.ports))
+                continue
+            for port_ in self.ports:
+                state.probe_started(address_index, (test_ip, port_))
+                yield test_ip, port_
+
+    def scan_probes_multiprocess(self, state):
+        """
+        Execute the sweep in self.workers processes, each scanning one shard
+        of the addresses from the position in state.shard_positions.
+
+        Returns:
+          Generator that yields a tuple (test_address, Boolean result,
+          counted) for each ip/port as the results are received from the
+          worker processes where counted is False if the probe was already
+          counted before the sweep was resumed. state.shard_positions,
+          state.shard_completed, state.shard_pending and state.probes_skipped
+          are updated as results are received.
+
+        Exceptions:
+            RuntimeError if a worker process fails.
+        """
+        sweep_args = {'net_defs': self.net_defs, 'ports': self.ports,
+                      'no_threads': self.no_threads,
+                      'min_octet_val': self.min_octet_val,
+                      'max_octet_val': self.max_octet_val,
+                      'verbose': self.verbose, 'scan_type': self.scan_type,
+                      'adaptive_timeout': self.adaptive_timeout is not None,
+                      'prefilter': self.prefilter}
+        skipped_base = state.probes_skipped
+        shard_skipped = [0] * self.workers
+        result_queue = multiprocessing.Queue()
+        processes = []
+        for index in range(self.workers):
+            process = multiprocessing.Process(
+                target=sweep_shard_process,
+                args=(sweep_args, self.throttle.config(self.workers), index,
+                      self.workers, state.shard_positions[index],
+                      state.shard_completed[index],
+                      list(state.shard_pending[index]), result_queue))
+            process.daemon = True
+            process.start()
+            processes.append(process)
+
+        try:
+            running = set(range(self.workers))
+            while running:
+                try:
+                    shard_index, batch, status = result_queue.get(timeout=1)
+                except queue.Empty:
+                    for index in running:
+                        if not processes[index].is_alive():
+                            raise RuntimeError(
+                                'Sweep worker process %s exited with code %s'
+                                % (index, processes[index].exitcode))
+                    continue
+                if batch is None:
+                    running.discard(shard_index)
+                    continue
+                if not isinstance(batch, list):
+                    raise RuntimeError('Sweep worker process %s failed: %s' %
+                                       (shard_index, batch))
+                position, skipped, completed_index, pending = status
+                state.shard_positions[shard_index] = position
+                state.shard_completed[shard_index] = completed_index
+                shard_skipped[shard_index] = skipped
+                state.probes_skipped = skipped_base + sum(shard_skipped)
+                # The counted probes of the batch stay pending until they
+                # have been yielded so that a state saved while the batch is
+                # consumed counts them again when the sweep is resumed
+                shard_pending = set(pending)
+                shard_pending.update(tuple(test_addr) for test_addr, _, counted
+                                     in batch if counted)
+                state.shard_pending[shard_index] = shard_pending
+                for test_addr, result, counted in batch:
+                    shard_pending.discard(tuple(test_addr))
+                    yield tuple(test_addr), result, counted
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+    def sweep_servers(self, open_host_callback=None, progress_callback=None,
+                      progress_interval=1.0, resume=False):
         """
         Execute the scan on the subnets defined by the class object
         constructor.
 
+          Parameters:
+
+            open_host_callback: Optional function called with the
+              (ip, port) tuple of each open host as soon as it is found.
+
+            progress_callback: Optional function called with the number of
+              probes completed (including the probes skipped by the
+              prefilter), the total number of probes and the elapsed time in
+              seconds, at most once every progress_interval seconds while the
+              sweep executes and once when it completes.
+
+            progress_interval (int or float): Minimum time in seconds between
+              calls to progress_callback.
+
+            resume (bool): If True, continue the sweep saved in state_file
+              including the open hosts already found.
+
           Returns:
               List of hosts results with each entry in the list a tuple
-              of (ip, port, error_info) for hosts with open ports in the
+              of (ip, port) for hosts with open ports in the
               defined range of subnets and ports input
+
+          Exceptions:
+              ValueError if resume is True and the state file cannot be
+              loaded or is for a different sweep.
         """
         start_time = time.time()   # Scan start time
 
         range_txt = '%s:%s' % (self.min_octet_val, self.max_octet_val)
         self.logger.info('Serversweep Scan WBEMServers: subnet(s)=%s '
-                         'port(s)=%s range=%s, scan_type=%s ',
-                         self.net_defs, self.ports, range_txt, self.scan_type)
+                         'port(s)=%s range=%s, scan_type=%s resume=%s',
+                         self.net_defs, self.ports, range_txt, self.scan_type,
+                         resume)
+
+        if resume:
+            if not self.state_file:
+                raise ValueError('Resume requires a sweep state file')
+            state = SweepState.load(self.state_file, self.sweep_definition())
+        else:
+            state = SweepState(self.state_file, self.sweep_definition())
+        if self.workers > 1:
+            if state.shard_positions is None:
+                state.shard_positions = [0] * self.workers
+            if state.shard_completed is None:
+                state.shard_completed = [-1] * self.workers
+            if state.shard_pending is None:
+                state.shard_pending = [[] for _ in range(self.workers)]
+            scan_results = self.scan_probes_multiprocess(state)
+            # the worker processes track the positions in their shards
+            complete_probe = state.add_result
+        else:
+            scan_results = self.scan_probes(
+                self.tracked_test_list(self.address_ranges(), state))
+            complete_probe = state.probe_completed
 
+        total_probes = self.probe_count if progress_callback else None
+        next_progress = start_time + progress_interval
+        next_checkpoint = start_time + SWEEP_CHECKPOINT_INTERVAL
         try:
-            open_hosts = []
-
-            if self.no_threads:
-                scan_results = self.scan_subnets()
-            else:
-                scan_results = self.scan_subnets_threaded()
-
-            if scan_results is not None:
-                open_hosts.extend(sorted(scan_results))
+            for probe in scan_results:
+                if complete_probe(*probe) and open_host_callback:
+                    open_host_callback(probe[0])
+                now = time.time()
+                if progress_callback and now >= next_progress:
+                    progress_callback(
+                        state.probes_done + state.probes_skipped,
+                        total_probes, now - start_time)
+                    next_progress = now + progress_interval
+                if self.state_file and now >= next_checkpoint:
+                    state.save()
+                    next_checkpoint = now + SWEEP_CHECKPOINT_INTERVAL
 
         except KeyboardInterrupt:
             # Used in case the  user press "Ctrl+C", it will show the
             # following error instead of a python scary error
-            print("\nCtrl+C. Exiting with no output.")
+            if self.state_file:
+                state.save()
+                print("\nCtrl+C. Sweep state saved to %s. Use resume to "
+                      "continue the sweep." % self.state_file)
+            else:
+                print("\nCtrl+C. Exiting with no output.")
             sys.exit(1)
 
+        except Exception:
+            if self.state_file:
+                state.save()
+            raise
+
+        if self.state_file:
+            state.remove()
+
+        self.total_pings = state.probes_done
+        self.total_skipped = state.probes_skipped
         self.total_sweep_time = time.time() - start_time
+        if progress_callback:
+            progress_callback(state.probes_done + state.probes_skipped,
+                              total_probes, self.total_sweep_time)
 
-        return(open_hosts)
+        return sorted(state.open_hosts)
 
     def test_host(self, hosturl, namespace, principal=None, credential=None,
                   timeout=10):
         # pylint: disable=no-self-use
         """
-        Builds a WBEMConnection and trys to contact the server defined by
-        ip address, port, principal, credential
+        Checks out a WBEMConnection from the connection pool and trys to
+        contact the server defined by ip address, port, principal, credential
+
+        The test operation is EnumerateClassNames of the top level classes
+        so no class definitions are fetched.
 
         If a single command executes returns True
         """
@@ -605,19 +1356,20 @@ class ServerSweep(object):
         if principal is not None or credential is not None:
             creds = (principal, credential)
 
-        conn = WBEMConnection(hosturl, creds, default_namespace=namespace,
-                              no_verification=True,
-                              timeout=timeout)
-        # conn.debug = self.debug
-        # if self.verbose:
-        #    print(self.get_connection_info(conn))
+        with get_connection_pool().connection(hosturl, creds,
+                                              namespace=namespace,
+                                              no_verification=True,
+                                              timeout=timeout) as conn:
+            # conn.debug = self.debug
+            # if self.verbose:
+            #    print(self.get_connection_info(conn))
 
-        try:
-            conn.EnumerateClasses()
-            return
-        except Error as er:
-            raise er
-        except Exception as ex:
-            print('ERROR TESTSERVER url %s principal %s cred=%s er %s %r' %
-                  (hosturl, principal, credential, ex, ex))
-            raise ex
+            try:
+                conn.EnumerateClassNames()
+                return
+            except Error as er:
+                raise er
+            except Exception as ex:
+                print('ERROR TESTSERVER url %s principal %s cred=%s er %s %r'
+                      % (hosturl, principal, credential, ex, ex))
+                raise ex
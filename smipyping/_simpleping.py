@@ -37,15 +37,19 @@ import re
 # TODO the following should be standardized in report module
 from textwrap import fill
 import datetime
-from threading import Thread
-import Queue
+import socket
+import time
+import threading
+import six
+from six.moves import queue
 
 from urlparse import urlparse
 from collections import namedtuple
 
-from pywbem import WBEMConnection, ConnectionError, Error, TimeoutError, \
-    CIMError
-from ._ping import ping_host
+from pywbem import WBEMConnection
+
+from ._ping import ping_host, ping_hosts, tcp_ping, url_ping_address, \
+    get_ping_mode, PING_MODES
 from .config import PING_TEST_CLASS, PING_TIMEOUT, DEFAULT_USERNAME, \
     DEFAULT_PASSWORD
 
@@ -53,16 +57,50 @@ from .config import MAX_THREADS
 from ._logging import CIMPING_LOGGER_NAME, get_logger, SmiPypingLoggers
 
 from ._pingstable import PingsTable
+from ._workpipeline import threaded_pipeline
+from ._simpleping_async import CIMPingRequest, cimping_async, result_type
+from ._connectionpool import get_connection_pool
+from ._cimprobe import probe_server, get_probe_strategy, PROBE_STRATEGIES
+from ._ratelimit import get_probe_throttle
+from ._retrypolicy import get_retry_policy
 
 
-__all__ = ['SimplePing', 'SimplePingList', 'TestResult']
+__all__ = ['SimplePing', 'SimplePingList', 'TestResult', 'PhaseTimings']
 
 LOG = get_logger(__name__)
 
+# Interval in seconds at which the wait for a hedged operation checks for
+# Ctrl-C
+HEDGE_POLL_INTERVAL = 0.1
+
 TestResult = namedtuple('TestResult', ['code',
                                        'type',
                                        'exception',
-                                       'execution_time'])
+                                       'execution_time',
+                                       'timings',
+                                       'attempts'])
+
+#: Time in seconds of each phase of a test. A phase that was not executed or
+#: that cannot be measured by the test engine is None:
+#:
+#:   * dns - resolution of the host name of the server.
+#:   * ping - icmp round trip time or tcp connect time of the ping.
+#:   * connect - TCP connect of the WBEM connection.
+#:   * tls - TLS handshake of an https connection.
+#:   * response - from the request being sent until the whole response is
+#:     received.
+#:   * parse - parsing of the CIM-XML response.
+#:   * operation - the whole WBEM operation as seen by the client.
+#:   * server - processing time reported by the server in the
+#:     WBEMServerResponseTime header.
+#:
+#: The event loop engine measures all of the phases. SimplePing executes the
+#: operation with pywbem, which hides the connect, TLS handshake, response
+#: and parse times, so it leaves them None.
+PhaseTimings = namedtuple('PhaseTimings', ['dns', 'ping', 'connect', 'tls',
+                                           'response', 'parse', 'operation',
+                                           'server'])
+PhaseTimings.__new__.__defaults__ = (None,) * len(PhaseTimings._fields)
 
 
 class SimplePingList(object):
@@ -75,7 +113,8 @@ class SimplePingList(object):
     """
     def __init__(self, targets_tbl, target_ids=None, verbose=None, logfile=None,
                  timeout=None, log_level=None, threaded=True,
-                 include_disabled=False):
+                 include_disabled=False, ping_mode=None, event_loop=False,
+                 probe_strategy=None, retry_policy=None):
         """
         Saves the input parameters and sets up local variables for the
         execution of the scan.
@@ -112,6 +151,30 @@ class SimplePingList(object):
             include_disabled(:class:`py:bool`):
                 If true, include disabled targets.
 
+            ping_mode(:term:`string`):
+                Ping mode (one of :data:`~smipyping.PING_MODES`) for all of
+                the targets. If None, the mode configured for each target
+                (see :func:`~smipyping.configure_ping_mode`).
+
+            event_loop(:class:`py:bool`):
+                If true, test all of the servers concurrently from one thread
+                with non-blocking sockets (see
+                :func:`~smipyping.cimping_async`) instead of a thread for each
+                server. threaded is ignored.
+
+            probe_strategy(:term:`string`):
+                CIM operation (one of :data:`~smipyping.PROBE_STRATEGIES`)
+                that tests all of the servers. If None, the strategy
+                configured for each target (see
+                :func:`~smipyping.configure_probe_strategy`).
+
+            retry_policy(:class:`~smipyping.RetryPolicy`):
+                Repeats of the tests that fail with a TimeoutError or
+                ConnectionError. If None, the policy of the process (see
+                :func:`~smipyping.configure_retry_policy`). The event loop
+                engine repeats the failed tests but sends no hedged
+                requests.
+
         Exceptions:
             KeyError if a target_id is not in the database.
         """
@@ -128,9 +191,14 @@ class SimplePingList(object):
         self.verbose = verbose
         self.logfile = logfile
         self.log_level = log_level
-        self.kill_threads = False
         self.threaded = threaded
         self.timeout = timeout
+        self.ping_mode = ping_mode
+        self.event_loop = event_loop
+        self.probe_strategy = probe_strategy
+        self.retry_policy = retry_policy or get_retry_policy()
+        # (reachable, rtt) from ping_hosts keyed by target IPAddress
+        self.host_pings = {}
 
     def __repr__(self):
         """
@@ -161,36 +229,51 @@ class SimplePingList(object):
             KeyboardInterrupt:
 
         """
+        self.ping_hosts()
+        if self.event_loop:
+            return self.ping_servers_event_loop()
         if self.threaded:
             return self.ping_servers_threaded()
 
         return self.ping_servers_not_threaded()
 
-    def process_queue(self, queue, results):
-        """This is a thread function that processes a queue to do check_port.
-        Each queue entry is a tuple of ip_address(with port) and results
-        list where the results are appended for each succseful scan.
-        """
-        while not queue.empty():
-            if self.kill_threads:
-                return
-            work = queue.get()
-            results = work[1]   # get results list from work
-            # check_result, error = self.check_port(work[0])
-            simpleping = SimplePing(target_id=work[0],
-                                    targets_tbl=self.targets_tbl,
-                                    timeout=self.timeout)
-            test_result = simpleping.test_server()
-            # append target_id and results to results list.
-            results.append((work[0], test_result))
-            queue.task_done()
-        return
+    def ping_hosts(self):
+        """
+        Ping the hosts of all of the targets with the icmp ping mode with a
+        single batched ping and save the results for the SimplePing tests so
+        that the ping phase takes about one ping timeout in total. The
+        targets with the tcp ping mode are pinged by their tests.
+        """
+        hosts = set(self.targets_tbl[target_id]['IPAddress']
+                    for target_id in self.target_ids
+                    if (self.ping_mode or get_ping_mode(target_id)) == 'icmp')
+        self.host_pings = ping_hosts(hosts, PING_TIMEOUT)
+        LOG.debug('Pinged %s hosts, %s reachable', len(hosts),
+                  sum(1 for result in self.host_pings.values() if result[0]))
+
+    def ping_target(self, target_id):
+        """
+        Execute SimplePing on the server defined by target_id and return the
+        TestResult. The test is started when the probe throttle allows.
+        """
+        simpleping = SimplePing(target_id=target_id,
+                                targets_tbl=self.targets_tbl,
+                                timeout=self.timeout,
+                                ping_mode=self.ping_mode,
+                                probe_strategy=self.probe_strategy,
+                                retry_policy=self.retry_policy)
+        ip_address = self.targets_tbl[target_id]['IPAddress']
+        if simpleping.ping_mode == 'icmp' and ip_address in self.host_pings:
+            simpleping.ping_reachable, simpleping.ping_latency = \
+                self.host_pings[ip_address]
+        with get_probe_throttle().probe(ip_address):
+            return simpleping.test_server()
 
     def ping_servers_threaded(self):
         """
         Execute SimplePing on the servers defined. Returns a list of
-        results. If self.threaded is True, call the threaded executor.
-        Otherwise call the single-thread method
+        results. The target ids are fed to MAX_THREADS worker threads through
+        a bounded queue.
 
         return:
             list of TestResult named tuples with results of test.
@@ -199,35 +282,101 @@ class SimplePingList(object):
             KeyboardInterrupt:
 
         """
-        # set up queue to hold all call info
-        queue = Queue.Queue(maxsize=0)
-        num_threads = MAX_THREADS
-
         results = []
+        try:
+            for target_id, test_result in threaded_pipeline(self.target_ids,
+                                                            self.ping_target,
+                                                            MAX_THREADS):
+                # append target_id and results to results list.
+                results.append((target_id, test_result))
+        except KeyboardInterrupt:
+            print("Ctrl-C received! Sending kill to threads...")
+
+        return results
 
-        # put all targets into work queue
-        for target_id in self.target_ids:
-            queue.put((target_id, results))
+    def ping_servers_event_loop(self):
+        """
+        Execute the SimplePing test of all of the servers concurrently from
+        this thread with :func:`~smipyping.cimping_async`. The servers of
+        the targets with the icmp ping mode have already been pinged by
+        ping_hosts. For the targets with the tcp ping mode, the connect of
+        the test is the ping. The tests that fail with a TimeoutError or
+        ConnectionError are repeated together after the backoff of the retry
+        policy.
 
-        # Start worker threads.
-        threads = []
-        for i in range(num_threads):  # pylint: disable=unused-variable
-            t = Thread(target=self.process_queue, args=(queue, results))
-            t.daemon = True    # allows main program to exit.
-            threads.append(t)
-            t.start()
+        return:
+            list of tuples of (target_id, TestResult) in completion order.
+        """
+        results = []
 
+        def requests(target_ids):
+            """Generate the requests for the targets that passed the ping."""
+            for target_id in target_ids:
+                target = self.targets_tbl[target_id]
+                tcp_ping = (self.ping_mode or get_ping_mode(target_id)) == \
+                    'tcp'
+                if not tcp_ping and not self.host_pings.get(
+                        target['IPAddress'], (False, None))[0]:
+                    results.append((target_id, self.make_test_result(
+                        'PingFail', None, 0)))
+                    continue
+                strategy = self.probe_strategy or \
+                    get_probe_strategy(target_id)
+                yield CIMPingRequest(
+                    key=target_id,
+                    host=target['IPAddress'],
+                    port=int(target['Port']),
+                    scheme=target['Protocol'],
+                    namespace=target['Namespace'],
+                    user=target.get('Principal', DEFAULT_USERNAME),
+                    password=target.get('Credential', DEFAULT_PASSWORD),
+                    tcp_ping=tcp_ping,
+                    strategy=strategy)
+
+        policy = self.retry_policy
+        target_ids = self.target_ids
         try:
-            queue.join()
+            for retry in six.moves.range(policy.retries + 1):
+                if retry:
+                    LOG.info('Repeat %s of the tests of %s targets after %ss',
+                             retry, len(target_ids),
+                             policy.backoff_delay(retry))
+                    time.sleep(policy.backoff_delay(retry))
+                retry_ids = []
+                for target_id, result, exception, execution_time, phases in \
+                        cimping_async(requests(target_ids),
+                                      timeout=self.timeout,
+                                      throttle=get_probe_throttle(),
+                                      logger=LOG):
+                    if retry < policy.retries and policy.retryable(result):
+                        retry_ids.append(target_id)
+                        continue
+                    ping = self.host_pings.get(
+                        self.targets_tbl[target_id]['IPAddress'])
+                    if ping is not None and 'ping' not in phases:
+                        phases['ping'] = ping[1]
+                    results.append((target_id, self.make_test_result(
+                        result, exception, execution_time,
+                        PhaseTimings(**phases), attempts=retry + 1)))
+                if not retry_ids:
+                    break
+                target_ids = retry_ids
         except KeyboardInterrupt:
-            print("Ctrl-C received! Sending kill to threads...")
-            self.kill_threads = True
-            for t in threads:
-                t.kill_received = True
+            print("Ctrl-C received! Stopping the tests...")
 
-        # returns list of ip addresses that were were found
         return results
 
+    @staticmethod
+    def make_test_result(result, exception, execution_time, timings=None,
+                         attempts=1):
+        """Return TestResult for the result type of a test."""
+        return TestResult(code=SimplePing.get_result_code(result),
+                          type=result,
+                          exception=exception,
+                          execution_time='%.2fs' % execution_time,
+                          timings=timings or PhaseTimings(),
+                          attempts=attempts)
+
     def ping_servers_not_threaded(self):
         """
         Threaded cimping of servers.
@@ -246,10 +395,7 @@ class SimplePingList(object):
         """
         results = []
         for targetid in self.target_ids:
-            simpleping = SimplePing(target_id=targetid,
-                                    targets_tbl=self.targets_tbl,
-                                    timeout=self.timeout)
-            test_result = simpleping.test_server()
+            test_result = self.ping_target(targetid)
             # append target_id and results to results list.
             results.append((targetid, test_result))
 
@@ -277,7 +423,9 @@ class SimplePingList(object):
                 code=result_code,
                 type=result,
                 exception=exception,
-                execution_time=str(execution_time))))
+                execution_time=str(execution_time),
+                timings=PhaseTimings(),
+                attempts=1)))
         return rtn_list
 
 
@@ -304,7 +452,8 @@ class SimplePing(object):
     def __init__(self, server=None, namespace=None, user=None, password=None,
                  timeout=None, target_id=None, targets_tbl=None, ping=True,
                  certfile=None, keyfile=None, verify_cert=False,
-                 debug=False, verbose=None, logfile=None, log_level=None):
+                 debug=False, verbose=None, logfile=None, log_level=None,
+                 ping_mode=None, probe_strategy=None, retry_policy=None):
         """
         Initialize instance attributes.
 
@@ -343,6 +492,24 @@ class SimplePing(object):
 
             log_level
 
+            ping_mode(:term:`string`):
+                Ping mode, one of :data:`~smipyping.PING_MODES`. icmp sends
+                an ICMP echo request and tcp connects to the WBEM server
+                port of the server. If None, the mode configured for the
+                target (see :func:`~smipyping.configure_ping_mode`).
+
+            probe_strategy(:term:`string`):
+                CIM operation that tests the server, one of
+                :data:`~smipyping.PROBE_STRATEGIES`. If None, the strategy
+                configured for the target (see
+                :func:`~smipyping.configure_probe_strategy`).
+
+            retry_policy(:class:`~smipyping.RetryPolicy`):
+                Repeats and hedged requests of a test operation that fails
+                with a TimeoutError or ConnectionError. If None, the policy
+                of the process (see
+                :func:`~smipyping.configure_retry_policy`).
+
           Exceptions:
             ValueError if invalid input parameters.
 
@@ -370,6 +537,7 @@ class SimplePing(object):
             target_record = self.targets_tbl[self.target_id]
             self.url = '%s://%s' % (target_record['Protocol'],
                                     target_record['IPAddress'])
+            self.port = int(target_record['Port'])
 
             self.namespace = target_record['Namespace']
             self.user = target_record.get('Principal', DEFAULT_USERNAME)
@@ -378,9 +546,26 @@ class SimplePing(object):
             self.namespace = namespace
             self.user = user
             self.password = password
+            self.port = url_ping_address(self.url)[1]
 
         self.timeout = timeout
         self.ping = ping
+        self.ping_mode = ping_mode or get_ping_mode(target_id)
+        if self.ping_mode not in PING_MODES:
+            raise ValueError('SimplePing: Invalid ping mode %s. Use one of '
+                             '%s' % (self.ping_mode, ', '.join(PING_MODES)))
+        self.probe_strategy = probe_strategy or get_probe_strategy(target_id)
+        if self.probe_strategy not in PROBE_STRATEGIES:
+            raise ValueError('SimplePing: Invalid probe strategy %s. Use one '
+                             'of %s' % (self.probe_strategy,
+                                        ', '.join(PROBE_STRATEGIES)))
+        self.retry_policy = retry_policy or get_retry_policy()
+        # Time in seconds of the icmp round trip or of the TCP connect of a
+        # tcp mode ping
+        self.ping_latency = None
+        # Result of a ping of the server executed before the test (ex. by
+        # SimplePingList). If None, ping_server pings the server.
+        self.ping_reachable = None
         self.debug = debug
         self.verbose = verbose
         self.certfile = certfile
@@ -483,20 +668,30 @@ class SimplePing(object):
              tuple of
         """
         start_time = datetime.datetime.now()
+        timings = {'dns': self.resolve_host()}
         # execute the ping test if required
         ping_result = True
         result_code = 0
         exception = None
+        attempts = 1
         if self.ping:
             ping_result, result = self.ping_server()
+            timings['ping'] = self.ping_latency
             if ping_result is False:
                 result_code = self.get_result_code(result)
                 exception = None
         if ping_result:
             # connect to the server and execute the cim operation test
             conn = self.connect_server(verify_cert=verify_cert)
-            result, exception = self.execute_cim_test(conn)
+            result = None
+            try:
+                result, exception, timings['operation'], \
+                    timings['server'], attempts = \
+                    self.execute_cim_test_retries(conn)
+            finally:
+                self.release_connection(conn, result)
             result_code = self.get_result_code(result)
+        timings = PhaseTimings(**timings)
         if self.verbose:
             print('result=%s, exception=%s, resultCode %s'
                   % (result, exception, result_code))
@@ -507,36 +702,185 @@ class SimplePing(object):
         else:
             id_ = 'target_id=%s' % self.target_id
         self.logger.info('Test %s result=%s, exception=%s, resultCode=%s,'
-                         ' time=%s',
+                         ' time=%s, timings=%s, attempts=%s',
                          id_, result, exception, result_code,
-                         str(execution_time))
+                         str(execution_time), timings, attempts)
 
         # Return namedtuple with results
         return TestResult(
             code=result_code,
             type=result,
             exception=exception,
-            execution_time=str(execution_time))
+            execution_time=str(execution_time),
+            timings=timings,
+            attempts=attempts)
+
+    def execute_cim_test_retries(self, conn):
+        """
+        Execute the test operation with the retry policy. A test that fails
+        with a TimeoutError or ConnectionError is repeated after the backoff
+        of the policy up to the retries of the policy.
+
+        Returns tuple of result type, exception, time in seconds of the
+        operation whose result is returned, the server response time of that
+        operation and the number of operations executed.
+        """
+        policy = self.retry_policy
+        outcome, attempts = self.execute_attempt(conn)
+        retry = 0
+        while retry < policy.retries and policy.retryable(outcome[0]):
+            retry += 1
+            self.logger.info('Test url=%s retry %s after %s: %s', self.url,
+                             retry, outcome[0], outcome[1])
+            time.sleep(policy.backoff_delay(retry))
+            outcome, started = self.execute_attempt(conn)
+            attempts += started
+        return outcome + (attempts,)
+
+    def execute_attempt(self, conn):
+        """
+        Execute the test operation, hedged if the retry policy has a hedge
+        delay. Returns tuple of the execute_timed result and the number of
+        operations started.
+        """
+        if self.retry_policy.hedge_delay:
+            return self.execute_hedged(conn, self.retry_policy.hedge_delay)
+        return self.execute_timed(conn), 1
+
+    def execute_timed(self, conn):
+        """
+        Execute the test operation. Returns tuple of result type, exception,
+        the time in seconds of the operation and the server response time
+        reported to conn.
+        """
+        start = time.time()
+        result, exception = self.execute_cim_test(conn)
+        return result, exception, time.time() - start, \
+            conn.last_server_response_time
+
+    def execute_hedged(self, conn, hedge_delay):
+        """
+        Execute the test operation on conn and, if it has not completed after
+        hedge_delay seconds, a second identical operation on a new connection
+        from hedge_connection since a WBEMConnection must not be used by two
+        threads at once. The first operation to complete without a
+        TimeoutError or ConnectionError wins.
+
+        The operation that lost is not waited for. It ends within the timeout
+        of its connection. If it is the operation on conn, conn is discarded
+        from the connection pool so that it is not lent again while the
+        operation is in progress.
+
+        Returns tuple of the execute_timed result and the number of
+        operations started.
+        """
+        outcomes = queue.Queue()
+        completed = []
+
+        def start_operation(conn_):
+            """Start the operation on conn_ in a new thread."""
+            thread = threading.Thread(
+                target=lambda: outcomes.put((conn_,
+                                             self.execute_timed(conn_))))
+            thread.daemon = True
+            thread.start()
+
+        def get_outcome(timeout=None):
+            """
+            Return the next outcome or None after timeout. The wait can be
+            interrupted by Ctrl-C.
+            """
+            end = None if timeout is None else time.time() + timeout
+            while True:
+                wait = HEDGE_POLL_INTERVAL if end is None else \
+                    min(HEDGE_POLL_INTERVAL, max(0, end - time.time()))
+                try:
+                    conn_, outcome = outcomes.get(timeout=wait)
+                    completed.append(conn_)
+                    return outcome
+                except queue.Empty:
+                    if end is not None and time.time() >= end:
+                        return None
+
+        start_operation(conn)
+        outcome = get_outcome(hedge_delay)
+        if outcome is not None:
+            return outcome, 1
+        self.logger.info('Test url=%s hedged request after %ss', self.url,
+                         hedge_delay)
+        start_operation(self.hedge_connection(conn))
+        outcome = get_outcome()
+        if self.retry_policy.retryable(outcome[0]):
+            outcome = get_outcome()
+        if conn not in completed:
+            get_connection_pool().discard(conn)
+        return outcome, 2
+
+    @staticmethod
+    def hedge_connection(conn):
+        """
+        Return a new WBEMConnection, not from the connection pool, with the
+        parameters of conn (including its timeout) for a hedged request.
+        """
+        hedge_conn = WBEMConnection(conn.url, conn.creds,
+                                    default_namespace=conn.default_namespace,
+                                    x509=conn.x509,
+                                    no_verification=conn.no_verification,
+                                    timeout=conn.timeout)
+        hedge_conn.debug = conn.debug
+        return hedge_conn
+
+    def resolve_host(self):
+        """
+        Resolve the host name of the url. Returns the time in seconds of the
+        resolution or None if the host name cannot be resolved.
+        """
+        host = url_ping_address(self.url)[0]
+        start = time.time()
+        try:
+            socket.gethostbyname(host)
+        except socket.error:
+            return None
+        return time.time() - start
 
     def ping_server(self):
         """
-        Get the netloc from the url and ping the server.
+        Get the netloc from the url and ping the server with the ping mode
+        of this test. The round trip time of an icmp ping or the connect
+        latency of a tcp ping is saved in ping_latency.
 
 
         Returns the result text that must match the defined texts.
 
         """
+        if self.ping_reachable is not None:
+            return (True, 'OK') if self.ping_reachable else \
+                (False, 'PingFail')
         netloc = urlparse(self.url).netloc
         target_address = netloc.split(':')
         if self.verbose:
-            print('Ping network address %s' % target_address[0])
+            print('Ping network address %s mode %s' % (target_address[0],
+                                                       self.ping_mode))
+        if self.ping_mode == 'tcp':
+            reachable, self.ping_latency = tcp_ping(target_address[0],
+                                                    self.port, PING_TIMEOUT)
+            if reachable:
+                self.logger.info('TCP ping %s port %s latency %.3fs',
+                                 target_address[0], self.port,
+                                 self.ping_latency)
+                return(True, 'OK')
+            return(False, 'PingFail')
+        start = time.time()
         if ping_host(target_address[0], PING_TIMEOUT):
+            self.ping_latency = time.time() - start
             return(True, 'OK')
         return(False, 'PingFail')
 
     def connect_server(self, verify_cert=False):
         """
-        Build connection parameters and issue WBEMConnection to the WBEMServer.
+        Build connection parameters and check out the WBEMConnection to the
+        WBEMServer from the connection pool. The connection must be returned
+        with release_connection.
 
         The server is defined by the input options.
 
@@ -548,18 +892,32 @@ class SimplePing(object):
         if self.user is not None or self.password is not None:
             creds = (self.user, self.password)
 
-        conn = WBEMConnection(self.url, creds, default_namespace=self.namespace,
-                              no_verification=not verify_cert,
-                              timeout=self.timeout)
+        conn = get_connection_pool().get(self.url, creds,
+                                         namespace=self.namespace,
+                                         no_verification=not verify_cert,
+                                         timeout=self.timeout)
         conn.debug = self.debug
         if self.verbose:
             print(self.get_connection_info(conn))
 
         return conn
 
+    @staticmethod
+    def release_connection(conn, result):
+        """
+        Return conn from connect_server to the connection pool or close it if
+        the test did not complete or failed with a ConnectionError or
+        TimeoutError, which may leave the session unusable.
+        """
+        if result in (None, 'ConnectionError', 'TimeoutError'):
+            get_connection_pool().discard(conn)
+        else:
+            get_connection_pool().release(conn)
+
     def execute_cim_test(self, conn):
         """
-        Issue the test operation. Returns with system exit code.
+        Issue the test operation of the probe strategy. Returns with system
+        exit code.
 
         Returns a tuple of code and reason text or exception if an exception
         occurred.  The code is ne 0 if there was an error.
@@ -571,30 +929,23 @@ class SimplePing(object):
         """
         try:
             if self.verbose:
-                print('Test server %s namespace %s creds %s class %s' %
-                      (conn.url, conn.default_namespace, conn.creds,
-                       PING_TEST_CLASS))
-            self.logger.info('Test server %s namespace %s creds %s class %s',
-                             conn.url, conn.default_namespace, conn.creds,
-                             PING_TEST_CLASS)
-            insts = conn.EnumerateInstances(PING_TEST_CLASS)
+                print('Test server %s namespace %s creds %s class %s '
+                      'probe %s' % (conn.url, conn.default_namespace,
+                                    conn.creds, PING_TEST_CLASS,
+                                    self.probe_strategy))
+            self.logger.info('Test server %s namespace %s creds %s class %s '
+                             'probe %s', conn.url, conn.default_namespace,
+                             conn.creds, PING_TEST_CLASS, self.probe_strategy)
+            count = probe_server(conn, self.probe_strategy)
 
             if self.verbose:
-                print('Running host=%s. Returned %s instance(s)' %
-                      (conn.url, len(insts)))
+                print('Running host=%s. Returned %s object(s)' %
+                      (conn.url, count))
             rtn_tuple = ('OK', None)
 
-        except CIMError as ce:
-            # TODO make this a named tuple for clarity
-            rtn_tuple = ("WBEMError", ce)
-        except ConnectionError as co:
-            rtn_tuple = ("ConnectionError", co)
-        except TimeoutError as to:
-            rtn_tuple = ("TimeoutError", to)
-        except Error as er:
-            rtn_tuple = ("PyWBEMError", er)
         except Exception as ex:  # pylint: disable=broad-except
-            rtn_tuple = ("GeneralError", ex)
+            # TODO make this a named tuple for clarity
+            rtn_tuple = (result_type(ex), ex)
 
         if self.debug:
             last_request = conn.last_request or conn.last_raw_request
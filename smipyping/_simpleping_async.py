@@ -0,0 +1,733 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Event loop engine that executes the cimping test of many WBEM servers
+concurrently from a single thread.
+
+Each test is a non-blocking TCP connect to the WBEM server port, a TLS
+handshake for https, and the CIM-XML request of the probe strategy (see
+:mod:`smipyping._cimprobe`) for :data:`~smipyping.config.PING_TEST_CLASS`
+sent as an HTTP POST. For the pull strategy an enumeration that is not
+complete is closed with CloseEnumeration on a second connection. All of the
+sockets are serviced by one poll loop (see
+:class:`~smipyping._scanport_tcp.SocketPoller`) so the number of servers
+tested at the same time is limited by the number of sockets
+(:data:`~smipyping.config.MAX_ASYNC_SOCKETS`) rather than by a thread
+pool, and the total time is about the time of the slowest server.
+
+The results use the same result types and pywbem exceptions as
+:meth:`~smipyping.SimplePing.test_server`.
+"""
+
+from __future__ import print_function, absolute_import
+
+import os
+import ssl
+import errno
+import heapq
+import base64
+import itertools
+import socket
+import time
+from collections import namedtuple
+from xml.sax.saxutils import quoteattr, escape
+from xml.etree import ElementTree
+import six
+
+from pywbem import ConnectionError, TimeoutError, AuthError, HTTPError, \
+    ParseError, CIMError, Error
+from .config import MAX_ASYNC_SOCKETS, PING_TEST_CLASS, PING_TIMEOUT, \
+    SIMPLEPING_OPERATION_DEFAULT_TIMEOUT, RESOLVE_THREADS
+from ._scanport_tcp import SocketPoller, CONNECT_PENDING_ERRNOS, NO_FD_ERRNOS
+from ._reachabilitycache import get_reachability_cache
+from ._workpipeline import threaded_pipeline
+from ._cimprobe import PROBE_STRATEGIES
+
+__all__ = ['CIMPingRequest', 'cimping_async']
+
+#: Definition of one server to test with :func:`cimping_async`. key is
+#: returned with the result of the test (ex. the TargetID). If tcp_ping is
+#: True, a connect that gets no reply within the ping timeout is reported
+#: as PingFail, as with the tcp ping mode of SimplePing. strategy is one of
+#: :data:`~smipyping.PROBE_STRATEGIES`.
+CIMPingRequest = namedtuple('CIMPingRequest', ['key', 'host', 'port',
+                                               'scheme', 'namespace', 'user',
+                                               'password', 'tcp_ping',
+                                               'strategy'])
+
+# Connect errors that show the host did not answer the tcp ping
+TCP_PING_FAIL_ERRNOS = (errno.ETIMEDOUT, errno.EHOSTUNREACH,
+                        errno.ENETUNREACH, errno.EHOSTDOWN)
+
+# Socket errors of non-blocking send and recv that mean try again later
+WOULD_BLOCK_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+RECV_SIZE = 65536
+
+REQUEST_XML = '<?xml version="1.0" encoding="utf-8" ?>\n' \
+    '<CIM CIMVERSION="2.0" DTDVERSION="2.0">' \
+    '<MESSAGE ID="1001" PROTOCOLVERSION="1.0"><SIMPLEREQ>' \
+    '<IMETHODCALL NAME="%s">' \
+    '<LOCALNAMESPACEPATH>%s</LOCALNAMESPACEPATH>%s' \
+    '</IMETHODCALL></SIMPLEREQ></MESSAGE></CIM>'
+
+IPARAMVALUE_XML = '<IPARAMVALUE NAME="%s">%s</IPARAMVALUE>'
+
+# Intrinsic method name and IPARAMVALUE elements of each probe strategy
+CLASSNAME_XML = '<CLASSNAME NAME=%s/>' % quoteattr(PING_TEST_CLASS)
+PROBE_METHODS = {
+    'enuminsts': ('EnumerateInstances', [('ClassName', CLASSNAME_XML)]),
+    'enumnames': ('EnumerateInstanceNames', [('ClassName', CLASSNAME_XML)]),
+    'pull': ('OpenEnumerateInstancePaths',
+             [('ClassName', CLASSNAME_XML),
+              ('MaxObjectCount', '<VALUE>1</VALUE>')]),
+    'getclass': ('GetClass', [('ClassName', CLASSNAME_XML),
+                              ('LocalOnly', '<VALUE>TRUE</VALUE>'),
+                              ('IncludeQualifiers', '<VALUE>FALSE</VALUE>')])}
+
+# States of a CIMPingConnection
+CONNECTING = 'connecting'
+HANDSHAKING = 'handshaking'
+SENDING = 'sending'
+RECEIVING = 'receiving'
+
+
+def build_request(request):
+    """
+    Return the HTTP POST message with the CIM-XML request of the probe
+    strategy of request for PING_TEST_CLASS.
+
+    Exceptions:
+        ValueError if the strategy of request is invalid.
+    """
+    if request.strategy not in PROBE_METHODS:
+        raise ValueError('Probe strategy %s invalid. Must be one of %s' %
+                         (request.strategy, ', '.join(PROBE_STRATEGIES)))
+    method, params = PROBE_METHODS[request.strategy]
+    return build_method_call(request, method, params)
+
+
+def build_close_request(request, context):
+    """
+    Return the HTTP POST message with the CIM-XML CloseEnumeration request
+    of the enumeration context for the server defined by request.
+    """
+    return build_method_call(
+        request, 'CloseEnumeration',
+        [('EnumerationContext', '<VALUE>%s</VALUE>' % escape(context))])
+
+
+def build_method_call(request, method, params):
+    """
+    Return the HTTP POST message with the CIM-XML request of the intrinsic
+    method with the list of params (name, value XML) for the server defined
+    by request.
+    """
+    namespace = request.namespace.strip('/')
+    body = REQUEST_XML % (
+        method,
+        ''.join('<NAMESPACE NAME=%s/>' % quoteattr(name)
+                for name in namespace.split('/')),
+        ''.join(IPARAMVALUE_XML % param for param in params))
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    headers = [
+        'POST /cimom HTTP/1.1',
+        'Host: %s:%s' % (request.host, request.port),
+        'Content-Type: application/xml; charset="utf-8"',
+        'Content-Length: %s' % len(body),
+        'CIMOperation: MethodCall',
+        'CIMMethod: %s' % method,
+        'CIMObject: %s' % six.moves.urllib.parse.quote(namespace),
+        'Connection: close']
+    if request.user is not None or request.password is not None:
+        creds = '%s:%s' % (request.user or '', request.password or '')
+        headers.append('Authorization: Basic %s' % base64.b64encode(
+            creds.encode('utf-8')).decode('ascii'))
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8') + body
+
+
+def decode_chunked(data):
+    """
+    Return the body of the HTTP chunked transfer encoded data or None if
+    data does not yet contain the last chunk.
+    """
+    body = []
+    pos = 0
+    while True:
+        line_end = data.find(b'\r\n', pos)
+        if line_end < 0:
+            return None
+        try:
+            size = int(data[pos:line_end].split(b';')[0], 16)
+        except ValueError:
+            raise ParseError('Invalid HTTP chunk size')
+        if size == 0:
+            return b''.join(body)
+        start = line_end + 2
+        if len(data) < start + size + 2:
+            return None
+        body.append(data[start:start + size])
+        pos = start + size + 2
+
+
+def parse_response(data, complete):
+    """
+    Parse the HTTP response in data.
+
+    Returns None if complete is False and data does not yet contain the
+    whole response. Otherwise returns the IMETHODRESPONSE element.
+
+    Exceptions:
+        pywbem.Error subclasses for errors in the response.
+    """
+    header_end = data.find(b'\r\n\r\n')
+    if header_end < 0:
+        if complete:
+            raise ConnectionError('Connection closed before the HTTP '
+                                  'response header was received')
+        return None
+    lines = data[:header_end].decode('iso-8859-1').split('\r\n')
+    status_line = lines[0].split(None, 2)
+    if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or \
+            not status_line[1].isdigit():
+        raise ParseError('Invalid HTTP status line %r' % lines[0])
+    status = int(status_line[1])
+    reason = status_line[2] if len(status_line) > 2 else ''
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    body = data[header_end + 4:]
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = decode_chunked(body)
+        if body is None:
+            if complete:
+                raise ConnectionError('Connection closed before the HTTP '
+                                      'response body was received')
+            return None
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if len(body) < length:
+            if complete:
+                raise ConnectionError('Connection closed before the HTTP '
+                                      'response body was received')
+            return None
+        body = body[:length]
+    elif not complete:
+        return None
+
+    if status == 401:
+        raise AuthError('Server returned HTTP status 401 %s' % reason)
+    if status != 200 or 'cimerror' in headers:
+        raise HTTPError(status, reason, headers.get('cimerror'))
+
+    try:
+        root = ElementTree.fromstring(body)
+    except ElementTree.ParseError as pe:
+        raise ParseError('Invalid CIM-XML response: %s' % pe)
+    response = root.find('MESSAGE/SIMPLERSP/IMETHODRESPONSE')
+    if root.tag != 'CIM' or response is None:
+        raise ParseError('Expecting CIM MESSAGE SIMPLERSP IMETHODRESPONSE '
+                         'elements in the response')
+    error = response.find('ERROR')
+    if error is not None:
+        raise CIMError(int(error.get('CODE')), error.get('DESCRIPTION'))
+    return response
+
+
+def open_enumeration_context(response):
+    """
+    Return the enumeration context of the open enumeration response if the
+    enumeration is not complete. Otherwise returns None.
+    """
+    values = {}
+    for param in response.findall('PARAMVALUE'):
+        value = param.find('VALUE')
+        if value is not None:
+            values[param.get('NAME')] = (value.text or '').strip()
+    if values.get('EndOfSequence', '').upper() == 'TRUE':
+        return None
+    return values.get('EnumerationContext') or None
+
+
+def result_type(exception):
+    """
+    Return the SimplePing result type for the exception. This is the mapping
+    used by :meth:`~smipyping.SimplePing.execute_cim_test` so that, for
+    example, an HTTP 401 (AuthError) is a PyWBEMError from both engines.
+    """
+    if isinstance(exception, CIMError):
+        return 'WBEMError'
+    if isinstance(exception, ConnectionError):
+        return 'ConnectionError'
+    if isinstance(exception, TimeoutError):
+        return 'TimeoutError'
+    if isinstance(exception, Error):
+        return 'PyWBEMError'
+    return 'GeneralError'
+
+
+def resolve_host(host):
+    """
+    Return tuple of (ip address or None, socket.error or None, time in
+    seconds of the lookup) for the host name host.
+    """
+    start = time.time()
+    try:
+        return socket.gethostbyname(host), None, time.time() - start
+    except socket.error as er:
+        return None, er, time.time() - start
+
+
+def resolve_hosts(hosts, num_threads=None):
+    """
+    Resolve the host names in hosts concurrently in a pool of threads so that
+    no name lookup blocks the event loop of :func:`cimping_async`.
+
+    Parameters:
+
+      hosts: iterable of host names or ip addresses.
+
+      num_threads (integer): Maximum number of threads. If None,
+        :data:`~smipyping.config.RESOLVE_THREADS` is used.
+
+    Returns:
+      Dictionary of the tuples of :func:`resolve_host` keyed by host.
+    """
+    hosts = set(hosts)
+    if not hosts:
+        return {}
+    num_threads = min(num_threads or RESOLVE_THREADS, len(hosts))
+    return dict(threaded_pipeline(hosts, resolve_host, num_threads))
+
+
+class CIMPingConnection(object):
+    """
+    State of the test of one server. Each call to :meth:`advance` executes
+    the non-blocking socket operations of the current state until one would
+    block or the test completes.
+    """
+    def __init__(self, request, timeout, ping_timeout, ssl_context):
+        self.request = request
+        self.ssl_context = ssl_context
+        self.state = CONNECTING
+        self.sock = None
+        # Result of resolve_host for the host of the request
+        self.address = None
+        # Socket replaced by reconnect that the event loop must unregister
+        # and close
+        self.retired_sock = None
+        self.tcp_ping = request.tcp_ping
+        # True while the CloseEnumeration of the pull strategy is in progress
+        self.closing = False
+        self.start = time.time()
+        self.deadline = self.start + timeout
+        # For tcp ping requests the connect must complete within the ping
+        # timeout
+        if request.tcp_ping:
+            self.ping_deadline = min(self.deadline,
+                                     self.start + ping_timeout)
+        else:
+            self.ping_deadline = self.deadline
+        self.want_read = False
+        self.out_data = build_request(request)
+        self.in_data = []
+        self.result = None
+        # Time in seconds of each phase of the test keyed by the PhaseTimings
+        # field name. The times of the CloseEnumeration of the pull strategy
+        # are added to those of the open.
+        self.phases = {}
+        # Start time of the current phase
+        self.phase_start = None
+        # Time at which the request started to be sent
+        self.send_start = None
+
+    def add_phase(self, phase, start, end=None):
+        """Add the time from start to end (default now) to phase."""
+        seconds = (end or time.time()) - start
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    def fileno(self):
+        """Return the file descriptor of the socket."""
+        return self.sock.fileno()
+
+    def next_deadline(self):
+        """Return the time at which the current state times out."""
+        return self.ping_deadline if self.state == CONNECTING else \
+            self.deadline
+
+    def connect(self, address):
+        """
+        Start the connect to address, the tuple of :func:`resolve_host` for
+        the host of the request. Returns True if the connect is in progress.
+        Otherwise the result is set.
+
+        Exceptions:
+            socket.error if the socket cannot be created.
+        """
+        self.address = address
+        ip_address, error, dns_time = address
+        self.phases['dns'] = dns_time
+        if ip_address is None:
+            self.connect_failed(errno.EHOSTUNREACH, error)
+            return False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(0)
+        self.phase_start = time.time()
+        try:
+            result = self.sock.connect_ex((ip_address, self.request.port))
+        except socket.error as er:
+            result = er.errno or errno.EHOSTUNREACH
+        if result in CONNECT_PENDING_ERRNOS:
+            return True
+        if result == 0:
+            self.connected()
+            return self.result is None
+        self.connect_failed(result)
+        return False
+
+    def connect_failed(self, err, exception=None):
+        """Set the result for the connect that failed with errno err."""
+        if self.tcp_ping:
+            reachable = err == errno.ECONNREFUSED
+            get_reachability_cache().put(
+                ('tcp', self.request.host, self.request.port), reachable,
+                time.time() - self.start if reachable else None)
+            if not reachable:
+                self.result = ('PingFail', None)
+                return
+        self.result = ('ConnectionError', ConnectionError(
+            'Socket error: %s' % (exception or os.strerror(err))))
+
+    def connected(self):
+        """Continue after the connect succeeded."""
+        now = time.time()
+        self.add_phase('connect', self.phase_start, now)
+        if self.tcp_ping:
+            self.add_phase('ping', self.phase_start, now)
+            get_reachability_cache().put(
+                ('tcp', self.request.host, self.request.port), True,
+                now - self.start)
+        self.phase_start = now
+        if self.request.scheme == 'https':
+            self.sock = self.ssl_context.wrap_socket(
+                self.sock, do_handshake_on_connect=False)
+            self.state = HANDSHAKING
+        else:
+            self.state = SENDING
+            self.send_start = now
+        self.advance()
+
+    def timed_out(self):
+        """Set the result for the timeout of the current state."""
+        if self.state == CONNECTING and self.tcp_ping:
+            self.connect_failed(errno.ETIMEDOUT)
+        else:
+            self.result = ('TimeoutError', TimeoutError(
+                'Server did not respond within %.1f s while %s' %
+                (self.deadline - self.start, self.state)))
+
+    def advance(self):
+        """
+        Execute the operations of the current state until one would block or
+        the result is known.
+        """
+        try:
+            if self.state == CONNECTING:
+                err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err in CONNECT_PENDING_ERRNOS:
+                    return
+                if err:
+                    self.connect_failed(err)
+                else:
+                    self.connected()
+                return
+            if self.state == HANDSHAKING:
+                self.sock.do_handshake()
+                self.state = SENDING
+                self.send_start = time.time()
+                self.add_phase('tls', self.phase_start, self.send_start)
+            if self.state == SENDING:
+                while self.out_data:
+                    sent = self.sock.send(self.out_data)
+                    self.out_data = self.out_data[sent:]
+                self.state = RECEIVING
+                self.phase_start = time.time()
+            while True:
+                data = self.sock.recv(RECV_SIZE)
+                if data:
+                    self.in_data.append(data)
+                parse_start = time.time()
+                response = parse_response(b''.join(self.in_data),
+                                          complete=not data)
+                if response is not None:
+                    now = time.time()
+                    self.add_phase('response', self.phase_start, parse_start)
+                    self.add_phase('parse', parse_start, now)
+                    self.add_phase('operation', self.send_start, now)
+                    self.response_received(response)
+                    return
+        except ssl.SSLError as er:
+            if er.args and er.args[0] == ssl.SSL_ERROR_WANT_READ:
+                self.want_read = True
+            elif er.args and er.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+                self.want_read = False
+            else:
+                self.result = ('ConnectionError',
+                               ConnectionError('SSL error: %s' % er))
+        except socket.error as er:
+            if er.errno in WOULD_BLOCK_ERRNOS:
+                self.want_read = self.state == RECEIVING
+            else:
+                self.result = ('ConnectionError',
+                               ConnectionError('Socket error: %s' % er))
+        except (CIMError, AuthError, HTTPError, ParseError,
+                ConnectionError) as ex:
+            self.result = (result_type(ex), ex)
+
+    def response_received(self, response):
+        """
+        Set the result for the response or, if the pull strategy left the
+        enumeration open, start its CloseEnumeration.
+        """
+        if self.request.strategy == 'pull' and not self.closing:
+            context = open_enumeration_context(response)
+            if context is not None:
+                self.closing = True
+                self.reconnect(build_close_request(self.request, context))
+                return
+        self.result = ('OK', None)
+
+    def reconnect(self, out_data):
+        """
+        Send out_data on a new connection to the server since the server
+        closes the connection after each response. The current socket is
+        kept in retired_sock for the event loop.
+        """
+        self.retired_sock = self.sock
+        self.sock = None
+        self.state = CONNECTING
+        self.tcp_ping = False
+        self.ping_deadline = self.deadline
+        self.want_read = False
+        self.out_data = out_data
+        self.in_data = []
+        self.connect(self.address)
+
+    def close_retired(self):
+        """Close the socket replaced by reconnect."""
+        if self.retired_sock is not None:
+            self.retired_sock.close()
+            self.retired_sock = None
+
+    def close(self):
+        """Close the sockets."""
+        self.close_retired()
+        if self.sock is not None:
+            self.sock.close()
+
+
+def cimping_async(requests, timeout=None, ping_timeout=None,
+                  max_sockets=None, throttle=None, logger=None):
+    """
+    Execute the cimping test of the servers defined by requests
+    concurrently from this thread.
+
+    The host names of all of the requests are first resolved in a pool of
+    threads (see :func:`resolve_hosts`) so that a slow name lookup does not
+    block the event loop. Up to max_sockets tests are then in progress at any
+    time.
+
+    Parameters:
+
+      requests: iterable of :class:`CIMPingRequest`. It is consumed before
+        the first test starts.
+
+      timeout (int or float): Time in seconds allowed for each test. If None,
+        :data:`~smipyping.config.SIMPLEPING_OPERATION_DEFAULT_TIMEOUT`.
+
+      ping_timeout (int or float): Time in seconds allowed for the connect
+        of the requests with tcp_ping True. If None,
+        :data:`~smipyping.config.PING_TIMEOUT`.
+
+      max_sockets (int): Maximum number of tests in progress. If None,
+        :data:`~smipyping.config.MAX_ASYNC_SOCKETS` is used.
+
+      throttle (:class:`~smipyping.ProbeThrottle`): If not None, each test
+        is started only when the rate limit and the concurrency limit of the
+        subnet of its host allow.
+
+      logger: Optional logger for the result of each test.
+
+    Returns:
+      Generator that yields a tuple (key, result type, exception, execution
+      time in seconds, phases) as each test completes. The result types are
+      those of :class:`~smipyping.SimplePing`. phases is a dictionary of the
+      time in seconds of the phases of the test that were executed keyed by
+      the field names of :data:`~smipyping.PhaseTimings`.
+    """
+    timeout = timeout or SIMPLEPING_OPERATION_DEFAULT_TIMEOUT
+    ping_timeout = ping_timeout or PING_TIMEOUT
+    max_sockets = max_sockets or MAX_ASYNC_SOCKETS
+    if throttle is not None and throttle.unlimited:
+        throttle = None
+    ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    ssl_context.verify_mode = ssl.CERT_NONE
+    requests = list(requests)
+    addresses = resolve_hosts(request.host for request in requests)
+    request_iter = iter(requests)
+    poller = SocketPoller()
+    # Tests in progress keyed by file descriptor
+    pending = {}
+    # heap of (deadline, sequence number, connection). Entries whose
+    # connection has completed or moved to a later deadline are discarded
+    # when they reach the top.
+    deadlines = []
+    sequence = itertools.count()
+    retry_request = None
+    exhausted = False
+
+    def finish(conn):
+        """Release the resources of conn and return its result tuple."""
+        conn.close()
+        if throttle is not None:
+            throttle.release_subnet(conn.request.host)
+        result_type_, exception = conn.result
+        execution_time = time.time() - conn.start
+        if logger is not None:
+            logger.info('Test url=%s://%s:%s result=%s, exception=%s, '
+                        'time=%.2fs', conn.request.scheme, conn.request.host,
+                        conn.request.port, result_type_, exception,
+                        execution_time)
+        return (conn.request.key, result_type_, exception, execution_time,
+                dict(conn.phases))
+
+    def track(conn):
+        """Add the deadline of the current state of conn to the heap."""
+        heapq.heappush(deadlines, (conn.next_deadline(), next(sequence),
+                                   conn))
+
+    try:
+        while True:
+            completed = []
+            # Time until the throttle allows the next test to start
+            throttle_wait = 0
+
+            while not exhausted and len(pending) < max_sockets:
+                if retry_request is not None:
+                    request, retry_request = retry_request, None
+                else:
+                    try:
+                        request = next(request_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                if request.tcp_ping:
+                    cached = get_reachability_cache().get(
+                        ('tcp', request.host, request.port))
+                    if cached is not None and not cached[0]:
+                        completed.append((request.key, 'PingFail', None, 0,
+                                          {}))
+                        continue
+
+                if throttle is not None:
+                    throttle_wait = throttle.try_probe(request.host)
+                    if throttle_wait:
+                        retry_request = request
+                        break
+                conn = CIMPingConnection(request, timeout, ping_timeout,
+                                         ssl_context)
+                try:
+                    in_progress = conn.connect(addresses[request.host])
+                except socket.error as er:
+                    if throttle is not None:
+                        throttle.release_subnet(request.host)
+                    if er.errno not in NO_FD_ERRNOS or not pending:
+                        raise
+                    # Hold this request until some sockets have been closed
+                    max_sockets = len(pending)
+                    retry_request = request
+                    break
+                if in_progress:
+                    pending[conn.fileno()] = conn
+                    poller.register(conn.fileno(), conn.want_read)
+                    track(conn)
+                else:
+                    completed.append(finish(conn))
+
+            if pending:
+                if completed:
+                    wait_time = 0
+                else:
+                    wait_time = max(0, deadlines[0][0] - time.time())
+                if throttle_wait:
+                    wait_time = min(wait_time, throttle_wait)
+
+                for fd in poller.poll(wait_time):
+                    conn = pending[fd]
+                    state = conn.state
+                    conn.advance()
+                    if conn.result is not None:
+                        del pending[fd]
+                        poller.unregister(fd)
+                        completed.append(finish(conn))
+                        continue
+                    if conn.retired_sock is not None:
+                        # The request continues on a new connection
+                        del pending[fd]
+                        poller.unregister(fd)
+                        conn.close_retired()
+                        pending[conn.fileno()] = conn
+                        poller.register(conn.fileno(), conn.want_read)
+                    else:
+                        poller.modify(fd, conn.want_read)
+                    if state == CONNECTING and conn.state != CONNECTING:
+                        track(conn)
+
+                # Expire the tests that have exceeded their deadline
+                now = time.time()
+                while deadlines:
+                    deadline, _, conn = deadlines[0]
+                    stale = conn.result is not None or \
+                        deadline != conn.next_deadline()
+                    if not stale and deadline > now:
+                        break
+                    heapq.heappop(deadlines)
+                    if stale:
+                        continue
+                    fd = conn.fileno()
+                    del pending[fd]
+                    poller.unregister(fd)
+                    conn.timed_out()
+                    completed.append(finish(conn))
+
+            elif throttle_wait and not completed:
+                time.sleep(throttle_wait)
+
+            for result in completed:
+                yield result
+
+            if exhausted and not pending and retry_request is None:
+                return
+
+    finally:
+        for conn in six.itervalues(pending):
+            conn.close()
+            if throttle is not None:
+                throttle.release_subnet(conn.request.host)
+        poller.close()
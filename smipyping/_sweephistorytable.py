@@ -0,0 +1,363 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Define the sweep history tables that record each server sweep and the open
+hosts it found so that sweeps can be compared.
+
+The SweepRuns table contains one record for each sweep:
+    SweepID = Column(Integer, primary_key=True)
+    Timestamp = Column(DateTime, nullable=False)
+    NetDefs = Column(String)  net definitions separated by spaces
+    Ports = Column(String)  ports separated by commas
+    MinOctetVal = Column(Integer)
+    MaxOctetVal = Column(Integer)
+    ScanType = Column(String)
+    TotalPings = Column(Integer)
+
+The SweepHosts table contains one record for each open host of a sweep:
+    SweepID = Column(Integer)
+    IPAddress = Column(String)
+    Port = Column(Integer)
+"""
+
+from __future__ import print_function, absolute_import
+
+import os
+import csv
+
+from mysql.connector import Error as mysqlerror
+from ._dbtablebase import DBTableBase
+from ._mysqldbmixin import MySQLDBMixin
+from ._ipranges import IPRanges
+from ._logging import AUDIT_LOGGER_NAME, get_logger
+
+__all__ = ['SweepHistoryTable', 'changed_subnets']
+
+# Default file names for the csv sweep history tables
+DEFAULT_SWEEPS_FILENAME = 'sweeps.csv'
+DEFAULT_SWEEP_HOSTS_FILENAME = 'sweephosts.csv'
+
+
+def changed_subnets(endpoints):
+    """
+    Return the sorted list of the /24 subnets (ex. '10.1.132') of the
+    (ip address, port) tuples in endpoints. These are net definitions
+    for a sweep that re-probes only the changed subnets.
+    """
+    subnets = set(ip.rsplit('.', 1)[0] for ip, _ in endpoints)
+    return sorted(subnets, key=lambda subnet: [int(octet) for octet in
+                                               subnet.split('.')])
+
+
+class SweepHistoryTable(DBTableBase):
+    """
+    Abstract class for the sweep history. The data_dict contains the
+    SweepRuns records keyed by SweepID. The open hosts of each sweep are
+    returned by :meth:`get_open_hosts`.
+    """
+    key_field = 'SweepID'
+    fields = [key_field, 'Timestamp', 'NetDefs', 'Ports', 'MinOctetVal',
+              'MaxOctetVal', 'ScanType', 'TotalPings']
+    table_name = 'SweepRuns'
+    hosts_fields = ['SweepID', 'IPAddress', 'Port']
+    hosts_table_name = 'SweepHosts'
+
+    @classmethod
+    def factory(cls, db_dict, db_type, verbose):
+        """Factory method to select subclass based on database type.
+           Currently the types sql and csv are supported.
+
+           Returns instance object of the defined type.
+
+           Exceptions:
+               ValueError if db_type is not supported.
+        """
+        if verbose:
+            print('sweep history factory datafile %s dbtype %s verbose %s'
+                  % (db_dict, db_type, verbose))
+        if db_type == 'csv':
+            inst = CsvSweepHistoryTable(db_dict, db_type, verbose)
+        elif db_type == 'mysql':
+            inst = MySQLSweepHistoryTable(db_dict, db_type, verbose)
+        else:
+            raise ValueError('Invalid sweep history table factory db_type %s'
+                             % db_type)
+        return inst
+
+    @staticmethod
+    def sweep_record(timestamp, sweep_def, scan_type, total_pings):
+        """
+        Return the SweepRuns record (without SweepID) for a sweep defined by
+        the dictionary sweep_def from ServerSweep.sweep_definition().
+        """
+        return {'Timestamp': timestamp,
+                'NetDefs': ' '.join(sweep_def['net_defs']),
+                'Ports': ','.join(str(port) for port in sweep_def['ports']),
+                'MinOctetVal': sweep_def['min_octet_val'],
+                'MaxOctetVal': sweep_def['max_octet_val'],
+                'ScanType': scan_type,
+                'TotalPings': total_pings}
+
+    def append(self, timestamp, sweep_def, scan_type, total_pings,
+               open_hosts):
+        """
+        Record a sweep and the open hosts it found.
+
+        Parameters:
+
+          timestamp (:class:`py:datetime.datetime`): Time of the sweep.
+
+          sweep_def (dict): Definition of the sweep from
+            ServerSweep.sweep_definition().
+
+          scan_type (:term:`string`): Scan type of the sweep.
+
+          total_pings (integer): Number of probes of the sweep.
+
+          open_hosts: list of tuples (ip address, port) found open.
+
+        Returns:
+          The SweepID of the new record.
+        """
+        raise NotImplementedError
+
+    def get_open_hosts(self, sweep_id):
+        """
+        Return the set of (ip address, integer port) tuples found open by
+        the sweep sweep_id.
+        """
+        raise NotImplementedError
+
+    def sweep_ids(self):
+        """Return the list of SweepIDs from oldest to newest."""
+        return sorted(self.data_dict)
+
+    def scope(self, sweep_id):
+        """
+        Return tuple of (IPRanges, set of ports) that were probed by the
+        sweep sweep_id.
+        """
+        record = self.data_dict[sweep_id]
+        ranges = IPRanges(record['NetDefs'].split(),
+                          int(record['MinOctetVal']),
+                          int(record['MaxOctetVal']))
+        ports = set(int(port) for port in record['Ports'].split(','))
+        return ranges, ports
+
+    def previous_open_hosts(self, sweep_id):
+        """
+        Return the set of (ip address, port) tuples that were open within the
+        scope of sweep sweep_id before it executed. Each endpoint is taken
+        from the newest earlier sweep whose scope included it so that the
+        earlier state of a narrow sweep is known even if it was last probed
+        by several different sweeps.
+        """
+        ranges, ports = self.scope(sweep_id)
+        newer_scopes = []
+        result = set()
+        for old_id in reversed([id_ for id_ in self.sweep_ids()
+                                if id_ < sweep_id]):
+            for ip, port in self.get_open_hosts(old_id):
+                if port not in ports or ip not in ranges:
+                    continue
+                if any(port in newer_ports and ip in newer_ranges
+                       for newer_ranges, newer_ports in newer_scopes):
+                    continue
+                result.add((ip, port))
+            newer_scopes.append(self.scope(old_id))
+        return result
+
+    def diff(self, sweep_id, from_id=None):
+        """
+        Compare the open hosts of sweep sweep_id with those of the sweep
+        from_id or, if from_id is None, with the open hosts known from all of
+        the earlier sweeps (see :meth:`previous_open_hosts`).
+
+        Only endpoints within the scope of sweep_id are compared so that a
+        narrow sweep does not report the hosts outside of its ranges as
+        vanished.
+
+        Returns:
+          tuple of (appeared, vanished) where each is a sorted list of
+          (ip address, port) tuples.
+
+        Exceptions:
+            KeyError if sweep_id or from_id is not in the table.
+        """
+        new_hosts = self.get_open_hosts(sweep_id)
+        if from_id is None:
+            old_hosts = self.previous_open_hosts(sweep_id)
+        else:
+            if from_id not in self.data_dict:
+                raise KeyError(from_id)
+            ranges, ports = self.scope(sweep_id)
+            old_hosts = set(host for host in self.get_open_hosts(from_id)
+                            if host[1] in ports and host[0] in ranges)
+
+        def sort_key(host):
+            """Sort by numeric ip address and port."""
+            return [int(octet) for octet in host[0].split('.')], host[1]
+
+        return (sorted(new_hosts - old_hosts, key=sort_key),
+                sorted(old_hosts - new_hosts, key=sort_key))
+
+
+class CsvSweepHistoryTable(SweepHistoryTable):
+    """
+        Sweep history functions for csv files. The SweepRuns and SweepHosts
+        tables are kept in the files defined by the sweepsfilename and
+        sweephostsfilename entries of the db_dict. The files are created
+        when the first sweep is appended.
+    """
+    def __init__(self, db_dict, dbtype, verbose):
+        super(CsvSweepHistoryTable, self).__init__(db_dict, dbtype, verbose)
+        self.filename = self.find_file(
+            db_dict.get('sweepsfilename', DEFAULT_SWEEPS_FILENAME))
+        self.hosts_filename = self.find_file(
+            db_dict.get('sweephostsfilename', DEFAULT_SWEEP_HOSTS_FILENAME))
+
+        # set of (ip, port) keyed by SweepID
+        self._open_hosts = {}
+
+        if os.path.isfile(self.filename):
+            with open(self.filename) as input_file:
+                for row in csv.DictReader(input_file):
+                    key = int(row['SweepID'])
+                    if key in self.data_dict:
+                        print('ERROR. Duplicate Id in table: %s\nrow=%s' %
+                              (key, row))
+                        raise ValueError('Input Error. duplicate Id')
+                    row['SweepID'] = key
+                    self.data_dict[key] = row
+        if os.path.isfile(self.hosts_filename):
+            with open(self.hosts_filename) as input_file:
+                for row in csv.DictReader(input_file):
+                    self._open_hosts.setdefault(int(row['SweepID']), set()) \
+                        .add((row['IPAddress'], int(row['Port'])))
+
+    def find_file(self, fn):
+        """
+        Return the path of the csv file fn. If fn is not an absolute path
+        it is found in the local directory or the directory defined by the
+        db_dict entry directory. A file that does not exist in either is
+        created in the local directory.
+        """
+        if os.path.isabs(fn) or os.path.isfile(fn):
+            return fn
+        full_fn = os.path.join(self.db_dict.get('directory', ''), fn)
+        if os.path.isfile(full_fn):
+            return full_fn
+        return fn
+
+    @staticmethod
+    def append_rows(filename, fields, rows):
+        """Append rows to filename writing the header if the file is new."""
+        new_file = not os.path.isfile(filename)
+        with open(filename, 'a') as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=fields)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def append(self, timestamp, sweep_def, scan_type, total_pings,
+               open_hosts):
+        """Write the records for a sweep into the csv files."""
+        sweep_id = max(self.data_dict) + 1 if self.data_dict else 1
+        record = self.sweep_record(timestamp, sweep_def, scan_type,
+                                   total_pings)
+        record['SweepID'] = sweep_id
+        hosts = set((ip, int(port)) for ip, port in open_hosts)
+
+        self.append_rows(self.hosts_filename, self.hosts_fields,
+                         [{'SweepID': sweep_id, 'IPAddress': ip,
+                           'Port': port} for ip, port in sorted(hosts)])
+        self.append_rows(self.filename, self.fields, [record])
+
+        self.data_dict[sweep_id] = record
+        self._open_hosts[sweep_id] = hosts
+        return sweep_id
+
+    def get_open_hosts(self, sweep_id):
+        """Return the set of (ip, port) found open by sweep_id."""
+        if sweep_id not in self.data_dict:
+            raise KeyError(sweep_id)
+        return set(self._open_hosts.get(sweep_id, ()))
+
+
+class MySQLSweepHistoryTable(SweepHistoryTable, MySQLDBMixin):
+    """
+    Specialization for mysql databases. The SweepRuns table is loaded
+    when the table is initialized. The open hosts are selected for each
+    sweep as they are needed.
+    """
+    def __init__(self, db_dict, dbtype, verbose):
+        """Connect to the database and load the SweepRuns table."""
+        super(MySQLSweepHistoryTable, self).__init__(db_dict, dbtype, verbose)
+        self.connection = None
+
+        self.connectdb(db_dict, verbose)
+
+        self._load_table()
+
+    def append(self, timestamp, sweep_def, scan_type, total_pings,
+               open_hosts):
+        """Insert the records for a sweep into the database."""
+        record = self.sweep_record(timestamp, sweep_def, scan_type,
+                                   total_pings)
+        fields = self.fields[1:]
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % \
+            (self.table_name, ', '.join(fields),
+             ', '.join(['%s'] * len(fields)))
+        hosts_sql = 'INSERT INTO %s (SweepID, IPAddress, Port) ' \
+            'VALUES (%%s, %%s, %%s)' % self.hosts_table_name
+        hosts = set((ip, int(port)) for ip, port in open_hosts)
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql, [record[field] for field in fields])
+            sweep_id = cursor.lastrowid
+            if hosts:
+                cursor.executemany(hosts_sql, [(sweep_id, ip, port)
+                                               for ip, port in sorted(hosts)])
+            self.connection.commit()
+            audit_logger = get_logger(AUDIT_LOGGER_NAME)
+            audit_logger.info('SweepHistoryTable INSERT SweepID %s with %s '
+                              'open hosts', sweep_id, len(hosts))
+        except mysqlerror as ex:
+            self.connection.rollback()
+            audit_logger = get_logger(AUDIT_LOGGER_NAME)
+            audit_logger.error('SweepHistoryTable INSERT failed SQL update. '
+                               'SQL=%s. data=%s. Exception %s: %s', sql,
+                               record, ex.__class__.__name__, ex)
+            raise
+        finally:
+            cursor.close()
+
+        record['SweepID'] = sweep_id
+        self.data_dict[sweep_id] = record
+        return sweep_id
+
+    def get_open_hosts(self, sweep_id):
+        """Return the set of (ip, port) found open by sweep_id."""
+        if sweep_id not in self.data_dict:
+            raise KeyError(sweep_id)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute('SELECT IPAddress, Port FROM %s WHERE SweepID = %%s'
+                           % self.hosts_table_name, (sweep_id,))
+            return set((ip, int(port)) for ip, port in cursor.fetchall())
+        finally:
+            cursor.close()
@@ -146,6 +146,8 @@ class TargetsTable(DBTableBase):
         super(TargetsTable, self).__init__(db_dict, db_type, verbose)
 
         self.output_format = output_format
+        # Index of (IPAddress, integer Port) to list of TargetIDs
+        self._host_index = {}
 
     # def __str__(self):
     #    # # TODO this and __repr__ do not really match.
@@ -212,6 +214,23 @@ class TargetsTable(DBTableBase):
         return [x for x in self.data_dict
                 if self.disabled_target_id(x)]
 
+    def _build_host_index(self):
+        """
+        Build the (IPAddress, Port) to TargetIDs index used by
+        get_targets_host from data_dict. This must be called whenever
+        data_dict is loaded or reloaded.
+        """
+        host_index = {}
+        for key in sorted(self.data_dict):
+            value = self.data_dict[key]
+            # TODO port from database is a string. Should be int internal.
+            try:
+                port = int(value['Port'])
+            except (TypeError, ValueError):
+                continue
+            host_index.setdefault((value['IPAddress'], port), []).append(key)
+        self._host_index = host_index
+
     # TODO we have multiple of these. See get dict_for_host,get_hostid_list
     def get_targets_host(self, host_data):
         """
@@ -227,15 +246,8 @@ class TargetsTable(DBTableBase):
 
         Returns list of targetdata keys
         """
-        # TODO clean up for PY 3
-        return_list = []
-        for key, value in self.data_dict.items():
-            port = value["Port"]
-            # TODO port from database is a string. Should be int internal.
-            if value["IPAddress"] == host_data[0] and int(port) == host_data[1]:
-                return_list.append(key)
-
-        return return_list
+        return list(self._host_index.get((host_data[0], int(host_data[1])),
+                                         []))
 
     def get_target(self, targetid):
         """
@@ -442,6 +454,7 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
         self.connectdb(db_dict, verbose)
         self._load_table()
         self._load_joins()
+        self._build_host_index()
 
     def _load_joins(self):
         """
@@ -520,6 +533,7 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
         finally:
             self._load_table()
             self._load_joins()
+            self._build_host_index()
             cursor.close()
 
     def activate(self, targetid, activate_flag):
@@ -562,6 +576,7 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
         finally:
             self._load_table()
             self._load_joins()
+            self._build_host_index()
 
     def delete(self, targetid):
         """
@@ -574,6 +589,8 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
             # pylint: disable=unused-variable
             mydata = cursor.execute(sql, (targetid,))  # noqa F841
             self.connection.commit()
+            # _load_table only adds and replaces records
+            self.data_dict.pop(int(targetid), None)
             audit_logger = get_logger(AUDIT_LOGGER_NAME)
             audit_logger.info('TargetTable TargetId %s Deleted', targetid)
         except mysqlerror as ex:
@@ -586,6 +603,7 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
         finally:
             self._load_table()
             self._load_joins()
+            self._build_host_index()
             self.connection.close()
 
     def insert(self, fields):
@@ -626,6 +644,7 @@ class MySQLTargetsTable(SQLTargetsTable, MySQLDBMixin):
         finally:
             self._load_table()
             self._load_joins()
+            self._build_host_index()
             self.connection.close()
 
 
@@ -676,6 +695,7 @@ class CsvTargetsTable(TargetsTable):
                     result[key] = row
 
         self.data_dict = result
+        self._build_host_index()
 
     def write_updated_record(self, record_id):
         """Backup the existing file and write the new one.
@@ -0,0 +1,151 @@
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Threaded producer/consumer pipeline used to execute the multithreaded
+operations (ex. server sweep, cimping of all targets).
+
+The work items are read from an iterable by a producer thread into a bounded
+work queue so that large sets of work (ex. the addresses of a sweep) are never
+completely in memory and the results are returned as they complete.
+"""
+
+from __future__ import print_function, absolute_import
+
+import sys
+import threading
+import six
+from six.moves import queue
+
+from .config import MAX_THREADS
+
+__all__ = ['threaded_pipeline']
+
+# Message types in the result queue
+RESULT_MSG = 'result'
+ERROR_MSG = 'error'
+DONE_MSG = 'done'
+
+# Work queue entry that tells a worker thread to exit
+END_OF_WORK = object()
+
+# Interval in seconds at which blocked threads check for a stop request
+POLL_INTERVAL = 0.1
+
+
+def threaded_pipeline(work_items, worker, num_threads=None, queue_depth=None):
+    """
+    Execute worker(item) for each item in work_items in a pool of threads.
+
+    Parameters:
+
+      work_items: iterable of the work items. It is consumed by a producer
+        thread only as fast as the workers take items from the work queue so
+        it may be a generator.
+
+      worker: function called with one work item in a worker thread.
+
+      num_threads (integer): Number of worker threads. If None,
+        :data:`~smipyping.config.MAX_THREADS` is used.
+
+      queue_depth (integer): Maximum number of work items and of results
+        waiting in the queues. If None, twice num_threads is used.
+
+    Returns:
+      Generator that yields a tuple (item, worker result) for each item as
+      the worker completes. Results are in completion order.
+
+      Closing the generator (or an exception such as KeyboardInterrupt in the
+      consumer) stops the producer and workers after the items in progress
+      and waits for the workers to exit.
+
+    Exceptions:
+      Any exception raised by worker or by work_items is raised by the
+      generator.
+    """
+    num_threads = num_threads or MAX_THREADS
+    queue_depth = queue_depth or 2 * num_threads
+    work_queue = queue.Queue(maxsize=queue_depth)
+    result_queue = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    def put(queue_, entry):
+        """Put entry to queue_. Returns False if stopped while blocked."""
+        while not stop.is_set():
+            try:
+                queue_.put(entry, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        """Producer thread function."""
+        try:
+            for item in work_items:
+                if not put(work_queue, item):
+                    return
+        except Exception:  # pylint: disable=broad-except
+            put(result_queue, (ERROR_MSG, None, sys.exc_info()))
+        for _ in six.moves.range(num_threads):
+            put(work_queue, END_OF_WORK)
+
+    def work():
+        """Worker thread function."""
+        try:
+            while not stop.is_set():
+                try:
+                    item = work_queue.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is END_OF_WORK:
+                    return
+                try:
+                    result = worker(item)
+                except Exception:  # pylint: disable=broad-except
+                    put(result_queue, (ERROR_MSG, item, sys.exc_info()))
+                    return
+                put(result_queue, (RESULT_MSG, item, result))
+        finally:
+            put(result_queue, (DONE_MSG, None, None))
+
+    threads = [threading.Thread(target=produce)]
+    threads.extend([threading.Thread(target=work)
+                    for _ in six.moves.range(num_threads)])
+    for thread in threads:
+        thread.daemon = True    # allows main program to exit.
+        thread.start()
+
+    try:
+        done_count = 0
+        while done_count < num_threads:
+            # get with timeout so that the wait can be interrupted by Ctrl-C
+            try:
+                msg, item, value = result_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if msg == DONE_MSG:
+                done_count += 1
+            elif msg == ERROR_MSG:
+                six.reraise(*value)
+            else:
+                yield item, value
+    finally:
+        # Stop the producer and the workers after the items in progress and
+        # wait for them so that no thread outlives the generator. The
+        # producer is not waited for since it may be blocked in work_items.
+        stop.set()
+        for thread in threads[1:]:
+            thread.join()
+        threads[0].join(POLL_INTERVAL)
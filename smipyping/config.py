@@ -54,6 +54,48 @@ PING_TEST_CLASS = 'CIM_ComputerSystem'
 #: Timetout in seconds for the ping command
 PING_TIMEOUT = 2
 
+#: Default CIM operation used by cimping to test that a server is alive.
+#: One of 'enuminsts' (EnumerateInstances of PING_TEST_CLASS), 'enumnames'
+#: (EnumerateInstanceNames), 'pull' (OpenEnumerateInstancePaths with
+#: MaxObjectCount 1) or 'getclass' (GetClass with LocalOnly).
+DEFAULT_PROBE_STRATEGY = 'enuminsts'
+
+#: Default way of testing the reachability of servers before the WBEM
+#: operations of cimping and explore. Either 'icmp' (ICMP echo request) or
+#: 'tcp' (TCP connect to the WBEM server port).
+DEFAULT_PING_MODE = 'icmp'
+
+#: Time in seconds that the result of a successful ping of a host is reused
+#: by later pings of the host in the same process (ex. smicli repl). 0
+#: disables the reachability cache.
+REACHABILITY_CACHE_TTL = 30
+
+#: Time in seconds that the result of a failed ping of a host is reused by
+#: later pings of the host in the same process.
+REACHABILITY_CACHE_NEGATIVE_TTL = 10
+
+#: Number of times a cimping test that fails with a TimeoutError or
+#: ConnectionError is repeated before the failure is reported. 0 (no
+#: repeats) by default so that retries are enabled explicitly, for example
+#: with retries in the [retry] section of the config file.
+CIMPING_RETRIES = 0
+
+#: Time in seconds before the first repeat of a failed cimping test. The
+#: time doubles for each further repeat.
+CIMPING_RETRY_BACKOFF = 1
+
+#: Time in seconds after which a second, hedged, request is sent if the
+#: cimping test operation has not completed. The first of the two requests
+#: to succeed is used. None disables hedged requests.
+CIMPING_HEDGE_DELAY = None
+
+#: Time in seconds after its last use at which a pooled WBEM connection is
+#: closed and removed from the connection pool. 0 disables the pool.
+CONNECTION_POOL_IDLE_TIMEOUT = 300
+
+#: Maximum number of WBEM connections kept in the connection pool.
+CONNECTION_POOL_MAX_SIZE = 500
+
 #: Timeout in seconds for the WBEM operation
 SIMPLEPING_OPERATION_DEFAULT_TIMEOUT = 20
 
@@ -66,6 +108,70 @@ DEFAULT_DBTYPE = 'mysql'
 #: Maximum number of parallel threads to use in multithreaded operations
 MAX_THREADS = 100
 
+#: Default interval in seconds between the cimping tests of each target by
+#: the smicli monitor command.
+MONITOR_INTERVAL = 300
+
+#: Fraction of the monitor interval by which the time of each test is
+#: randomly moved earlier or later so that the tests of the targets do not
+#: stay synchronized.
+MONITOR_JITTER = 0.1
+
+#: Default number of threads that execute the tests of the smicli monitor
+#: command.
+MONITOR_THREADS = 20
+
+#: Maximum number of sockets with a connect in progress at any one time in
+#: the non-blocking (tcp-async) port scan. This must remain below the open
+#: file limit of the process (see ulimit -n).
+MAX_ASYNC_SOCKETS = 1000
+
+#: Maximum number of threads that resolve the host names of the servers
+#: before the event loop cimping engine starts the tests.
+RESOLVE_THREADS = 10
+
+#: Name of the file in which the state of a server sweep is saved so that an
+#: interrupted sweep can be resumed.
+SWEEP_STATE_FILE = 'sweepstate.json'
+
+#: Interval in seconds between saves of the sweep state to the sweep state
+#: file.
+SWEEP_CHECKPOINT_INTERVAL = 30
+
+#: Maximum number of SYN probes sent without a reply at any one time in the
+#: batched SYN (syn-batch) port scan.
+MAX_SYN_PENDING = 4096
+
+#: Time in seconds to wait for the reply to each probe of a server sweep.
+SWEEP_PROBE_TIMEOUT = 2
+
+#: Number of addresses checked together by the liveness prefilter of a
+#: server sweep before their ports are probed.
+SWEEP_PREFILTER_BATCH = 1024
+
+#: Maximum number of unknown open hosts found by a server sweep that are
+#: tested with the known credentials at the same time.
+SWEEP_IDENTIFY_THREADS = 16
+
+#: Maximum time in seconds for testing all of the unknown open hosts found
+#: by a server sweep with the known credentials.
+SWEEP_IDENTIFY_DEADLINE = 120
+
+#: Timeout in seconds for the unauthenticated fingerprint of an open host
+#: found by a server sweep.
+FINGERPRINT_TIMEOUT = 5
+
+#: With adaptive timeouts, the probe timeout for a subnet is this multiple of
+#: the 99th percentile of the round trip times observed for the subnet.
+ADAPTIVE_TIMEOUT_MULTIPLIER = 4
+
+#: Minimum probe timeout in seconds with adaptive timeouts.
+ADAPTIVE_TIMEOUT_MIN = 0.25
+
+#: Maximum probe timeout in seconds with adaptive timeouts. This is also the
+#: timeout for a subnet until enough replies have been observed.
+ADAPTIVE_TIMEOUT_MAX = SWEEP_PROBE_TIMEOUT
+
 #: Default operation timeout in seconds if none is specified.
 DEFAULT_OPERATION_TIMEOUT = 10
 
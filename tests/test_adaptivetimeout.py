@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the AdaptiveTimeout class
+"""
+from __future__ import absolute_import, print_function
+
+import unittest
+
+from smipyping._adaptivetimeout import AdaptiveTimeout
+
+
+class AdaptiveTimeoutTests(unittest.TestCase):
+    """
+    Tests for the per subnet adaptive probe timeouts
+    """
+
+    def test_default_timeout(self):
+        """Subnets without enough samples use the maximum timeout"""
+        timeouts = AdaptiveTimeout(multiplier=4, min_timeout=0.1,
+                                   max_timeout=2)
+        self.assertEqual(timeouts.timeout('10.1.1.1'), 2)
+        for _ in range(AdaptiveTimeout.MIN_SAMPLES - 1):
+            timeouts.add_sample('10.1.1.1', 0.05)
+        self.assertEqual(timeouts.timeout('10.1.1.2'), 2)
+
+    def test_adapt(self):
+        """Timeout is a multiple of the p99 RTT within the floor and ceiling"""
+        timeouts = AdaptiveTimeout(multiplier=4, min_timeout=0.1,
+                                   max_timeout=2)
+        for value in range(100):
+            timeouts.add_sample('10.1.1.%s' % (value + 1), 0.05)
+        self.assertAlmostEqual(timeouts.timeout('10.1.1.200'), 0.2)
+        # other subnets are not affected
+        self.assertEqual(timeouts.timeout('10.1.2.1'), 2)
+
+        # floor
+        for _ in range(100):
+            timeouts.add_sample('10.1.3.1', 0.001)
+        self.assertEqual(timeouts.timeout('10.1.3.1'), 0.1)
+
+        # ceiling
+        for _ in range(100):
+            timeouts.add_sample('10.1.4.1', 1)
+        self.assertEqual(timeouts.timeout('10.1.4.1'), 2)
+        self.assertEqual(len(timeouts.subnet_timeouts()), 3)
+
+    def test_prefix_len(self):
+        """Subnet key for each prefix length"""
+        self.assertEqual(AdaptiveTimeout().subnet('10.1.2.3'), '10.1.2')
+        self.assertEqual(AdaptiveTimeout(prefix_len=16).subnet('10.1.2.3'),
+                         '10.1')
+        with self.assertRaises(ValueError):
+            AdaptiveTimeout(prefix_len=20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the CIM probe strategies of cimping
+"""
+
+from __future__ import print_function, absolute_import
+
+import unittest
+from mock import Mock
+
+from smipyping import probe_server, configure_probe_strategy, \
+    get_probe_strategy, SimplePing
+
+
+class ProbeServerTests(unittest.TestCase):
+    """
+    Tests of the operations executed by probe_server
+    """
+
+    def test_enuminsts(self):
+        """enuminsts enumerates the instances"""
+        conn = Mock()
+        conn.EnumerateInstances.return_value = [1, 2]
+        self.assertEqual(probe_server(conn, 'enuminsts'), 2)
+        conn.EnumerateInstances.assert_called_once_with('CIM_ComputerSystem')
+
+    def test_enumnames(self):
+        """enumnames enumerates the instance names"""
+        conn = Mock()
+        conn.EnumerateInstanceNames.return_value = [1]
+        self.assertEqual(probe_server(conn, 'enumnames'), 1)
+        self.assertFalse(conn.EnumerateInstances.called)
+
+    def test_pull(self):
+        """pull closes the enumeration only if it is not complete"""
+        conn = Mock()
+        conn.OpenEnumerateInstancePaths.return_value = Mock(
+            paths=[1], eos=False, context=('ctx', 'root/cimv2'))
+        self.assertEqual(probe_server(conn, 'pull'), 1)
+        conn.OpenEnumerateInstancePaths.assert_called_once_with(
+            'CIM_ComputerSystem', MaxObjectCount=1)
+        conn.CloseEnumeration.assert_called_once_with(('ctx', 'root/cimv2'))
+
+        conn = Mock()
+        conn.OpenEnumerateInstancePaths.return_value = Mock(
+            paths=[], eos=True, context=None)
+        self.assertEqual(probe_server(conn, 'pull'), 0)
+        self.assertFalse(conn.CloseEnumeration.called)
+
+    def test_getclass(self):
+        """getclass gets the class without qualifiers"""
+        conn = Mock()
+        self.assertEqual(probe_server(conn, 'getclass'), 1)
+        conn.GetClass.assert_called_once_with(
+            'CIM_ComputerSystem', LocalOnly=True, IncludeQualifiers=False)
+
+    def test_invalid(self):
+        """An invalid strategy is a ValueError"""
+        self.assertRaises(ValueError, probe_server, Mock(), 'bad')
+
+
+class ConfigureProbeStrategyTests(unittest.TestCase):
+    """
+    Tests of configure_probe_strategy and get_probe_strategy
+    """
+
+    def tearDown(self):
+        configure_probe_strategy()
+
+    def test_default(self):
+        """The default strategy is enuminsts"""
+        configure_probe_strategy()
+        self.assertEqual(get_probe_strategy(), 'enuminsts')
+        self.assertEqual(get_probe_strategy(5), 'enuminsts')
+
+    def test_target_strategies(self):
+        """Target strategies override the strategy of all targets"""
+        configure_probe_strategy('enumnames', ['12:getclass', '17:pull'])
+        self.assertEqual(get_probe_strategy(12), 'getclass')
+        self.assertEqual(get_probe_strategy(17), 'pull')
+        self.assertEqual(get_probe_strategy(3), 'enumnames')
+        configure_probe_strategy(target_strategies={4: 'pull'})
+        self.assertEqual(get_probe_strategy(4), 'pull')
+        self.assertEqual(get_probe_strategy(12), 'enuminsts')
+
+    def test_invalid(self):
+        """Invalid strategies are a ValueError"""
+        self.assertRaises(ValueError, configure_probe_strategy, 'bad')
+        self.assertRaises(ValueError, configure_probe_strategy, None,
+                          ['12:bad'])
+        self.assertRaises(ValueError, configure_probe_strategy, None,
+                          ['getclass'])
+
+    def test_simpleping(self):
+        """SimplePing uses the probe strategy of its parameter"""
+        simpleping = SimplePing(server='http://10.1.1.1',
+                                probe_strategy='getclass')
+        self.assertEqual(simpleping.probe_strategy, 'getclass')
+        self.assertRaises(ValueError, SimplePing, server='http://10.1.1.1',
+                          probe_strategy='bad')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Test the WBEMConnectionPool class
+"""
+from __future__ import absolute_import, print_function
+
+import unittest
+from mock import patch
+
+from smipyping._connectionpool import WBEMConnectionPool
+
+
+class WBEMConnectionPoolTests(unittest.TestCase):
+    """
+    Tests for the reuse and eviction of pooled connections
+    """
+
+    def test_invalid(self):
+        """Invalid parameters raise ValueError"""
+        self.assertRaises(ValueError, WBEMConnectionPool, idle_timeout=-1)
+        self.assertRaises(ValueError, WBEMConnectionPool, max_size=0)
+
+    def test_reuse(self):
+        """Released connections are reused for the same parameters only"""
+        pool = WBEMConnectionPool()
+        conn = pool.get('https://10.1.1.1', ('user', 'pw'), 'root/cimv2')
+        self.assertEqual(conn.url, 'https://10.1.1.1')
+        self.assertEqual(conn.default_namespace, 'root/cimv2')
+        pool.release(conn)
+        self.assertEqual(len(pool), 1)
+        for other in (pool.get('https://10.1.1.1', ('user', 'pw'),
+                               'interop'),
+                      pool.get('https://10.1.1.1', ('other', 'pw'),
+                               'root/cimv2'),
+                      pool.get('https://10.1.1.2', ('user', 'pw'),
+                               'root/cimv2')):
+            self.assertIsNot(other, conn)
+            pool.release(other)
+        self.assertEqual(len(pool), 4)
+        self.assertIs(pool.get('https://10.1.1.1', ('user', 'pw'),
+                               'root/cimv2'), conn)
+        self.assertEqual(len(pool), 3)
+
+        pool.discard(conn)
+        pool.release(pool.get('https://10.1.1.1', ('user', 'pw'),
+                              'interop'))
+        self.assertEqual(len(pool), 3)
+        self.assertIsNot(pool.get('https://10.1.1.1', ('user', 'pw'),
+                                  'root/cimv2'), conn)
+        pool.clear()
+        self.assertEqual(len(pool), 0)
+
+    def test_exclusive(self):
+        """A connection is lent to one user until it is released"""
+        pool = WBEMConnectionPool()
+        conn1 = pool.get('https://10.1.1.1')
+        conn2 = pool.get('https://10.1.1.1')
+        self.assertIsNot(conn1, conn2)
+        conn1.debug = True
+        pool.release(conn1)
+        conn3 = pool.get('https://10.1.1.1')
+        self.assertIs(conn3, conn1)
+        self.assertFalse(conn3.debug)
+        self.assertIsNot(pool.get('https://10.1.1.1'), conn1)
+
+    def test_connection(self):
+        """The context manager releases or, after an error, discards"""
+        pool = WBEMConnectionPool()
+        with pool.connection('https://10.1.1.1') as conn:
+            self.assertEqual(len(pool), 0)
+        self.assertEqual(len(pool), 1)
+        try:
+            with pool.connection('https://10.1.1.1') as conn2:
+                self.assertIs(conn2, conn)
+                raise ValueError('test')
+        except ValueError:
+            pass
+        self.assertEqual(len(pool), 0)
+        with pool.connection('https://10.1.1.1') as conn3:
+            self.assertIsNot(conn3, conn)
+
+    def test_idle_eviction(self):
+        """Connections not used within idle_timeout are removed"""
+        pool = WBEMConnectionPool(idle_timeout=60)
+        with patch('time.time', return_value=1000):
+            conn1 = pool.get('https://10.1.1.1')
+            conn2 = pool.get('https://10.1.1.2')
+            pool.release(conn1)
+            pool.release(conn2)
+        with patch('time.time', return_value=1050):
+            self.assertIs(pool.get('https://10.1.1.1'), conn1)
+            pool.release(conn1)
+        with patch('time.time', return_value=1070):
+            self.assertIs(pool.get('https://10.1.1.1'), conn1)
+            self.assertEqual(len(pool), 0)
+            self.assertIsNot(pool.get('https://10.1.1.2'), conn2)
+
+    def test_max_size(self):
+        """The least recently used connection is removed when full"""
+        pool = WBEMConnectionPool(max_size=2)
+        conn1 = pool.get('https://10.1.1.1')
+        pool.release(conn1)
+        pool.release(pool.get('https://10.1.1.2'))
+        self.assertIs(pool.get('https://10.1.1.1'), conn1)
+        pool.release(conn1)
+        pool.release(pool.get('https://10.1.1.3'))
+        self.assertEqual(len(pool), 2)
+        self.assertIs(pool.get('https://10.1.1.1'), conn1)
+
+    def test_disabled(self):
+        """With idle_timeout 0 every request gets a new connection"""
+        pool = WBEMConnectionPool(idle_timeout=0)
+        conn = pool.get('https://10.1.1.1')
+        pool.release(conn)
+        self.assertIsNot(pool.get('https://10.1.1.1'), conn)
+        self.assertEqual(len(pool), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the unauthenticated WBEM fingerprint
+"""
+from __future__ import absolute_import, print_function
+
+import ssl
+import socket
+import threading
+import unittest
+from six.moves import BaseHTTPServer
+
+from smipyping._fingerprint import fingerprint_host, cert_info, \
+    classify_response, FP_WBEM, FP_HTTP, FP_OTHER, FP_NO_RESPONSE
+
+# Self signed test certificate
+TEST_CERT = """-----BEGIN CERTIFICATE-----
+MIIB1zCCAX2gAwIBAgIUHfKt7SeXXdv1jEuYezWm9gomDPAwCgYIKoZIzj0EAwIw
+QTELMAkGA1UEBhMCVVMxFTATBgNVBAoMDEFjbWUgU3RvcmFnZTEbMBkGA1UEAwwS
+YXJyYXkxLmV4YW1wbGUuY29tMB4XDTI2MTAxNzIxMTk1M1oXDTM2MTAxNDIxMTk1
+M1owQTELMAkGA1UEBhMCVVMxFTATBgNVBAoMDEFjbWUgU3RvcmFnZTEbMBkGA1UE
+AwwSYXJyYXkxLmV4YW1wbGUuY29tMFkwEwYHKoZIzj0CAQYIKoZIzj0DAQcDQgAE
+znGtUtlydQub2sGCh+5+AQHXEh78UDXU0Tys8LCvAgeK57xSUtnT/w6rixrpHK+5
+HWHh2UC3feVMKNsWOBOHxKNTMFEwHQYDVR0OBBYEFNGbB5nwvDYbUn7EQbCozweU
+LQfOMB8GA1UdIwQYMBaAFNGbB5nwvDYbUn7EQbCozweULQfOMA8GA1UdEwEB/wQF
+MAMBAf8wCgYIKoZIzj0EAwIDSAAwRQIgJ7svWzzb+v9NvuooGj30zH90JVxFc0At
+1hrwOSo1+rMCIQCAn4zhK0FNwLhFxvfZf4m/aUSEZfSwy+kzUtuuN1VP5g==
+-----END CERTIFICATE-----
+"""
+
+
+class WBEMHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Responds to a CIM-XML request without credentials like a server"""
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Reject the request with an authentication challenge"""
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(401)
+        self.send_header('WWW-Authenticate', 'Basic realm="test"')
+        self.send_header('CIMError', 'request-not-valid')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def version_string(self):
+        """Server header value"""
+        return 'TestCIMOM/1.0'
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class WebHandler(WBEMHandler):
+    """Responds like an http server that is not a WBEM server"""
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Return not found"""
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def version_string(self):
+        """Server header value"""
+        return 'TestWeb/2.0'
+
+
+class FingerprintTests(unittest.TestCase):
+    """
+    Tests of fingerprint_host against local test servers
+    """
+
+    def start_server(self, handler):
+        """Start an http server with handler. Returns the port."""
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), handler)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server.server_address[1]
+
+    def test_wbem(self):
+        """A WBEM server is identified from the CIM-XML headers"""
+        port = self.start_server(WBEMHandler)
+        result = fingerprint_host('127.0.0.1', port, scheme='http')
+        self.assertEqual(result.classification, FP_WBEM)
+        self.assertEqual(result.http_status, 401)
+        self.assertEqual(result.server, 'TestCIMOM/1.0')
+        self.assertEqual(result.cert_sha256, None)
+
+    def test_http(self):
+        """Some other HTTP server"""
+        port = self.start_server(WebHandler)
+        result = fingerprint_host('127.0.0.1', port, scheme='http')
+        self.assertEqual(result.classification, FP_HTTP)
+        self.assertEqual(result.http_status, 404)
+        self.assertEqual(result.server, 'TestWeb/2.0')
+
+    def test_not_http(self):
+        """A service that does not respond with HTTP"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        self.addCleanup(listener.close)
+
+        def respond():
+            """Send a non HTTP greeting and close"""
+            conn = listener.accept()[0]
+            conn.sendall(b'SSH-2.0-OpenSSH_7.4\r\n')
+            conn.close()
+
+        thread = threading.Thread(target=respond)
+        thread.daemon = True
+        thread.start()
+        result = fingerprint_host('127.0.0.1', listener.getsockname()[1],
+                                  scheme='http')
+        self.assertEqual(result.classification, FP_OTHER)
+
+    def test_no_response(self):
+        """A closed port"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        result = fingerprint_host('127.0.0.1', port, scheme='http')
+        self.assertEqual(result.classification, FP_NO_RESPONSE)
+
+    def test_classify_response(self):
+        """Classification of responses to the CIM-XML request"""
+        # OpenPegasus challenge with the host name as realm and no CIM headers
+        challenge = 'Basic realm="array1.example.com"'
+        self.assertEqual(
+            classify_response(401, {'www-authenticate': challenge}, b''),
+            (FP_WBEM, challenge))
+        self.assertEqual(
+            classify_response(200, {'server': 'cimom'},
+                              b'<?xml version="1.0"?><CIM CIMVERSION="2.0">'),
+            (FP_WBEM, 'cimom'))
+        self.assertEqual(
+            classify_response(404, {'server': 'httpd'}, b'<html></html>'),
+            (FP_HTTP, 'httpd'))
+
+    def test_cert_info(self):
+        """The subject of a certificate is decoded"""
+        subject, digest = cert_info(ssl.PEM_cert_to_DER_cert(TEST_CERT))
+        self.assertEqual(subject,
+                         'C=US, O=Acme Storage, CN=array1.example.com')
+        self.assertEqual(len(digest), 64)
+        self.assertEqual(cert_info(b''), (None, None))
+        self.assertEqual(cert_info(b'\x30\x03\x02\x01\x01')[0], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
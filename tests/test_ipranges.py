@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the IPRanges class
+"""
+from __future__ import absolute_import, print_function
+
+import unittest
+
+from smipyping._ipranges import IPRanges
+
+
+class IPRangesTests(unittest.TestCase):
+    """
+    Tests for the compact ip address ranges
+    """
+
+    def test_octet_defs(self):
+        """
+        Test expansion and count of octet net definitions
+        """
+        # pylint: disable=invalid-name
+        r1 = IPRanges('10.1.1.1,3,5-6')
+        self.assertEqual(len(r1), 4)
+        self.assertEqual(list(r1),
+                         ['10.1.1.1', '10.1.1.3', '10.1.1.5', '10.1.1.6'])
+        self.assertEqual(len(r1.ranges()), 3)
+
+        r2 = IPRanges('10.1.1-2', min_octet_val=1, max_octet_val=2)
+        self.assertEqual(list(r2),
+                         ['10.1.1.1', '10.1.1.2', '10.1.2.1', '10.1.2.2'])
+
+        # A /16 is a single range without expanding it
+        r3 = IPRanges('10.1', min_octet_val=0, max_octet_val=255)
+        self.assertEqual(len(r3), 65536)
+        self.assertEqual(r3.ranges(), [('10.1.0.0', '10.1.255.255', 65536)])
+
+        r4 = IPRanges(['10.1.1.1', '10.1.2.1'])
+        self.assertEqual(list(r4), ['10.1.1.1', '10.1.2.1'])
+
+    def test_cidr(self):
+        """
+        Test CIDR net definitions
+        """
+        r1 = IPRanges('10.1.132.0/22')
+        self.assertEqual(len(r1), 1022)
+        self.assertEqual(r1[0], '10.1.132.1')
+        self.assertEqual(r1[-1], '10.1.135.254')
+
+        self.assertEqual(list(IPRanges('10.1.1.7/32')), ['10.1.1.7'])
+        self.assertEqual(list(IPRanges('10.1.1.9/31')),
+                         ['10.1.1.8', '10.1.1.9'])
+
+    def test_invalid(self):
+        """
+        Test that invalid net definitions raise ValueError
+        """
+        for net_def in ['10.1.1.256', '10.1.1.5-3', '10.1.1.1.1', '10.1.x',
+                        '10.1.0.0/33', '10.1/16']:
+            with self.assertRaises(ValueError):
+                IPRanges(net_def)
+
+    def test_slice_and_shard(self):
+        """
+        Test indexing, slicing and sharding
+        """
+        r1 = IPRanges(['10.1.1.1-10', '10.1.2.1-10'])
+        self.assertEqual(r1[12], '10.1.2.3')
+        self.assertEqual(list(r1[8:12]),
+                         ['10.1.1.9', '10.1.1.10', '10.1.2.1', '10.1.2.2'])
+
+        shards = [r1.shard(i, 3) for i in range(3)]
+        self.assertEqual([len(shard) for shard in shards], [7, 7, 6])
+        merged = []
+        for shard in shards:
+            merged.extend(shard)
+        self.assertEqual(merged, list(r1))
+
+    def test_contains(self):
+        """
+        Test membership of addresses
+        """
+        r1 = IPRanges(['10.1.1.1-10', '10.1.132.0/24'])
+        self.assertTrue('10.1.1.10' in r1)
+        self.assertTrue('10.1.132.200' in r1)
+        self.assertFalse('10.1.1.11' in r1)
+        self.assertFalse('10.1.132.255' in r1)
+
+
+if __name__ == '__main__':
+    unittest.main()
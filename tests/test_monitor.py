@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the continuous monitoring of targets
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import threading
+import unittest
+from mock import patch
+
+from smipyping import MonitorScheduler, TargetMonitor, SimplePingList
+
+
+class MonitorSchedulerTests(unittest.TestCase):
+    """
+    Tests of the schedule of the target tests
+    """
+
+    def test_first_tests_spread(self):
+        """The first tests are spread over one interval"""
+        start = time.time()
+        scheduler = MonitorScheduler(range(100), interval=10, jitter=0)
+        times = sorted(entry[0] for entry in scheduler._schedule)
+        self.assertTrue(times[0] >= start)
+        self.assertTrue(times[-1] <= start + 10.1)
+        self.assertTrue(times[-1] - times[0] > 5)
+
+    def test_next_time(self):
+        """The next test is one interval with jitter after the start"""
+        scheduler = MonitorScheduler([1, 2], interval=100, jitter=0.1,
+                                     target_intervals=['2:10'])
+        for _ in range(100):
+            next_time = scheduler.next_time(1, 1000)
+            self.assertTrue(1090 <= next_time <= 1110)
+        self.assertEqual(scheduler.interval_of(2), 10)
+        scheduler = MonitorScheduler([1], interval=100, jitter=0)
+        self.assertEqual(scheduler.next_time(1, 1000), 1100)
+
+    def test_invalid(self):
+        """Invalid parameters are a ValueError"""
+        self.assertRaises(ValueError, MonitorScheduler, [1], interval=0)
+        self.assertRaises(ValueError, MonitorScheduler, [1], jitter=2)
+        self.assertRaises(ValueError, MonitorScheduler, [1],
+                          target_intervals=['x:10'])
+        self.assertRaises(ValueError, MonitorScheduler, [1],
+                          target_intervals=['1:-5'])
+
+    def test_due_targets(self):
+        """Targets are due once until rescheduled and stop ends the wait"""
+        scheduler = MonitorScheduler([1, 2], interval=0.05, jitter=0)
+        due = scheduler.due_targets()
+        self.assertEqual(sorted([next(due), next(due)]), [1, 2])
+        self.assertEqual(len(scheduler), 0)
+        scheduler.reschedule(1, time.time())
+        self.assertEqual(next(due), 1)
+        threading.Timer(0.1, scheduler.stop).start()
+        self.assertRaises(StopIteration, next, due)
+
+
+class TargetMonitorTests(unittest.TestCase):
+    """
+    Tests of the continuous testing of targets
+    """
+
+    def test_run(self):
+        """Each target is tested repeatedly on its interval"""
+        targets = dict((target_id, {'IPAddress': '10.1.1.%s' % target_id})
+                       for target_id in (1, 2))
+        target_monitor = TargetMonitor(targets, target_ids=[1, 2],
+                                       interval=0.1, jitter=0,
+                                       target_intervals={2: 0.25},
+                                       num_threads=2)
+        result = SimplePingList.make_test_result('OK', None, 0)
+        with patch.object(SimplePingList, 'ping_target',
+                          return_value=result):
+            results = list(target_monitor.run(duration=0.6))
+        counts = dict((target_id, sum(1 for result in results
+                                      if result[0] == target_id))
+                      for target_id in (1, 2))
+        self.assertTrue(4 <= counts[1] <= 7, counts)
+        self.assertTrue(2 <= counts[2] <= 3, counts)
+        self.assertTrue(all(result[1].type == 'OK' for result in results))
+
+    def test_exception(self):
+        """An exception of a test is a PyWBEMError result"""
+        target_monitor = TargetMonitor({1: {}}, target_ids=[1])
+        with patch.object(SimplePingList, 'ping_target',
+                          side_effect=RuntimeError('boom')):
+            start, result = target_monitor.test_target(1)
+        self.assertEqual(result.type, 'PyWBEMError')
+        self.assertTrue(start <= time.time())
+
+
+if __name__ == '__main__':
+    unittest.main()
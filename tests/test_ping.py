@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the ping functions
+"""
+from __future__ import absolute_import, print_function
+
+import errno
+import socket
+import struct
+import unittest
+from mock import patch
+
+from smipyping._ping import ping_host, ping_hosts, icmp_ping, \
+    icmp_checksum, open_icmp_socket, tcp_ping, url_ping_address, \
+    configure_ping_mode, get_ping_mode
+from smipyping._reachabilitycache import configure_reachability_cache
+
+
+class PingTests(unittest.TestCase):
+    """
+    Tests for the in process ICMP ping and the subprocess fallback
+    """
+
+    def setUp(self):
+        configure_reachability_cache(ttl=0)
+
+    def tearDown(self):
+        configure_reachability_cache()
+
+    def test_checksum(self):
+        """The checksum of a packet including its checksum is 0"""
+        header = struct.pack('!BBHHH', 8, 0, 0, 0x1234, 1)
+        payload = b'smipyping'
+        checksum = icmp_checksum(header + payload)
+        packet = struct.pack('!BBHHH', 8, 0, checksum, 0x1234, 1) + payload
+        self.assertEqual(icmp_checksum(packet), 0)
+
+    def test_icmp_ping(self):
+        """Ping the local host from this process"""
+        sock = open_icmp_socket()
+        if sock is None:
+            self.skipTest('Unprivileged ICMP sockets not allowed')
+        sock.close()
+        self.assertTrue(icmp_ping('127.0.0.1', 1))
+        self.assertTrue(ping_host('127.0.0.1', 1))
+        self.assertFalse(icmp_ping('nonexistent.invalid', 1))
+
+    def test_subprocess_fallback(self):
+        """The ping command is used if ICMP sockets are not allowed"""
+        with patch('smipyping._ping.icmp_ping', return_value=None), \
+                patch('subprocess.call', return_value=0) as call:
+            self.assertTrue(ping_host('10.1.1.1', 1))
+            self.assertEqual(call.call_args[0][0][-1], '10.1.1.1')
+            self.assertTrue(call.call_args[1]['stdout'].closed)
+
+        with patch('smipyping._ping.icmp_ping', return_value=None), \
+                patch('subprocess.call', side_effect=OSError(2, 'No ping')):
+            self.assertFalse(ping_host('10.1.1.1', 1))
+
+    def test_ping_hosts(self):
+        """Ping several hosts from one socket in one timeout window"""
+        sock = open_icmp_socket()
+        if sock is None:
+            self.skipTest('Unprivileged ICMP sockets not allowed')
+        sock.close()
+        results = ping_hosts(['127.0.0.1', '127.0.0.2', 'localhost',
+                              'nonexistent.invalid'], 1)
+        self.assertEqual(sorted(host for host, result in results.items()
+                                if result[0]),
+                         ['127.0.0.1', '127.0.0.2', 'localhost'])
+        self.assertTrue(results['127.0.0.1'][1] < 1)
+        self.assertEqual(results['nonexistent.invalid'], (False, None))
+
+    def test_ping_hosts_fallback(self):
+        """ping_host is used for each host if ICMP sockets not allowed"""
+        with patch('smipyping._ping.open_icmp_socket', return_value=None), \
+                patch('smipyping._ping.ping_host',
+                      side_effect=lambda host, timeout, use_cache:
+                      host == '10.1.1.1'):
+            results = ping_hosts(['10.1.1.1', '10.1.1.2'], 1)
+        self.assertTrue(results['10.1.1.1'][0])
+        self.assertEqual(results['10.1.1.2'], (False, None))
+
+
+class TcpPingTests(unittest.TestCase):
+    """
+    Tests for the tcp ping mode
+    """
+
+    def setUp(self):
+        configure_reachability_cache(ttl=0)
+
+    def tearDown(self):
+        configure_reachability_cache()
+
+    def test_tcp_ping(self):
+        """A host is reachable if the port accepts or refuses the connect"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        try:
+            reachable, latency = tcp_ping('127.0.0.1', port, 1)
+            self.assertTrue(reachable)
+            self.assertTrue(0 <= latency < 1)
+        finally:
+            listener.close()
+
+        # the port is closed now so the connect is refused
+        self.assertTrue(tcp_ping('127.0.0.1', port, 1)[0])
+        self.assertEqual(tcp_ping('nonexistent.invalid', port, 1),
+                         (False, None))
+
+        with patch('smipyping._ping.check_port_tcp',
+                   return_value=(False, errno.EHOSTUNREACH, 'unreachable')):
+            self.assertEqual(tcp_ping('10.1.1.1', 5989, 1), (False, None))
+
+    def test_url_ping_address(self):
+        """The port is the default WBEM port of the scheme if not in url"""
+        self.assertEqual(url_ping_address('http://10.1.1.1'),
+                         ('10.1.1.1', 5988))
+        self.assertEqual(url_ping_address('https://10.1.1.1'),
+                         ('10.1.1.1', 5989))
+        self.assertEqual(url_ping_address('https://10.1.1.1:15989'),
+                         ('10.1.1.1', 15989))
+
+    def test_configure_ping_mode(self):
+        """The ping mode is set globally and by target"""
+        try:
+            configure_ping_mode('icmp', tcp_targets=[3, 4])
+            self.assertEqual(get_ping_mode(), 'icmp')
+            self.assertEqual(get_ping_mode(3), 'tcp')
+            self.assertEqual(get_ping_mode(5), 'icmp')
+
+            configure_ping_mode('tcp', icmp_targets=[5])
+            self.assertEqual(get_ping_mode(3), 'tcp')
+            self.assertEqual(get_ping_mode(5), 'icmp')
+
+            self.assertRaises(ValueError, configure_ping_mode, 'udp')
+        finally:
+            configure_ping_mode()
+        self.assertEqual(get_ping_mode(3), 'icmp')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,9 +20,14 @@ Tests for functions and classes in _pingstable.py
 from __future__ import print_function, absolute_import
 
 import os
+import datetime
 import unittest
+from mock import Mock
 
-from smipyping._pingstable import PingsTable
+import smipyping
+from smipyping import PhaseTimings
+from smipyping._pingstable import PingsTable, MySQLPingsTable, \
+    TIMING_COLUMNS
 from smipyping._configfile import read_config
 
 VERBOSE = False
@@ -90,5 +95,32 @@ class MySQLTests(TableTests):
         print('len rows %s' % len(rows))
 
 
+class AppendTests(unittest.TestCase):
+    """Tests of the record written by MySQLPingsTable.append"""
+
+    def test_append_timings(self):
+        """The phase timings and attempts of the result are written"""
+        self.assertEqual(len(TIMING_COLUMNS), len(PhaseTimings._fields))
+        tbl_inst = MySQLPingsTable.__new__(MySQLPingsTable)
+        tbl_inst.connection = Mock()
+        cursor = tbl_inst.connection.cursor.return_value
+        timestamp = datetime.datetime(2026, 10, 17, 12, 0)
+        result = smipyping.TestResult(
+            code=0, type='OK', exception=None, execution_time='0.20s',
+            timings=PhaseTimings(dns=0.001, operation=0.2), attempts=2)
+        tbl_inst.append(5, result, timestamp)
+        sql, data = cursor.execute.call_args[0]
+        self.assertIn('(TargetID, Timestamp, Status, DNSTime, PingTime,',
+                      sql)
+        self.assertIn('ServerTime, Attempts)', sql)
+        self.assertEqual(sql.count('%s'), 4 + len(TIMING_COLUMNS))
+        self.assertEqual(data[:4], (5, timestamp, 'OK', 0.001))
+        self.assertEqual(data[3 + TIMING_COLUMNS.index('OperationTime')],
+                         0.2)
+        self.assertEqual(data.count(None), len(TIMING_COLUMNS) - 2)
+        self.assertEqual(data[-1], 2)
+        tbl_inst.connection.commit.assert_called_once_with()
+
+
 if __name__ == '__main__':
     unittest.main()
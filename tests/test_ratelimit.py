@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the ProbeThrottle class and its use by the async port scan
+"""
+from __future__ import absolute_import, print_function
+
+import time
+import logging
+import threading
+import unittest
+
+from smipyping._ratelimit import ProbeThrottle, configure_probe_throttle, \
+    get_probe_throttle
+from smipyping._scanport_tcp import scan_ports_tcp_async
+
+
+class ProbeThrottleTests(unittest.TestCase):
+    """
+    Tests for the probe rate and per subnet concurrency limits
+    """
+
+    def test_unlimited(self):
+        """The default throttle does not limit or delay probes"""
+        throttle = ProbeThrottle()
+        self.assertTrue(throttle.unlimited)
+        for _ in range(100):
+            self.assertEqual(throttle.try_probe('10.1.1.1'), 0)
+
+    def test_invalid(self):
+        """Invalid parameters raise ValueError"""
+        self.assertRaises(ValueError, ProbeThrottle, rate=-1)
+        self.assertRaises(ValueError, ProbeThrottle, subnet_prefix_len=12)
+
+    def test_rate(self):
+        """Tokens are limited to burst and refilled at rate"""
+        throttle = ProbeThrottle(rate=10, burst=3)
+        for _ in range(3):
+            self.assertEqual(throttle.rate_delay(), 0)
+        delay = throttle.rate_delay()
+        self.assertTrue(0 < delay <= 0.1, delay)
+
+        start = time.time()
+        for _ in range(3):
+            throttle.wait_rate()
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_subnet_concurrency(self):
+        """Only subnet_concurrency probes per subnet are in progress"""
+        throttle = ProbeThrottle(subnet_concurrency=2)
+        self.assertTrue(throttle.try_acquire_subnet('10.1.1.1'))
+        self.assertTrue(throttle.try_acquire_subnet('10.1.1.2'))
+        self.assertFalse(throttle.try_acquire_subnet('10.1.1.3'))
+        # other subnets are not affected
+        self.assertTrue(throttle.try_acquire_subnet('10.1.2.1'))
+        throttle.release_subnet('10.1.1.1')
+        self.assertTrue(throttle.try_acquire_subnet('10.1.1.3'))
+
+    def test_try_probe(self):
+        """try_probe takes nothing when it returns a delay"""
+        throttle = ProbeThrottle(rate=1, burst=1, subnet_concurrency=1)
+        self.assertEqual(throttle.try_probe('10.1.1.1'), 0)
+        # subnet full
+        self.assertTrue(throttle.try_probe('10.1.1.2') > 0)
+        # no token; the subnet slot is not held
+        self.assertTrue(throttle.try_probe('10.1.2.1') > 0)
+        throttle.release_subnet('10.1.1.1')
+        self.assertTrue(throttle.try_acquire_subnet('10.1.2.1'))
+
+    def test_blocking_probe(self):
+        """Threads using probe() never exceed the subnet concurrency"""
+        throttle = ProbeThrottle(subnet_concurrency=2)
+        lock = threading.Lock()
+        counts = {'active': 0, 'max': 0}
+
+        def probe(index):
+            """Hold a probe slot for a short time"""
+            with throttle.probe('10.1.1.%s' % index):
+                with lock:
+                    counts['active'] += 1
+                    counts['max'] = max(counts['max'], counts['active'])
+                time.sleep(0.02)
+                with lock:
+                    counts['active'] -= 1
+
+        threads = [threading.Thread(target=probe, args=(index,))
+                   for index in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counts['max'], 2)
+
+    def test_config(self):
+        """The rate is divided between the worker processes"""
+        throttle = ProbeThrottle(rate=100, burst=40, subnet_concurrency=8)
+        self.assertEqual(throttle.config(4),
+                         {'rate': 25, 'burst': 10, 'subnet_concurrency': 8,
+                          'subnet_prefix_len': 24})
+
+    def test_config_low_rate(self):
+        """A rate lower than the number of worker processes is not lost"""
+        config = ProbeThrottle(rate=5).config(workers=8)
+        self.assertEqual(config['rate'], 0.625)
+        self.assertFalse(ProbeThrottle(**config).unlimited)
+
+    def test_configure(self):
+        """configure_probe_throttle replaces the shared throttle"""
+        try:
+            throttle = configure_probe_throttle(rate=5)
+            self.assertIs(get_probe_throttle(), throttle)
+            self.assertEqual(throttle.rate, 5)
+        finally:
+            configure_probe_throttle()
+        self.assertTrue(get_probe_throttle().unlimited)
+
+    def test_throttled_async_scan(self):
+        """The async scan completes every address at the limited rate"""
+        throttle = ProbeThrottle(rate=20, burst=1, subnet_concurrency=1)
+        addresses = [('127.0.0.1', port) for port in range(1, 11)]
+        start = time.time()
+        results = list(scan_ports_tcp_async(addresses, False,
+                                            logging.getLogger(), timeout=1,
+                                            throttle=throttle))
+        self.assertGreaterEqual(time.time() - start, 0.4)
+        self.assertEqual(sorted(result[0] for result in results), addresses)
+        # every subnet slot was released
+        self.assertTrue(throttle.try_acquire_subnet('127.0.0.1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Test the ReachabilityCache class and its use by the ping functions
+"""
+from __future__ import absolute_import, print_function
+
+import unittest
+from mock import patch
+
+from smipyping._reachabilitycache import ReachabilityCache, \
+    configure_reachability_cache, get_reachability_cache
+from smipyping._ping import ping_host, ping_hosts, tcp_ping
+
+
+class ReachabilityCacheTests(unittest.TestCase):
+    """
+    Tests for the ttl and negative caching of ping results
+    """
+
+    def test_invalid(self):
+        """Invalid parameters raise ValueError"""
+        self.assertRaises(ValueError, ReachabilityCache, ttl=-1)
+        self.assertRaises(ValueError, ReachabilityCache, negative_ttl=-1)
+
+    def test_ttl(self):
+        """Results expire after ttl or negative_ttl"""
+        cache = ReachabilityCache(ttl=30, negative_ttl=10)
+        with patch('time.time', return_value=1000):
+            cache.put(('icmp', '10.1.1.1'), True, 0.01)
+            cache.put(('icmp', '10.1.1.2'), False)
+        with patch('time.time', return_value=1005):
+            self.assertEqual(cache.get(('icmp', '10.1.1.1')), (True, 0.01))
+            self.assertEqual(cache.get(('icmp', '10.1.1.2')), (False, None))
+            self.assertIsNone(cache.get(('tcp', '10.1.1.1', 5989)))
+        with patch('time.time', return_value=1015):
+            self.assertEqual(cache.get(('icmp', '10.1.1.1')), (True, 0.01))
+            self.assertIsNone(cache.get(('icmp', '10.1.1.2')))
+        with patch('time.time', return_value=1031):
+            self.assertIsNone(cache.get(('icmp', '10.1.1.1')))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        """Nothing is cached with ttl 0 and no failures with negative_ttl 0"""
+        cache = ReachabilityCache(ttl=0)
+        self.assertFalse(cache.enabled)
+        cache.put(('icmp', '10.1.1.1'), True)
+        self.assertIsNone(cache.get(('icmp', '10.1.1.1')))
+
+        cache = ReachabilityCache(ttl=30, negative_ttl=0)
+        cache.put(('icmp', '10.1.1.1'), False)
+        self.assertIsNone(cache.get(('icmp', '10.1.1.1')))
+
+    def test_invalidate(self):
+        """Invalidate removes all of the results of a host"""
+        cache = ReachabilityCache()
+        cache.put(('icmp', '10.1.1.1'), True)
+        cache.put(('tcp', '10.1.1.1', 5989), True, 0.01)
+        cache.put(('icmp', '10.1.1.2'), True)
+        cache.invalidate('10.1.1.1')
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class CachedPingTests(unittest.TestCase):
+    """
+    Tests that the ping functions reuse the cached results
+    """
+
+    def setUp(self):
+        configure_reachability_cache(ttl=30, negative_ttl=10)
+
+    def tearDown(self):
+        configure_reachability_cache()
+
+    def test_ping_host(self):
+        """ping_host pings a host once until its result expires"""
+        with patch('smipyping._ping._ping_host',
+                   side_effect=[True, False]) as ping:
+            self.assertTrue(ping_host('10.1.1.1', 1))
+            self.assertTrue(ping_host('10.1.1.1', 1))
+            self.assertEqual(ping.call_count, 1)
+            get_reachability_cache().clear()
+            self.assertFalse(ping_host('10.1.1.1', 1))
+            self.assertFalse(ping_host('10.1.1.1', 1))
+            self.assertEqual(ping.call_count, 2)
+
+        with patch('smipyping._ping._ping_host', return_value=True) as ping:
+            self.assertTrue(ping_host('10.1.1.1', 1, use_cache=False))
+            self.assertEqual(ping.call_count, 1)
+
+    def test_ping_hosts(self):
+        """ping_hosts pings only the hosts without a cached result"""
+        get_reachability_cache().put(('icmp', '10.1.1.1'), True, 0.01)
+        with patch('smipyping._ping._ping_hosts',
+                   return_value={'10.1.1.2': (False, None)}) as ping:
+            results = ping_hosts(['10.1.1.1', '10.1.1.2'], 1)
+            self.assertEqual(ping.call_args[0][0], ['10.1.1.2'])
+        self.assertEqual(results, {'10.1.1.1': (True, 0.01),
+                                   '10.1.1.2': (False, None)})
+        self.assertFalse(ping_host('10.1.1.2', 1))
+
+    def test_tcp_ping(self):
+        """tcp_ping results are cached by host and port"""
+        with patch('smipyping._ping.check_port_tcp',
+                   return_value=(True, 0, None)) as check:
+            self.assertTrue(tcp_ping('127.0.0.1', 5989, 1)[0])
+            self.assertTrue(tcp_ping('127.0.0.1', 5989, 1)[0])
+            self.assertEqual(check.call_count, 1)
+            tcp_ping('127.0.0.1', 5988, 1)
+            self.assertEqual(check.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
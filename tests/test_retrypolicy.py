@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the retry policy of the cimping tests
+"""
+
+from __future__ import print_function, absolute_import
+
+import time
+import socket
+import unittest
+from mock import patch
+
+from pywbem import ConnectionError, TimeoutError, WBEMConnection
+
+from smipyping import RetryPolicy, configure_retry_policy, \
+    get_retry_policy, SimplePing, SimplePingList
+from smipyping._reachabilitycache import configure_reachability_cache
+from smipyping._connectionpool import get_connection_pool
+
+
+def fake_test(outcomes, conns=None):
+    """
+    Return a fake execute_cim_test that returns the next of outcomes, tuples
+    of (seconds to wait, result type), for each call. The connection of each
+    call is appended to conns.
+    """
+    outcomes = list(outcomes)
+
+    def execute_cim_test(self, conn):  # pylint: disable=unused-argument
+        if conns is not None:
+            conns.append(conn)
+        delay, result = outcomes.pop(0)
+        time.sleep(delay)
+        if result == 'TimeoutError':
+            return result, TimeoutError('timed out')
+        if result == 'ConnectionError':
+            return result, ConnectionError('refused')
+        return result, None
+    return execute_cim_test
+
+
+class RetryPolicyTests(unittest.TestCase):
+    """
+    Tests of RetryPolicy and the retry policy of the process
+    """
+
+    def tearDown(self):
+        configure_retry_policy()
+
+    def test_backoff(self):
+        """The backoff doubles for each repeat"""
+        policy = RetryPolicy(retries=3, backoff=0.5)
+        self.assertEqual([policy.backoff_delay(retry) for retry in (1, 2, 3)],
+                         [0.5, 1, 2])
+        self.assertTrue(policy.retryable('TimeoutError'))
+        self.assertTrue(policy.retryable('ConnectionError'))
+        self.assertFalse(policy.retryable('WBEMError'))
+        self.assertFalse(policy.retryable('PingFail'))
+
+    def test_invalid(self):
+        """Negative parameters are a ValueError"""
+        self.assertRaises(ValueError, RetryPolicy, retries=-1)
+        self.assertRaises(ValueError, RetryPolicy, backoff=-1)
+        self.assertRaises(ValueError, RetryPolicy, hedge_delay=-1)
+
+    def test_configure(self):
+        """SimplePing uses the policy of the process by default"""
+        policy = configure_retry_policy(retries=4, hedge_delay=2)
+        self.assertIs(get_retry_policy(), policy)
+        self.assertEqual(policy.retries, 4)
+        self.assertIs(SimplePing(server='http://10.1.1.1').retry_policy,
+                      policy)
+
+
+class SimplePingRetryTests(unittest.TestCase):
+    """
+    Tests of the repeats and hedged requests of SimplePing
+    """
+
+    def execute(self, policy, outcomes, conn=None, conns=None):
+        """Return the result of execute_cim_test_retries with outcomes."""
+        simpleping = SimplePing(server='http://10.1.1.1', retry_policy=policy)
+        with patch.object(SimplePing, 'execute_cim_test',
+                          fake_test(outcomes, conns)):
+            return simpleping.execute_cim_test_retries(
+                conn or WBEMConnection('http://10.1.1.1'))
+
+    def test_retry_succeeds(self):
+        """A transient failure is repeated until it succeeds"""
+        result = self.execute(RetryPolicy(retries=2, backoff=0),
+                              [(0, 'TimeoutError'), (0, 'ConnectionError'),
+                               (0, 'OK')])
+        self.assertEqual(result[0:2], ('OK', None))
+        self.assertEqual(result[4], 3)
+
+    def test_retries_exhausted(self):
+        """The last failure is reported when the retries are exhausted"""
+        result = self.execute(RetryPolicy(retries=1, backoff=0),
+                              [(0, 'TimeoutError'), (0, 'ConnectionError')])
+        self.assertEqual(result[0], 'ConnectionError')
+        self.assertEqual(result[4], 2)
+
+    def test_no_retry(self):
+        """Other failures are not repeated"""
+        result = self.execute(RetryPolicy(retries=3, backoff=0),
+                              [(0, 'WBEMError')])
+        self.assertEqual(result[0], 'WBEMError')
+        self.assertEqual(result[4], 1)
+
+    def test_backoff(self):
+        """The repeats wait for the backoff"""
+        start = time.time()
+        self.execute(RetryPolicy(retries=2, backoff=0.1),
+                     [(0, 'TimeoutError'), (0, 'TimeoutError'), (0, 'OK')])
+        self.assertTrue(time.time() - start >= 0.3)
+
+    def test_hedged(self):
+        """
+        A hedged request is sent on a new connection after the hedge delay
+        and wins. The pooled connection of the request that lost is not
+        returned to the pool.
+        """
+        pool = get_connection_pool()
+        conn = pool.get('http://10.1.1.1', timeout=5)
+        conns = []
+        start = time.time()
+        result = self.execute(RetryPolicy(retries=0, hedge_delay=0.1),
+                              [(1, 'OK'), (0, 'OK')], conn=conn, conns=conns)
+        self.assertTrue(time.time() - start < 0.8)
+        self.assertEqual(result[0], 'OK')
+        self.assertTrue(result[2] < 0.5)
+        self.assertEqual(result[4], 2)
+        self.assertIs(conns[0], conn)
+        self.assertIsNot(conns[1], conn)
+        self.assertEqual(conns[1].url, conn.url)
+        self.assertEqual(conns[1].timeout, 5)
+        pool.release(conn)
+        self.assertIsNot(pool.get('http://10.1.1.1', timeout=5), conn)
+
+    def test_hedged_failure(self):
+        """A failed hedged request waits for the first request"""
+        result = self.execute(RetryPolicy(retries=0, hedge_delay=0.1),
+                              [(0.3, 'OK'), (0, 'ConnectionError')])
+        self.assertEqual(result[0], 'OK')
+        self.assertEqual(result[4], 2)
+
+    def test_not_hedged(self):
+        """No hedged request is sent for a fast operation"""
+        result = self.execute(RetryPolicy(retries=0, hedge_delay=1),
+                              [(0, 'OK')])
+        self.assertEqual(result[4], 1)
+
+
+class EventLoopRetryTests(unittest.TestCase):
+    """
+    Tests of the repeats of the event loop engine
+    """
+
+    def setUp(self):
+        configure_reachability_cache(ttl=0)
+
+    def tearDown(self):
+        configure_reachability_cache()
+
+    def test_event_loop_retry(self):
+        """Failed tests are repeated and report the attempts"""
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        targets = {1: {'IPAddress': '127.0.0.1', 'Port': closed_port,
+                       'Protocol': 'http', 'Namespace': 'root/cimv2'}}
+        ping_list = SimplePingList(targets, target_ids=[1], timeout=1,
+                                   event_loop=True,
+                                   retry_policy=RetryPolicy(retries=2,
+                                                            backoff=0))
+        with patch('smipyping._simpleping.ping_hosts',
+                   return_value={'127.0.0.1': (True, 0.001)}):
+            results = dict(ping_list.ping_servers())
+        self.assertEqual(results[1].type, 'ConnectionError')
+        self.assertEqual(results[1].attempts, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,9 +20,17 @@ Unit Test the server sweep functions
 """
 from __future__ import absolute_import, print_function
 
+import os
+import shutil
+import socket
+import tempfile
+import time
 import unittest
+from mock import patch
 
-from smipyping._serversweep import ServerSweep
+from pywbem import AuthError, CIMError, CIM_ERR_INVALID_NAMESPACE
+
+from smipyping._serversweep import ServerSweep, SweepState
 
 
 class ExpandSubnetDefTests(unittest.TestCase):
@@ -109,5 +117,381 @@ class ExpandSubnetDefTests(unittest.TestCase):
             [('10.1.1.2', 5989), ('10.1.1.3', 5989)])
 
 
+class FakeTargetsTable(object):
+    """Targets table that knows only the hosts in known_hosts"""
+    def __init__(self, known_hosts):
+        self.known_hosts = known_hosts
+
+    def get_targets_host(self, host):
+        """Return the target ids of host"""
+        return [1] if host in self.known_hosts else []
+
+
+class WriteResultsTests(unittest.TestCase):
+    """
+    Tests for writing the open hosts to the output file
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.tmp_dir, 'serversweep.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, unknown_only):
+        """Write two open hosts, one known. Returns the lines written."""
+        sweep = ServerSweep('10.1.1.1,2', [5989])
+        sweep.targets_tbl = FakeTargetsTable([('10.1.1.1', 5989)])
+        sweep.write_results([('10.1.1.1', 5989), ('10.1.1.2', 5989)],
+                            output_file=self.output_file,
+                            unknown_only=unknown_only)
+        with open(self.output_file) as output:
+            return output.read().splitlines()
+
+    def test_unknown_only(self):
+        """Only the hosts not in the targets table are written"""
+        self.assertEqual(self.write(True), ['10.1.1.2:5989 unknown'])
+
+    def test_all_hosts(self):
+        """All of the hosts are written with their status"""
+        self.assertEqual(self.write(False), ['10.1.1.1:5989 known',
+                                             '10.1.1.2:5989 unknown'])
+
+
+class AsyncScanTests(unittest.TestCase):
+    """
+    Tests for the non-blocking tcp scan against ports on the local host
+    """
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.open_port = self.listener.getsockname()[1]
+
+        # get a port number that is not in use
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_sweep_async(self):
+        """
+        Test that the tcp-async scan type finds only the open port
+        """
+        sweep = ServerSweep('127.0.0.1', [self.open_port, self.closed_port],
+                            scan_type='tcp-async')
+        open_hosts = sweep.sweep_servers()
+
+        self.assertEqual(open_hosts, [('127.0.0.1', self.open_port)])
+        self.assertEqual(sweep.total_pings, 2)
+
+    def test_sweep_adaptive_timeout(self):
+        """
+        Test that replies from the tcp scans are recorded as RTT samples
+        """
+        for scan_type in ['tcp', 'tcp-async']:
+            sweep = ServerSweep('127.0.0.1-20', [self.closed_port],
+                                scan_type=scan_type, adaptive_timeout=True)
+            self.assertEqual(sweep.sweep_servers(), [])
+            timeouts = sweep.adaptive_timeout.subnet_timeouts()
+            self.assertEqual(list(timeouts), ['127.0.0'])
+            self.assertEqual(timeouts['127.0.0'],
+                             sweep.adaptive_timeout.min_timeout)
+
+    def test_sweep_prefilter(self):
+        """
+        Test that only the live hosts found by the prefilter are probed
+        """
+        sweep = ServerSweep('127.0.0.1-4', [self.closed_port, self.open_port],
+                            scan_type='tcp-async', prefilter='tcp')
+        # the refused connect to the first port shows a live host
+        self.assertEqual(sweep.live_addresses(['127.0.0.1']),
+                         set(['127.0.0.1']))
+
+        sweep.live_addresses = lambda addresses: set(['127.0.0.1'])
+        self.assertEqual(list(sweep.build_test_list()),
+                         [('127.0.0.1', self.closed_port),
+                          ('127.0.0.1', self.open_port)])
+        open_hosts = sweep.sweep_servers()
+        self.assertEqual(open_hosts, [('127.0.0.1', self.open_port)])
+        self.assertEqual(sweep.total_pings, 2)
+        self.assertEqual(sweep.total_skipped, 6)
+
+        with self.assertRaises(ValueError):
+            ServerSweep('127.0.0.1', [self.open_port], prefilter='arp')
+
+    def test_list_subnets_no_prefilter(self):
+        """
+        Test that the dry run listing does not execute the prefilter
+        """
+        sweep = ServerSweep('127.0.0.1-2', [self.open_port], verbose=True,
+                            prefilter='tcp')
+        with patch.object(ServerSweep, 'live_addresses') as live_addresses:
+            sweep.list_subnets_to_scan()
+        self.assertFalse(live_addresses.called)
+
+    def test_sweep_workers(self):
+        """
+        Test a sweep sharded across worker processes
+        """
+        sweep = ServerSweep('127.0.0.1-4', [self.open_port, self.closed_port],
+                            scan_type='tcp-async', workers=2)
+        open_hosts = sweep.sweep_servers()
+
+        self.assertEqual(open_hosts, [('127.0.0.1', self.open_port)])
+        self.assertEqual(sweep.total_pings, 8)
+
+
+class ScanTypeAllTests(unittest.TestCase):
+    """
+    Tests for the scan type all that validates the tcp scan with the syn scan
+    """
+
+    @staticmethod
+    def slow_check(result):
+        """Return port check function that takes 0.3 seconds"""
+        def check(dst_ip, dst_port, verbose, logger, timeout=2):
+            # pylint: disable=unused-argument
+            time.sleep(0.3)
+            return result
+        return check
+
+    def test_concurrent_checks(self):
+        """The tcp and syn checks of an address execute concurrently"""
+        sweep = ServerSweep('10.1.1.1', [5989], scan_type='all')
+        with patch('smipyping._serversweep.check_port_tcp',
+                   self.slow_check((True, 0, 'OK'))), \
+                patch('smipyping._serversweep.check_port_syn',
+                      self.slow_check((True, 0, 'Open, SYNACK'))):
+            start = time.time()
+            self.assertEqual(sweep.check_port(('10.1.1.1', 5989)),
+                             (True, None))
+            self.assertLess(time.time() - start, 0.55)
+
+    def test_syn_check_exception(self):
+        """An exception of the syn check is raised by check_port"""
+        def fail(*args, **kwargs):  # pylint: disable=unused-argument
+            raise RuntimeError('syn check failed')
+
+        sweep = ServerSweep('10.1.1.1', [5989], scan_type='all')
+        with patch('smipyping._serversweep.check_port_tcp',
+                   self.slow_check((True, 0, 'OK'))), \
+                patch('smipyping._serversweep.check_port_syn', fail):
+            with self.assertRaises(RuntimeError):
+                sweep.check_port(('10.1.1.1', 5989))
+
+
+class SweepStateTests(unittest.TestCase):
+    """
+    Tests for saving and resuming the state of a sweep
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.tmp_dir, 'sweepstate.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_position(self):
+        """
+        Test that the position is the first address not completely probed
+        """
+        state = SweepState(self.state_file, {})
+        state.probe_started(0, ('10.1.1.1', 5988))
+        state.probe_started(0, ('10.1.1.1', 5989))
+        state.probe_started(1, ('10.1.1.2', 5988))
+        state.probe_completed(('10.1.1.2', 5988), True)
+        state.probe_completed(('10.1.1.1', 5988), False)
+        self.assertEqual(state.position, 0)
+        state.probe_completed(('10.1.1.1', 5989), False)
+        self.assertEqual(state.position, 2)
+        self.assertEqual(state.probes_done, 3)
+
+    def test_resume(self):
+        """
+        Test that a resumed sweep probes only from the saved position and
+        includes the open hosts saved
+        """
+        sweep = ServerSweep('127.0.0.1-3', [1], scan_type='tcp-async',
+                            state_file=self.state_file)
+        state = SweepState(self.state_file, sweep.sweep_definition(),
+                           position=2, open_hosts=[('127.0.0.1', 1)],
+                           probes_done=2)
+        state.save()
+
+        open_hosts = sweep.sweep_servers(resume=True)
+        self.assertEqual(open_hosts, [('127.0.0.1', 1)])
+        self.assertEqual(sweep.total_pings, 3)
+        # state file is removed when the sweep completes
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_resume_completed_after_position(self):
+        """
+        Test that the probes completed after the saved position are not
+        counted or reported again when the sweep is resumed
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        self.addCleanup(listener.close)
+        open_port = listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        sweep = ServerSweep('127.0.0.1-2', [open_port, closed_port],
+                            scan_type='tcp-async',
+                            state_file=self.state_file)
+        # Interrupted with only the probe of 127.0.0.1:closed_port in
+        # progress
+        state = SweepState(self.state_file, sweep.sweep_definition(),
+                           position=0, open_hosts=[('127.0.0.1', open_port)],
+                           probes_done=3, completed_index=1,
+                           pending=[('127.0.0.1', closed_port)])
+        state.save()
+
+        found = []
+        open_hosts = sweep.sweep_servers(open_host_callback=found.append,
+                                         resume=True)
+        self.assertEqual(open_hosts, [('127.0.0.1', open_port)])
+        self.assertEqual(found, [])
+        self.assertEqual(sweep.total_pings, 4)
+
+    def test_resume_workers(self):
+        """
+        Test that the probes completed after the saved positions of the
+        shards are not counted or reported again when a sweep executed by
+        worker processes is resumed
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        self.addCleanup(listener.close)
+        open_port = listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        sweep = ServerSweep('127.0.0.1-4', [open_port, closed_port],
+                            scan_type='tcp-async', workers=2,
+                            state_file=self.state_file)
+        # Interrupted with only the probe of 127.0.0.2:closed_port of the
+        # first shard in progress and the second shard not started
+        state = SweepState(self.state_file, sweep.sweep_definition(),
+                           open_hosts=[('127.0.0.1', open_port)],
+                           probes_done=3, shard_positions=[0, 0],
+                           shard_completed=[1, -1],
+                           shard_pending=[[('127.0.0.2', closed_port)], []])
+        state.save()
+
+        found = []
+        open_hosts = sweep.sweep_servers(open_host_callback=found.append,
+                                         resume=True)
+        self.assertEqual(open_hosts, [('127.0.0.1', open_port)])
+        self.assertEqual(found, [])
+        self.assertEqual(sweep.total_pings, 8)
+
+    def test_save_pending(self):
+        """
+        Test that the completed index and the probes in progress are saved
+        """
+        state = SweepState(self.state_file, {})
+        state.probe_started(0, ('10.1.1.1', 5988))
+        state.probe_started(1, ('10.1.1.2', 5988))
+        state.probe_completed(('10.1.1.2', 5988), True)
+        state.save()
+        loaded = SweepState.load(self.state_file, {})
+        self.assertEqual(loaded.start_position, 0)
+        self.assertEqual(loaded.completed_index, 1)
+        loaded.probe_started(0, ('10.1.1.1', 5988))
+        loaded.probe_started(1, ('10.1.1.2', 5988))
+        self.assertFalse(loaded.probe_completed(('10.1.1.2', 5988), True))
+        self.assertTrue(loaded.probe_completed(('10.1.1.1', 5988), True))
+        self.assertEqual(loaded.probes_done, 2)
+
+    def test_resume_different_sweep(self):
+        """
+        Test that resume fails if the state file is for another sweep
+        """
+        SweepState(self.state_file, {'net_defs': ['10.1.1']}).save()
+        sweep = ServerSweep('10.1.2', [5989], state_file=self.state_file)
+        with self.assertRaises(ValueError):
+            sweep.sweep_servers(resume=True)
+
+
+class IdentifyTestSweep(ServerSweep):
+    """
+    ServerSweep with a test_host that accepts only the principal 'good'
+    in the namespace 'root/interop' after a delay.
+    """
+    def __init__(self, *args, **kwargs):
+        super(IdentifyTestSweep, self).__init__(*args, **kwargs)
+        self.tests = []
+
+    def test_host(self, hosturl, namespace, principal=None, credential=None,
+                  timeout=10):
+        self.tests.append((hosturl, namespace, principal))
+        time.sleep(0.1)
+        if principal != 'good':
+            raise AuthError('bad user')
+        if namespace != 'root/interop':
+            raise CIMError(CIM_ERR_INVALID_NAMESPACE)
+
+
+class IdentifyHostsTests(unittest.TestCase):
+    """
+    Tests for the concurrent credential tests of unknown open hosts
+    """
+
+    def test_identify_hosts(self):
+        """
+        Test that the hosts are tested concurrently and the tests of a host
+        stop when a principal and namespace work.
+        """
+        sweep = IdentifyTestSweep('10.1.1.1', [5989])
+        hosts = [('10.1.1.%s' % i, 5989) for i in range(1, 11)]
+        creds = [('bad', 'pw'), ('good', 'pw'), ('other', 'pw')]
+
+        start = time.time()
+        status = sweep.identify_hosts(creds, hosts, max_threads=10)
+        # serially this would be 10 hosts * 4 tests * 0.1 sec
+        self.assertLess(time.time() - start, 2)
+
+        self.assertEqual(sorted(status), sorted(hosts))
+        for host in hosts:
+            self.assertEqual(status[host], 'Found good pw root/interop')
+        # bad, good interop, good root/interop: stops before 'other'
+        self.assertEqual(len(sweep.tests), 10 * 4)
+        self.assertNotIn('other', [test[2] for test in sweep.tests])
+
+    def test_identify_deadline(self):
+        """
+        Test that no tests are started after the deadline
+        """
+        sweep = IdentifyTestSweep('10.1.1.1', [5989])
+        status = sweep.test_host_params([('bad', 'pw')], ('10.1.1.1', 5989),
+                                        end_time=time.time() - 1)
+        self.assertTrue(status.startswith('Identify deadline exceeded'))
+        self.assertEqual(sweep.tests, [])
+
+    def test_identify_deadline_fraction(self):
+        """
+        Test that a test is started when less than a second remains
+        """
+        sweep = IdentifyTestSweep('10.1.1.1', [5989])
+        status = sweep.test_host_params([('good', 'pw')], ('10.1.1.1', 5989),
+                                        end_time=time.time() + 0.5)
+        self.assertFalse(status.startswith('Identify deadline exceeded'))
+        self.assertTrue(sweep.tests)
+
+
 if __name__ == '__main__':
     unittest.main()
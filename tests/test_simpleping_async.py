@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Test the event loop cimping engine against local fake WBEM servers
+"""
+from __future__ import absolute_import, print_function
+
+import socket
+import threading
+import time
+import unittest
+
+from mock import patch
+from pywbem import CIMError, AuthError, ParseError
+
+from smipyping import SimplePingList, SimplePing
+from smipyping._simpleping_async import CIMPingRequest, cimping_async, \
+    parse_response, build_request, decode_chunked, resolve_hosts
+from smipyping._reachabilitycache import configure_reachability_cache
+
+OK_RESPONSE = b'<?xml version="1.0" encoding="utf-8" ?>' \
+    b'<CIM CIMVERSION="2.0" DTDVERSION="2.0">' \
+    b'<MESSAGE ID="1001" PROTOCOLVERSION="1.0"><SIMPLERSP>' \
+    b'<IMETHODRESPONSE NAME="EnumerateInstances"><IRETURNVALUE/>' \
+    b'</IMETHODRESPONSE></SIMPLERSP></MESSAGE></CIM>'
+
+OPEN_RESPONSE = b'<?xml version="1.0" encoding="utf-8" ?>' \
+    b'<CIM CIMVERSION="2.0" DTDVERSION="2.0">' \
+    b'<MESSAGE ID="1001" PROTOCOLVERSION="1.0"><SIMPLERSP>' \
+    b'<IMETHODRESPONSE NAME="OpenEnumerateInstancePaths">' \
+    b'<IRETURNVALUE></IRETURNVALUE>' \
+    b'<PARAMVALUE NAME="EnumerationContext"><VALUE>ctx-1</VALUE>' \
+    b'</PARAMVALUE>' \
+    b'<PARAMVALUE NAME="EndOfSequence"><VALUE>FALSE</VALUE></PARAMVALUE>' \
+    b'</IMETHODRESPONSE></SIMPLERSP></MESSAGE></CIM>'
+
+ERROR_RESPONSE = b'<?xml version="1.0" encoding="utf-8" ?>' \
+    b'<CIM CIMVERSION="2.0" DTDVERSION="2.0">' \
+    b'<MESSAGE ID="1001" PROTOCOLVERSION="1.0"><SIMPLERSP>' \
+    b'<IMETHODRESPONSE NAME="EnumerateInstances">' \
+    b'<ERROR CODE="3" DESCRIPTION="bad namespace"/>' \
+    b'</IMETHODRESPONSE></SIMPLERSP></MESSAGE></CIM>'
+
+
+def http_response(body, status='200 OK', chunked=False):
+    """Return HTTP response with body."""
+    if chunked:
+        half = len(body) // 2
+        body = b'%x\r\n%s\r\n%x\r\n%s\r\n0\r\n\r\n' % \
+            (half, body[:half], len(body) - half, body[half:])
+        length = b'Transfer-Encoding: chunked'
+    else:
+        length = b'Content-Length: %d' % len(body)
+    return b'HTTP/1.1 ' + status.encode('ascii') + b'\r\n' + length + \
+        b'\r\nContent-Type: application/xml\r\n\r\n' + body
+
+
+class FakeServer(threading.Thread):
+    """
+    Server on a local port that sends response to each request after delay
+    seconds. The connections are kept open so the client must detect the
+    end of the response.
+    """
+    def __init__(self, response, delay=0):
+        super(FakeServer, self).__init__()
+        self.daemon = True
+        self.response = response
+        self.delay = delay
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.requests = []
+        self.connections = []
+        self.start()
+
+    def run(self):
+        while True:
+            try:
+                conn = self.sock.accept()[0]
+            except socket.error:
+                return
+            self.connections.append(conn)
+            data = b''
+            while b'</CIM>' not in data:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            self.requests.append(data)
+            if self.response is not None:
+                time.sleep(self.delay)
+                conn.sendall(self.response)
+
+    def close(self):
+        """Stop accepting and close the connections."""
+        self.sock.close()
+        for conn in self.connections:
+            conn.close()
+
+
+def request(key, port, tcp_ping=False, strategy='enuminsts'):
+    """Return CIMPingRequest for a server on the local host."""
+    return CIMPingRequest(key=key, host='127.0.0.1', port=port,
+                          scheme='http', namespace='root/cimv2', user='user',
+                          password='pw', tcp_ping=tcp_ping, strategy=strategy)
+
+
+class ParseTests(unittest.TestCase):
+    """
+    Tests for the HTTP request and response functions
+    """
+
+    def test_build_request(self):
+        """The request is an EnumerateInstances HTTP POST"""
+        data = build_request(request(1, 5988))
+        header, body = data.split(b'\r\n\r\n')
+        self.assertTrue(header.startswith(b'POST /cimom HTTP/1.1'))
+        self.assertIn(b'CIMMethod: EnumerateInstances', header)
+        self.assertIn(b'CIMObject: root/cimv2', header)
+        self.assertIn(b'Authorization: Basic dXNlcjpwdw==', header)
+        self.assertIn(b'Content-Length: %d' % len(body), header)
+        self.assertIn(b'<NAMESPACE NAME="root"/><NAMESPACE NAME="cimv2"/>',
+                      body)
+        self.assertIn(b'<CLASSNAME NAME="CIM_ComputerSystem"/>', body)
+
+    def test_build_request_strategies(self):
+        """The method of the request is that of the probe strategy"""
+        for strategy, method in [('enumnames', b'EnumerateInstanceNames'),
+                                 ('pull', b'OpenEnumerateInstancePaths'),
+                                 ('getclass', b'GetClass')]:
+            header, body = build_request(
+                request(1, 5988, strategy=strategy)).split(b'\r\n\r\n')
+            self.assertIn(b'CIMMethod: ' + method, header)
+            self.assertIn(b'<IMETHODCALL NAME="' + method + b'">', body)
+        data = build_request(request(1, 5988, strategy='pull'))
+        self.assertIn(b'<IPARAMVALUE NAME="MaxObjectCount"><VALUE>1</VALUE>',
+                      data)
+        data = build_request(request(1, 5988, strategy='getclass'))
+        self.assertIn(b'<IPARAMVALUE NAME="LocalOnly"><VALUE>TRUE</VALUE>',
+                      data)
+        self.assertRaises(ValueError, build_request,
+                          request(1, 5988, strategy='bad'))
+
+    def test_parse_response(self):
+        """Responses are parsed when complete"""
+        response = http_response(OK_RESPONSE)
+        self.assertIsNone(parse_response(response[:-5], False))
+        self.assertEqual(parse_response(response, False).tag,
+                         'IMETHODRESPONSE')
+        self.assertEqual(parse_response(http_response(OK_RESPONSE,
+                                                      chunked=True),
+                                        False).tag,
+                         'IMETHODRESPONSE')
+        self.assertRaises(CIMError, parse_response,
+                          http_response(ERROR_RESPONSE), False)
+        self.assertRaises(AuthError, parse_response,
+                          http_response(b'', '401 Unauthorized'), False)
+        self.assertRaises(ParseError, parse_response,
+                          http_response(b'<CIM>'), False)
+
+    def test_decode_chunked(self):
+        """Chunked bodies are decoded when the last chunk is received"""
+        self.assertEqual(decode_chunked(b'3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n'),
+                         b'abcde')
+        self.assertIsNone(decode_chunked(b'3\r\nabc\r\n2\r\nd'))
+
+
+class CIMPingAsyncTests(unittest.TestCase):
+    """
+    Tests of cimping_async against fake servers
+    """
+
+    def setUp(self):
+        configure_reachability_cache(ttl=0)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+        configure_reachability_cache()
+
+    def server(self, response, delay=0):
+        """Start a FakeServer and return its port."""
+        server = FakeServer(response, delay)
+        self.servers.append(server)
+        return server.port
+
+    def test_results(self):
+        """Each result type of SimplePing is reported"""
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        requests = [
+            request('ok', self.server(http_response(OK_RESPONSE))),
+            request('chunked', self.server(http_response(OK_RESPONSE,
+                                                         chunked=True))),
+            request('cimerror', self.server(http_response(ERROR_RESPONSE))),
+            request('auth', self.server(http_response(b'',
+                                                      '401 Unauthorized'))),
+            request('refused', closed_port),
+            request('noreply', self.server(None))]
+        start = time.time()
+        results = dict((result[0], result[1:]) for result in
+                       cimping_async(requests, timeout=1))
+        self.assertTrue(time.time() - start < 3)
+        self.assertEqual(results['ok'][:2], ('OK', None))
+        phases = results['ok'][3]
+        for phase in ('dns', 'connect', 'response', 'parse', 'operation'):
+            self.assertTrue(phases[phase] >= 0, phase)
+        self.assertNotIn('tls', phases)
+        self.assertTrue(phases['operation'] >= phases['response'])
+        self.assertEqual(results['chunked'][:2], ('OK', None))
+        self.assertEqual(results['cimerror'][0], 'WBEMError')
+        self.assertEqual(results['cimerror'][1].status_code, 3)
+        self.assertEqual(results['auth'][0], 'PyWBEMError')
+        self.assertEqual(results['refused'][0], 'ConnectionError')
+        self.assertEqual(results['noreply'][0], 'TimeoutError')
+
+    def test_auth_result_matches_pywbem(self):
+        """An HTTP 401 has the result type of the pywbem engine"""
+        port = self.server(http_response(b'', '401 Unauthorized'))
+        simpleping = SimplePing(server='http://127.0.0.1:%s' % port,
+                                user='user', password='pw', timeout=2,
+                                ping=False)
+        test_result = simpleping.test_server()
+        results = list(cimping_async([request(1, port)], timeout=2))
+        self.assertIsInstance(test_result.exception, AuthError)
+        self.assertIsInstance(results[0][2], AuthError)
+        self.assertEqual(results[0][1], test_result.type)
+
+    def test_resolve_hosts(self):
+        """Host names are resolved before the tests start"""
+        port = self.server(http_response(OK_RESPONSE))
+        addresses = resolve_hosts(['127.0.0.1', '127.0.0.1'])
+        self.assertEqual(list(addresses), ['127.0.0.1'])
+        self.assertEqual(addresses['127.0.0.1'][:2], ('127.0.0.1', None))
+
+        with patch('smipyping._simpleping_async.socket.gethostbyname',
+                   side_effect=socket.gaierror(-2, 'Name or service not '
+                                                   'known')):
+            results = list(cimping_async([request(1, port)], timeout=1))
+        self.assertEqual(results[0][1], 'ConnectionError')
+        self.assertIn('Name or service not known', str(results[0][2]))
+        self.assertIn('dns', results[0][4])
+
+    def test_concurrent(self):
+        """Slow servers are tested concurrently"""
+        requests = [request(index, self.server(http_response(OK_RESPONSE),
+                                               delay=0.5))
+                    for index in range(20)]
+        start = time.time()
+        results = list(cimping_async(requests, timeout=5))
+        self.assertTrue(time.time() - start < 2.5)
+        self.assertEqual(sorted(result[0] for result in results),
+                         list(range(20)))
+        self.assertTrue(all(result[1] == 'OK' for result in results))
+
+    def test_tcp_ping(self):
+        """A refused connect of a tcp ping request is not a PingFail"""
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        results = list(cimping_async([request(1, closed_port, True)],
+                                     timeout=1))
+        self.assertEqual(results[0][1], 'ConnectionError')
+
+    def test_simpleping_timings(self):
+        """SimplePing records the phases that pywbem exposes"""
+        port = self.server(http_response(OK_RESPONSE))
+        simpleping = SimplePing(server='http://127.0.0.1:%s' % port,
+                                timeout=2, ping=False)
+        test_result = simpleping.test_server()
+        self.assertEqual(test_result.type, 'OK')
+        self.assertIsNotNone(test_result.timings.dns)
+        self.assertIsNotNone(test_result.timings.operation)
+        self.assertIsNone(test_result.timings.ping)
+        self.assertIsNone(test_result.timings.connect)
+
+    def test_pull_close(self):
+        """An open pull enumeration is closed on a second connection"""
+        server = FakeServer(http_response(OPEN_RESPONSE))
+        self.servers.append(server)
+        results = list(cimping_async([request(1, server.port,
+                                              strategy='pull')], timeout=2))
+        self.assertEqual(results[0][1:3], ('OK', None))
+        self.assertEqual(len(server.requests), 2)
+        self.assertIn(b'CIMMethod: OpenEnumerateInstancePaths',
+                      server.requests[0])
+        self.assertIn(b'CIMMethod: CloseEnumeration', server.requests[1])
+        self.assertIn(b'<VALUE>ctx-1</VALUE>', server.requests[1])
+
+    def test_simplepinglist(self):
+        """SimplePingList returns TestResults from the event loop engine"""
+        port = self.server(http_response(OK_RESPONSE))
+        targets = {}
+        for target_id, ip_address in ((1, '127.0.0.1'), (2, '10.1.1.1')):
+            targets[target_id] = {'IPAddress': ip_address, 'Port': port,
+                                  'Protocol': 'http',
+                                  'Namespace': 'root/cimv2',
+                                  'Principal': 'user', 'Credential': 'pw'}
+        ping_list = SimplePingList(targets, target_ids=[1, 2], timeout=1,
+                                   event_loop=True)
+        with patch('smipyping._simpleping.ping_hosts',
+                   return_value={'127.0.0.1': (True, 0.001),
+                                 '10.1.1.1': (False, None)}):
+            results = dict(ping_list.ping_servers())
+        self.assertEqual(results[1].type, 'OK')
+        self.assertEqual(results[1].code, 0)
+        self.assertEqual(results[1].timings.ping, 0.001)
+        self.assertIsNotNone(results[1].timings.connect)
+        self.assertIsNone(results[2].timings.connect)
+        self.assertEqual(results[2].type, 'PingFail')
+        self.assertEqual(results[2].code, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
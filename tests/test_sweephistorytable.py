@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the sweep history table in _sweephistorytable.py
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from smipyping._sweephistorytable import SweepHistoryTable, changed_subnets
+
+
+def sweep_def(net_defs, ports):
+    """Return a sweep definition like ServerSweep.sweep_definition"""
+    return {'net_defs': net_defs, 'ports': ports, 'min_octet_val': 1,
+            'max_octet_val': 254, 'workers': 1}
+
+
+class CsvSweepHistoryTests(unittest.TestCase):
+    """Tests for the csv sweep history table"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_dict = {
+            'directory': self.directory,
+            'sweepsfilename': os.path.join(self.directory, 'sweeps.csv'),
+            'sweephostsfilename': os.path.join(self.directory,
+                                               'sweephosts.csv')}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, tbl, net_defs, ports, open_hosts):
+        """Append a sweep to tbl and return its id"""
+        return tbl.append(datetime.datetime.now(), sweep_def(net_defs, ports),
+                          'tcp', 254 * len(net_defs) * len(ports), open_hosts)
+
+    def test_append_and_reload(self):
+        """Sweeps are saved and loaded from the csv files"""
+        tbl = SweepHistoryTable.factory(self.db_dict, 'csv', False)
+        self.assertEqual(len(tbl), 0)
+        id1 = self.append(tbl, ['10.1.132'], [5988, 5989],
+                          [('10.1.132.5', 5989), ('10.1.132.9', 5988)])
+        id2 = self.append(tbl, ['10.1.132'], [5988, 5989], [])
+
+        tbl = SweepHistoryTable.factory(self.db_dict, 'csv', False)
+        self.assertEqual(tbl.sweep_ids(), [id1, id2])
+        self.assertEqual(tbl[id1]['Ports'], '5988,5989')
+        self.assertEqual(tbl.get_open_hosts(id1),
+                         set([('10.1.132.5', 5989), ('10.1.132.9', 5988)]))
+        self.assertEqual(tbl.get_open_hosts(id2), set())
+        self.assertRaises(KeyError, tbl.get_open_hosts, id2 + 1)
+
+    def test_diff(self):
+        """Appeared and vanished endpoints between two sweeps"""
+        tbl = SweepHistoryTable.factory(self.db_dict, 'csv', False)
+        id1 = self.append(tbl, ['10.1.132'], [5989],
+                          [('10.1.132.5', 5989), ('10.1.132.9', 5989)])
+        id2 = self.append(tbl, ['10.1.132'], [5989],
+                          [('10.1.132.9', 5989), ('10.1.132.10', 5989)])
+        self.assertEqual(tbl.diff(id2),
+                         ([('10.1.132.10', 5989)], [('10.1.132.5', 5989)]))
+        self.assertEqual(tbl.diff(id2, from_id=id1), tbl.diff(id2))
+        self.assertRaises(KeyError, tbl.diff, id2, from_id=99)
+
+    def test_narrow_sweep_diff(self):
+        """
+        A narrow sweep is compared only within its scope with the newest
+        earlier sweep that probed each address
+        """
+        tbl = SweepHistoryTable.factory(self.db_dict, 'csv', False)
+        self.append(tbl, ['10.1.132', '10.1.133'], [5988, 5989],
+                    [('10.1.132.5', 5989), ('10.1.133.7', 5989),
+                     ('10.1.133.8', 5988)])
+        self.append(tbl, ['10.1.133'], [5989], [])
+        id3 = self.append(tbl, ['10.1.133.1-10'], [5988, 5989],
+                          [('10.1.133.7', 5989), ('10.1.133.8', 5988)])
+
+        # 10.1.133.7:5989 was last seen closed by the second sweep. 10.1.133.8
+        # was not probed on 5988 by the second sweep so it is unchanged and
+        # 10.1.132.5 is outside of the scope of the third sweep.
+        self.assertEqual(tbl.previous_open_hosts(id3),
+                         set([('10.1.133.8', 5988)]))
+        self.assertEqual(tbl.diff(id3), ([('10.1.133.7', 5989)], []))
+
+    def test_changed_subnets(self):
+        """Subnets of the changed endpoints in numeric order"""
+        self.assertEqual(changed_subnets([('10.1.132.5', 5989),
+                                          ('10.1.20.1', 5988),
+                                          ('10.1.132.9', 5988)]),
+                         ['10.1.20', '10.1.132'])
+
+    def test_invalid_dbtype(self):
+        """Unsupported database types raise ValueError"""
+        self.assertRaises(ValueError, SweepHistoryTable.factory, self.db_dict,
+                          'xml', False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -175,6 +175,14 @@ class TargetsTableTest(CsvTableTests):
         result_list = self.target_table.get_targets_host(host_id)
 
         self.assertTrue(result_list is not None)
+        self.assertEqual(result_list, [])
+
+        host_id = ('10.1.134.163', 5989)
+        self.assertEqual(self.target_table.get_targets_host(host_id), [1, 2])
+        self.assertEqual(self.target_table.get_targets_host(
+            ('10.1.134.116', 5989)), [6])
+        self.assertEqual(self.target_table.get_targets_host(
+            ('10.1.134.116', 5988)), [])
 
     def test_disabled_target(self):
         self.assertTrue(self.target_table.disabled_target(
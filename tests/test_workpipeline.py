@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# (C) Copyright 2017 Inova Development Inc.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Test the threaded work pipeline
+"""
+from __future__ import absolute_import, print_function
+
+import itertools
+import threading
+import unittest
+
+from smipyping._workpipeline import threaded_pipeline
+
+
+class ThreadedPipelineTests(unittest.TestCase):
+    """
+    Tests for the threaded_pipeline function
+    """
+
+    def test_results(self):
+        """
+        Test that every work item returns one result
+        """
+        results = dict(threaded_pipeline(range(100), lambda x: x * 2,
+                                         num_threads=4))
+        self.assertEqual(results, dict((x, x * 2) for x in range(100)))
+
+    def test_worker_exception(self):
+        """
+        Test that a worker exception is raised by the generator
+        """
+        def worker(item):  # pylint: disable=missing-docstring
+            if item == 5:
+                raise ValueError('bad item')
+            return item
+
+        with self.assertRaises(ValueError):
+            list(threaded_pipeline(range(10), worker, num_threads=2))
+
+    def test_bounded(self):
+        """
+        Test that the work items are consumed only as results are used
+        """
+        produced = []
+
+        def work_items():  # pylint: disable=missing-docstring
+            for item in itertools.count():
+                produced.append(item)
+                yield item
+
+        pipeline = threaded_pipeline(work_items(), lambda x: x,
+                                     num_threads=2, queue_depth=4)
+        first = [next(pipeline) for _ in range(5)]
+        pipeline.close()
+        self.assertEqual(len(first), 5)
+        # items in progress are limited by the queue depths and threads
+        self.assertLess(len(produced), 5 + 4 + 4 + 2 + 2)
+
+    def test_close_joins_workers(self):
+        """
+        Test that closing the generator early waits for the worker threads
+        """
+        before = threading.active_count()
+        pipeline = threaded_pipeline(range(100), lambda x: x, num_threads=4)
+        next(pipeline)
+        pipeline.close()
+        # Only the producer may still be exiting
+        self.assertLessEqual(threading.active_count(), before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()